@@ -0,0 +1,269 @@
+"""
+Offline stand-ins for the Azure OpenAI chat model, the embedder, web search and the crawled
+corpus, so the benchmarks run without network access or API keys.
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from collections import Counter
+from typing import Any
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import Field
+
+WORDS = (
+    "market equity bond inflation rate growth portfolio sector fund earnings yield "
+    "policy economy outlook risk return volatility investor dividend credit energy "
+    "technology healthcare financial consumer industrial currency commodity gold oil "
+    "election tariff forecast recession liquidity valuation momentum quarter annual"
+).split()
+
+# Schema picked out of the PydanticOutputParser format instructions of plain (non structured) calls.
+_FORMAT_SCHEMA_PATTERN = re.compile(
+    r"Here is the output schema:\s*```\s*(\{.*\})\s*```", re.S
+)
+
+# Defaults giving the graph its usual path: vector route, relevant documents, accepted answer.
+DEFAULT_RESPONSES = {
+    "RouteQuery": {"source": "vector_retriever"},
+    "GradingDocuments": {"grade_score": "full_relevance"},
+    "CheckandGradeResponse": {"hallucination": "no", "response_score": 0.9},
+}
+
+
+def estimate_tokens(text):
+    """
+    Deterministic token estimate (4 characters per token) used for the fake usage counts.
+    """
+    return max(1, len(text) // 4)
+
+
+def make_corpus(n_docs=100, words_per_doc=1200, seed=0):
+    """
+    Returns deterministic synthetic documents shaped like the crawled pages.
+    """
+    rng = random.Random(seed)
+    docs = []
+    for i in range(n_docs):
+        sentences = []
+        for _ in range(words_per_doc // 12):
+            sentence = " ".join(rng.choice(WORDS) for _ in range(12))
+            sentences.append(sentence.capitalize() + ".")
+        docs.append(
+            Document(
+                page_content=" ".join(sentences),
+                metadata={
+                    "source": f"https://example.com/insights/{i}",
+                    "title": f"Insight {i}",
+                    "description": "",
+                    "language": "en",
+                },
+            )
+        )
+    return docs
+
+
+def make_questions(n_questions=20, seed=1):
+    rng = random.Random(seed)
+    return [
+        f"What is the {rng.choice(WORDS)} {rng.choice(WORDS)} outlook for {rng.choice(WORDS)}?"
+        for _ in range(n_questions)
+    ]
+
+
+def _fake_value(schema, defs, words, rng):
+    if "$ref" in schema:
+        return _fake_value(defs[schema["$ref"].rpartition("/")[2]], defs, words, rng)
+    if "enum" in schema:
+        return schema["enum"][0]
+    if "anyOf" in schema:
+        return _fake_value(schema["anyOf"][0], defs, words, rng)
+    kind = schema.get("type")
+    if kind == "object" or "properties" in schema:
+        return {
+            name: _fake_value(prop, defs, words, rng)
+            for name, prop in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        return [
+            _fake_value(schema.get("items", {}), defs, words, rng) for _ in range(3)
+        ]
+    if kind == "number":
+        return 0.9
+    if kind == "integer":
+        return 0
+    if kind == "boolean":
+        return True
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def fake_output(json_schema, responses=None, words=30, seed=0):
+    """
+    Builds a deterministic value matching a JSON schema. Values in responses, keyed by the
+    schema title, override the generated fields.
+    """
+    value = _fake_value(
+        json_schema, json_schema.get("$defs", {}), words, random.Random(seed)
+    )
+    if isinstance(value, dict):
+        value.update((responses or {}).get(json_schema.get("title"), {}))
+    return value
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    A deterministic chat model. Structured calls return values generated from the output
+    schema; plain calls answer with JSON for the schema in the prompt's format instructions.
+    Every call sleeps `latency + per_output_token_latency * output_tokens` and reports usage
+    metadata, and token usage is also counted per schema name.
+    """
+
+    latency: float = 0.0
+    per_output_token_latency: float = 0.0
+    output_words: int = 30
+    responses: dict = Field(default_factory=lambda: dict(DEFAULT_RESPONSES))
+    usage: Any = Field(default_factory=Counter)
+    calls: Any = Field(default_factory=Counter)
+
+    @property
+    def _llm_type(self):
+        return "fake-chat-model"
+
+    def _respond(self, messages, json_schema):
+        prompt = "\n".join(str(message.content) for message in messages)
+        if json_schema is None:
+            match = _FORMAT_SCHEMA_PATTERN.search(prompt)
+            json_schema = json.loads(match.group(1)) if match else {"type": "string"}
+        name = (
+            json_schema.get("title")
+            or "+".join(json_schema.get("properties", {}))
+            or "text"
+        )
+        seed = int(hashlib.md5(prompt.encode("utf-8")).hexdigest()[:8], 16)
+        output = fake_output(json_schema, self.responses, self.output_words, seed)
+        content = output if isinstance(output, str) else json.dumps(output)
+        input_tokens, output_tokens = estimate_tokens(prompt), estimate_tokens(content)
+        self.calls[name] += 1
+        self.usage[f"{name}.input_tokens"] += input_tokens
+        self.usage[f"{name}.output_tokens"] += output_tokens
+        message = AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+            response_metadata={"model_name": "fake", "schema": name},
+        )
+        delay = self.latency + self.per_output_token_latency * output_tokens
+        return ChatResult(generations=[ChatGeneration(message=message)]), delay
+
+    def _generate(
+        self, messages, stop=None, run_manager=None, json_schema=None, **kwargs
+    ):
+        result, delay = self._respond(messages, json_schema)
+        if delay:
+            time.sleep(delay)
+        return result
+
+    async def _agenerate(
+        self, messages, stop=None, run_manager=None, json_schema=None, **kwargs
+    ):
+        result, delay = self._respond(messages, json_schema)
+        if delay:
+            await asyncio.sleep(delay)
+        return result
+
+    def with_structured_output(self, schema, *, include_raw=False, **kwargs):
+        if isinstance(schema, dict):
+            json_schema = schema.get("function", schema).get("parameters", schema)
+            json_schema = {
+                "title": schema.get("function", {}).get("name"),
+                **json_schema,
+            }
+
+            def parse(message):
+                return json.loads(message.content)
+
+        else:
+            json_schema = schema.model_json_schema()
+
+            def parse(message):
+                return schema.model_validate_json(message.content)
+
+        return self.bind(
+            json_schema=json_schema,
+            ls_structured_output_format={"kwargs": kwargs, "schema": json_schema},
+        ) | RunnableLambda(parse)
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Deterministic hashed bag-of-words embeddings, so similar texts get similar vectors.
+    Every call sleeps `latency + per_text_latency * len(texts)`.
+    """
+
+    def __init__(self, dim=256, latency=0.0, per_text_latency=0.0):
+        self.dim = dim
+        self.latency = latency
+        self.per_text_latency = per_text_latency
+        self.calls = 0
+        self.texts = 0
+
+    def _embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            digest = int(hashlib.md5(word.encode("utf-8")).hexdigest()[:8], 16)
+            vector[digest % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        self.texts += len(texts)
+        delay = self.latency + self.per_text_latency * len(texts)
+        if delay:
+            time.sleep(delay)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def make_web_search(latency=0.0, n_results=5):
+    """
+    Returns a runnable producing Tavily-style results for a question.
+    """
+
+    def results(question):
+        key = int(hashlib.md5(question.encode("utf-8")).hexdigest()[:8], 16)
+        return [
+            {
+                "url": f"https://news.example.com/{key % 10_000}/{i}",
+                "content": f"{question} " + " ".join(WORDS[i : i + 40]),
+                "score": 1.0 - i / n_results,
+            }
+            for i in range(n_results)
+        ]
+
+    def search(question):
+        if latency:
+            time.sleep(latency)
+        return results(question)
+
+    async def asearch(question):
+        if latency:
+            await asyncio.sleep(latency)
+        return results(question)
+
+    return RunnableLambda(search, afunc=asearch)
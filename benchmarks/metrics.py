@@ -0,0 +1,87 @@
+"""
+Latency summaries, baseline storage and regression checks for the benchmark suite.
+"""
+
+import json
+import os
+import platform
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+# Metrics whose name ends with one of these are better when higher; all others (latencies,
+# durations, token counts) are better when lower.
+HIGHER_IS_BETTER = ("_per_second", "_per_minute", "hit_rate")
+
+
+def summarize_latencies(samples, prefix):
+    """
+    Returns p50/p99/mean in milliseconds for a list of durations in seconds.
+    """
+    if not samples:
+        return {}
+    ms = np.asarray(samples) * 1000
+    return {
+        f"{prefix}_p50_ms": float(np.percentile(ms, 50)),
+        f"{prefix}_p99_ms": float(np.percentile(ms, 99)),
+        f"{prefix}_mean_ms": float(ms.mean()),
+    }
+
+
+@contextmanager
+def stopwatch(results, key):
+    """
+    Context manager storing the elapsed wall time in seconds as results[key].
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        results[key] = time.perf_counter() - start
+
+
+def save_baseline(results, path):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    payload = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "metrics": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
+
+
+def load_baseline(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["metrics"]
+
+
+def compare(results, baseline, threshold=0.15):
+    """
+    Compares every metric present in both runs.
+    Returns a list of (metric, baseline, current, relative change, regressed) where the relative
+    change is signed so that positive always means worse.
+    """
+    rows = []
+    for metric in sorted(set(results) & set(baseline)):
+        old, new = baseline[metric], results[metric]
+        if not old:
+            continue
+        change = (new - old) / abs(old)
+        if metric.endswith(HIGHER_IS_BETTER):
+            change = -change
+        rows.append((metric, old, new, change, change > threshold))
+    return rows
+
+
+def format_comparison(rows):
+    lines = [f"{'metric':<48} {'baseline':>12} {'current':>12} {'worse by':>9}"]
+    for metric, old, new, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        lines.append(f"{metric:<48} {old:>12.3f} {new:>12.3f} {change:>+8.1%}{flag}")
+    return "\n".join(lines)
@@ -0,0 +1,87 @@
+"""
+Runs the offline benchmark suite and compares it with a saved baseline.
+
+    python -m benchmarks.run                       # run and compare with the baseline
+    python -m benchmarks.run --save-baseline       # run and store the results as the baseline
+    python -m benchmarks.run --only retrieval,graph --set llm_latency=0.05
+
+Exits with status 1 when a metric is worse than the baseline by more than --threshold.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from benchmarks.metrics import compare, format_comparison, load_baseline, save_baseline
+from benchmarks.suite import BENCHMARKS, DEFAULT_CONFIG, run_suite
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "baseline.json")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--only", help=f"Comma separated benchmarks to run ({', '.join(BENCHMARKS)})."
+    )
+    parser.add_argument(
+        "--baseline", default=DEFAULT_BASELINE, help="Baseline JSON path."
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store the results as the baseline.",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.15,
+        help="Relative change counted as a regression (default 0.15).",
+    )
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help=f"Override a config value ({', '.join(DEFAULT_CONFIG)}).",
+    )
+    parser.add_argument("--output", help="Also write the results to this JSON file.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = {}
+    for item in args.set:
+        key, _, value = item.partition("=")
+        if key not in DEFAULT_CONFIG:
+            raise SystemExit(f"Unknown config key '{key}'.")
+        config[key] = type(DEFAULT_CONFIG[key])(value)
+    names = args.only.split(",") if args.only else None
+    results = run_suite(names, config)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        print(f"Saved {len(results)} metrics to {args.baseline}.")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(json.dumps(results, indent=2, sort_keys=True))
+        print(
+            f"No baseline at {args.baseline}; run with --save-baseline to create one."
+        )
+        return 0
+
+    rows = compare(results, load_baseline(args.baseline), args.threshold)
+    print(format_comparison(rows))
+    regressions = [row[0] for row in rows if row[4]]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
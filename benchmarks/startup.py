@@ -0,0 +1,123 @@
+"""
+Cold-start cost of the src modules: the import time of each module and the cost of the first
+call of the main entry points, each measured in a fresh interpreter.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --repeat 5 --output startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = (
+    "src.query_router",
+    "src.doc_grader",
+    "src.instrumentation",
+    "src.utils",
+    "src.vector_db",
+    "src.doc_loader",
+    "src.graph_builder",
+)
+
+# name -> (untimed setup, timed first call)
+FIRST_CALLS = {
+    "get_llm": ("from src.utils import get_llm", "get_llm()"),
+    "get_embedder": ("from src.utils import get_embedder", "get_embedder()"),
+    "vector_db_manager": (
+        "from src.vector_db import VectorDBManager",
+        "VectorDBManager(None, 'startup_probe')",
+    ),
+}
+
+# Placeholder credentials so the clients can be constructed; nothing is sent.
+_ENV = {
+    "AZURE_OPENAI_API_KEY": "startup-probe",
+    "AZURE_OPENAI_ENDPOINT": "https://startup-probe.invalid",
+    "OPENAI_API_VERSION": "2024-06-01",
+}
+
+_PROBE = """
+import json, time
+{setup}
+start = time.perf_counter()
+{statement}
+print(json.dumps(time.perf_counter() - start))
+"""
+
+
+def _run(setup, statement, timeout):
+    env = {**_ENV, **os.environ}
+    code = _PROBE.format(setup=setup, statement=statement)
+    try:
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=REPO_ROOT,
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        return None
+    if result.returncode != 0:
+        return None
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _median(setup, statement, repeat, timeout):
+    samples = []
+    for _ in range(repeat):
+        seconds = _run(setup, statement, timeout)
+        if seconds is None:
+            return None
+        samples.append(seconds)
+    return statistics.median(samples)
+
+
+def measure_startup(repeat=3, timeout=60):
+    """
+    Returns the median import time of every module in MODULES and the median cost of every
+    call in FIRST_CALLS, in milliseconds. Probes that fail or time out (e.g. a first call
+    that needs an unreachable server) are left out.
+    """
+    results = {}
+    for module in MODULES:
+        seconds = _median("", f"import {module}", repeat, timeout)
+        if seconds is not None:
+            results[f"import.{module}_ms"] = seconds * 1000
+    for name, (setup, statement) in FIRST_CALLS.items():
+        seconds = _median(setup, statement, repeat, timeout)
+        if seconds is not None:
+            results[f"first_call.{name}_ms"] = seconds * 1000
+    return results
+
+
+def bench_startup(config):
+    return measure_startup(config["startup_repeat"], config["startup_timeout"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Runs per probe (median)."
+    )
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds per probe.")
+    parser.add_argument("--output", help="Also write the results to this JSON file.")
+    args = parser.parse_args(argv)
+    results = measure_startup(args.repeat, args.timeout)
+    for metric, value in results.items():
+        print(f"{metric:<40} {value:>10.1f}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""
+Benchmarks for the ingestion and answer pipelines, run against the offline stand-ins in
+benchmarks.fakes and the in-process NumpyVectorDBManager.
+"""
+
+import asyncio
+import time
+
+from loguru import logger
+
+from benchmarks.fakes import (
+    FakeChatModel,
+    FakeEmbeddings,
+    make_corpus,
+    make_questions,
+    make_web_search,
+)
+from benchmarks.metrics import stopwatch, summarize_latencies
+from benchmarks.startup import bench_startup
+from src.doc_loader import DocumentProcessor
+from src.graph_builder import GraphBuilder
+from src.numpy_vector_db import NumpyVectorDBManager
+from src.theme_extractor import ThemeKeywordsExtractor
+
+
+def required_encodings():
+    """
+    Returns the tiktoken encodings the suite loads: o200k_base for token counting (theme
+    extraction and rate-limit budgets) and the context packer, and the splitter's encoding
+    (gpt2, as in from_tiktoken_encoder).
+    """
+    from src.context_packer import ContextPacker
+    from src.text_splitter import ParallelTextSplitter
+
+    return sorted(
+        {
+            "o200k_base",
+            ContextPacker().encoding_name,
+            ParallelTextSplitter().encoding_name,
+        }
+    )
+
+
+def check_offline_requirements():
+    """
+    Token counting and splitting need tiktoken encoding files, which tiktoken downloads
+    once and then reads from its cache (TIKTOKEN_CACHE_DIR). Raises a RuntimeError naming
+    every encoding of required_encodings() that is not available, with instructions.
+    """
+    from src.utils import get_encoding
+
+    missing = []
+    for encoding_name in required_encodings():
+        try:
+            get_encoding(encoding_name)
+        except Exception:
+            missing.append(encoding_name)
+    if missing:
+        raise RuntimeError(
+            f"The tiktoken encodings {', '.join(missing)} are not cached. Run the suite once "
+            "with network access, or point TIKTOKEN_CACHE_DIR at a directory holding the "
+            "cached encodings."
+        )
+
+
+def _total(usage, suffix):
+    return sum(tokens for key, tokens in usage.items() if key.endswith(suffix))
+
+
+def bench_ingestion(config):
+    """
+    Theme/keyword extraction -> enrich -> split -> embed + insert for a synthetic corpus.
+    """
+    llm = FakeChatModel(
+        latency=config["llm_latency"], output_words=config["output_words"]
+    )
+    processor = DocumentProcessor(
+        llm,
+        theme_keywords_extractor=ThemeKeywordsExtractor(
+            llm, max_concurrency=config["llm_concurrency"]
+        ),
+    )
+    store = NumpyVectorDBManager(FakeEmbeddings(), "bench_ingestion")
+    processor.docs_list = make_corpus(config["n_docs"], config["words_per_doc"])
+    timings = {}
+    with stopwatch(timings, "total"):
+        with stopwatch(timings, "theme"):
+            asyncio.run(processor.extract_theme_keywords())
+        processor.enrich_metadata()
+        with stopwatch(timings, "split"):
+            chunks = processor.split_documents(chunk_size=config["chunk_size"])
+        with stopwatch(timings, "insert"):
+            for i in range(0, len(chunks), config["insert_batch_size"]):
+                store.add_documents(chunks[i : i + config["insert_batch_size"]])
+    n_docs = len(processor.docs_list)
+    return {
+        "docs_per_second": n_docs / timings["total"],
+        "theme_docs_per_second": n_docs / timings["theme"],
+        "split_docs_per_second": n_docs / timings["split"],
+        "split_chunks_per_second": len(chunks) / timings["split"],
+        "insert_chunks_per_second": len(chunks) / timings["insert"],
+        "chunks": len(chunks),
+        "theme_input_tokens_per_doc": _total(llm.usage, ".input_tokens") / n_docs,
+        "theme_output_tokens_per_doc": _total(llm.usage, ".output_tokens") / n_docs,
+    }
+
+
+def _build_store(config, name):
+    store = NumpyVectorDBManager(FakeEmbeddings(), name)
+    chunks = make_corpus(config["n_chunks"], config["words_per_chunk"], seed=2)
+    for chunk in chunks:
+        chunk.metadata.update(summary="", keywords="")
+    store.add_documents(chunks)
+    return store
+
+
+def bench_retrieval(config):
+    """
+    Single-query latency for both ranking methods, and batched multi-query throughput.
+    """
+    store = _build_store(config, "bench_retrieval")
+    questions = make_questions(config["n_queries"])
+    results = {}
+    for method in ("weighted", "rrf"):
+        samples = []
+        for question in questions:
+            start = time.perf_counter()
+            store.retrieve_similar(question, k=config["k"], method=method)
+            samples.append(time.perf_counter() - start)
+        results.update(summarize_latencies(samples, method))
+    timings = {}
+    with stopwatch(timings, "many"):
+        store.retrieve_many(questions, k=config["k"])
+    results["retrieve_many_queries_per_second"] = len(questions) / timings["many"]
+    return results
+
+
+def bench_graph(config):
+    """
+    Runs questions through the compiled graph and records per-node latency and token usage
+    per chain. The routing call runs on the START edge, so its latency is counted in the
+    first retriever node.
+    """
+    llm = FakeChatModel(
+        latency=config["llm_latency"], output_words=config["output_words"]
+    )
+    store = _build_store(config, "bench_graph")
+    graph = GraphBuilder(
+        llm,
+        store,
+        web_search_retriever=make_web_search(config["web_latency"]),
+        k=config["k"],
+    ).build()
+    node_samples, totals = {}, []
+    questions = make_questions(config["n_questions"], seed=3)
+    for question in questions:
+        start = last = time.perf_counter()
+        for update in graph.stream({"question": question}, stream_mode="updates"):
+            now = time.perf_counter()
+            for node in update:
+                node_samples.setdefault(node, []).append(now - last)
+            last = now
+        totals.append(time.perf_counter() - start)
+    results = summarize_latencies(totals, "question")
+    for node, samples in node_samples.items():
+        results.update(summarize_latencies(samples, f"node.{node}"))
+    for key, tokens in llm.usage.items():
+        results[f"tokens_per_question.{key}"] = tokens / len(questions)
+    return results
+
+
+BENCHMARKS = {
+    "ingestion": bench_ingestion,
+    "retrieval": bench_retrieval,
+    "graph": bench_graph,
+    "startup": bench_startup,
+}
+
+DEFAULT_CONFIG = {
+    "llm_latency": 0.0,
+    "llm_concurrency": 8,
+    "output_words": 30,
+    "web_latency": 0.0,
+    "n_docs": 50,
+    "words_per_doc": 2000,
+    "chunk_size": 1000,
+    "insert_batch_size": 256,
+    "n_chunks": 2000,
+    "words_per_chunk": 200,
+    "n_queries": 200,
+    "n_questions": 20,
+    "k": 5,
+    "startup_repeat": 3,
+    "startup_timeout": 60,
+}
+
+
+def run_suite(names=None, config=None):
+    """
+    Runs the selected benchmarks and returns their metrics flattened to "<benchmark>.<metric>".
+    """
+    check_offline_requirements()
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    results = {}
+    for name in names or BENCHMARKS:
+        logger.info(f"Running benchmark '{name}'.")
+        for metric, value in BENCHMARKS[name](config).items():
+            results[f"{name}.{metric}"] = value
+    return results
@@ -0,0 +1,536 @@
+"""
+Batch Runner Module
+This module runs the RAG pipeline over many questions at once, advancing all of them stage by
+stage with batched LLM calls and multi-query retrieval, and streams the results to JSONL.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional
+
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import END
+from loguru import logger
+
+from src.doc_grader import agrade_documents
+from src.graph_builder import GraphBuilder, validate_response
+from src.instrumentation import timed
+from src.rate_limiter import AsyncRateLimiter, ainvoke_with_limiter
+from src.utils import count_tokens
+
+# Expected completion tokens per call, counted against the tokens-per-minute budget.
+OUTPUT_TOKENS = {
+    "route": 20,
+    "grade": 20,
+    "rewrite": 100,
+    "summarize": 800,
+    "score": 30,
+}
+PROMPT_OVERHEAD_TOKENS = 600
+
+
+def question_id(question):
+    return hashlib.sha256(question.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class BatchRunStats:
+    """
+    A class to represent the outcome of a BatchQARunner run.
+    """
+
+    questions: int = 0
+    skipped: int = 0
+    completed: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+    calls: Counter = field(default_factory=Counter)
+    pre_router: Optional[dict] = None
+
+    @property
+    def questions_per_minute(self):
+        return (
+            60 * (self.completed + self.failed) / self.seconds if self.seconds else 0.0
+        )
+
+
+class BatchQARunner:
+    """
+    Answers many questions with the same route -> retrieve -> grade -> rewrite -> summarize ->
+    score logic as the graph. Instead of walking one question through the graph at a time,
+    the runner keeps a window of questions in flight and, on every round, runs each stage
+    once for all the questions waiting on it:
+        - LLM stages go through chain.abatch with max_concurrency, every call passing the
+          shared AsyncRateLimiter.
+        - Vector retrieval for all questions of a round is one aretrieve_many call.
+        - Web searches of a round run through the retriever's abatch.
+        - With a grounding_analyzer (passed on to GraphBuilder), only the responses it
+          cannot decide locally, plus its audit_rate sample of the decided ones, are sent
+          to the scorer chain.
+        - With a multi_query_retriever (passed on to GraphBuilder), the rewrite stage
+          rewrites every question into several queries and searches all queries of the
+          round in one retrieve_many call, fusing the results per question.
+        - With a pre_router (passed on to GraphBuilder), the route stage only sends the
+          questions its local classifier cannot decide to the router chain; its stats() are
+          reported in BatchRunStats.pre_router.
+        - With per_document_grading (passed on to GraphBuilder), the grade stage grades
+          every document of the round in its own call and keeps only the relevant ones.
+    Finished questions are appended to the output JSONL at once. On restart, questions that
+    already have a successful line in the file are skipped.
+
+    Args:
+        llm: The language model used by every chain.
+        vector_db_manager: VectorDBManager (or NumpyVectorDBManager) used for vector retrieval.
+        web_search_retriever: Retriever returning Tavily-style results; defaults as in GraphBuilder.
+        context_packer: ContextPacker bounding the grader, summarizer and scorer contexts.
+        k: Number of documents retrieved per question.
+        window_size: Maximum number of questions in flight.
+        max_concurrency: Maximum concurrent calls per stage batch.
+        requests_per_minute: Optional requests-per-minute budget shared by all LLM calls.
+        tokens_per_minute: Optional tokens-per-minute budget shared by all LLM calls.
+        max_retries: Attempts per LLM call on rate-limit or transient errors.
+        graph_kwargs: Further GraphBuilder arguments (iteration limits, acceptance_score,
+            grounding_analyzer, multi_query_retriever, pre_router, per_document_grading).
+    """
+
+    def __init__(
+        self,
+        llm,
+        vector_db_manager,
+        web_search_retriever=None,
+        context_packer=None,
+        k=5,
+        window_size=256,
+        max_concurrency=16,
+        requests_per_minute=None,
+        tokens_per_minute=None,
+        max_retries=5,
+        **graph_kwargs,
+    ):
+        self.builder = GraphBuilder(
+            llm,
+            vector_db_manager,
+            web_search_retriever=web_search_retriever,
+            context_packer=context_packer,
+            k=k,
+            **graph_kwargs,
+        )
+        self.vector_db_manager = vector_db_manager
+        self.k = k
+        self.window_size = window_size
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.stats = BatchRunStats()
+
+    def _limited(self, chain, stage):
+        """
+        Wraps a chain so each call waits for the shared rate limiter and is retried on
+        rate-limit errors.
+        """
+
+        async def call(inputs):
+            tokens = (
+                sum(count_tokens(v) for v in inputs.values() if isinstance(v, str))
+                + PROMPT_OVERHEAD_TOKENS
+                + OUTPUT_TOKENS[stage]
+            )
+            return await ainvoke_with_limiter(
+                self.limiter, chain, inputs, tokens=tokens, max_retries=self.max_retries
+            )
+
+        return RunnableLambda(call)
+
+    def _route_chain(self):
+        """
+        Returns the route stage chain: the rate-limited router chain, used as the pre-router's
+        fallback when a pre-router is set.
+        """
+        router_chain = self._limited(self.builder.question_router_chain, "route")
+        pre_router = self.builder.pre_router
+        if pre_router is None:
+            return router_chain
+
+        async def route(inputs):
+            return await pre_router.aroute(inputs["query"], router_chain=router_chain)
+
+        return RunnableLambda(route)
+
+    async def _abatch(self, stage, inputs):
+        self.stats.calls[stage] += len(inputs)
+        return await self.chains[stage].abatch(
+            inputs,
+            config={"max_concurrency": self.max_concurrency},
+            return_exceptions=True,
+        )
+
+    @staticmethod
+    def _fail(item, stage, error):
+        item["stage"] = END
+        item["error"] = f"{stage}: {type(error).__name__}: {error}"
+
+    @timed("batch.route")
+    async def _route(self, items):
+        results = await self._abatch(
+            "route", [{"query": item["question"]} for item in items]
+        )
+        for item, op in zip(items, results):
+            if isinstance(op, Exception):
+                self._fail(item, "route", op)
+                continue
+            item["route"] = op.source
+            item["stage"] = "vector" if op.source == "vector_retriever" else "web"
+
+    @timed("batch.vector")
+    async def _retrieve_vector(self, items):
+        queries = [self._question(item) for item in items]
+        try:
+            results = await self.vector_db_manager.aretrieve_many(queries, k=self.k)
+        except Exception as e:
+            for item in items:
+                self._fail(item, "vector", e)
+            return
+        self.stats.calls["vector"] += 1
+        for item, documents in zip(items, results):
+            item["documents"] = documents
+            item["stage"] = "grade"
+
+    @timed("batch.web")
+    async def _retrieve_web(self, items):
+        self.stats.calls["web"] += len(items)
+        results = await self.builder.web_search_retriever.abatch(
+            [item["question"] for item in items],
+            config={"max_concurrency": self.max_concurrency},
+            return_exceptions=True,
+        )
+        for item, result in zip(items, results):
+            if isinstance(result, Exception):
+                self._fail(item, "web", result)
+                continue
+            item["documents"] = self.builder._web_documents(result)
+            item["stage"] = "summarize"
+
+    @timed("batch.grade")
+    async def _grade(self, items):
+        if self.builder.per_document_grading:
+            await self._grade_per_document(items)
+            return
+        packer = self.builder.context_packer
+        inputs = [
+            {
+                "context": packer.pack(item["documents"], chain="grader").context,
+                "question": self._question(item),
+            }
+            for item in items
+        ]
+        results = await self._abatch("grade", inputs)
+        for item, op in zip(items, results):
+            if isinstance(op, Exception):
+                self._fail(item, "grade", op)
+                continue
+            self._graded(item, op.grade_score)
+
+    async def _grade_per_document(self, items):
+        self.stats.calls["grade"] += sum(len(item["documents"]) for item in items)
+        results = await asyncio.gather(
+            *(
+                agrade_documents(
+                    self.chains["grade"],
+                    self._question(item),
+                    item["documents"],
+                    max_concurrency=self.max_concurrency,
+                )
+                for item in items
+            ),
+            return_exceptions=True,
+        )
+        for item, grades in zip(items, results):
+            if isinstance(grades, Exception):
+                self._fail(item, "grade", grades)
+                continue
+            item["documents"] = grades.documents
+            self._graded(item, grades.grade_score)
+
+    def _graded(self, item, grade_score):
+        item["grade_score"] = grade_score
+        item["grading_iteration"] = item.get("grading_iteration", 0) + 1
+        decision = self.builder.decide_to_generate_rewrite(item)
+        item["stage"] = {"generate": "summarize", "rewrite": "rewrite"}.get(
+            decision, END
+        )
+
+    @timed("batch.rewrite")
+    async def _rewrite(self, items):
+        multi_query = self.builder.multi_query_retriever
+        contexts = self.builder.keyword_contexts([item["documents"] for item in items])
+        inputs = [
+            {
+                "context": context,
+                "question": item["question"] if multi_query else self._question(item),
+            }
+            for item, context in zip(items, contexts)
+        ]
+        results = await self._abatch("rewrite", inputs)
+        rewritten = []
+        for item, op in zip(items, results):
+            if isinstance(op, Exception):
+                self._fail(item, "rewrite", op)
+                continue
+            if multi_query is None:
+                item["rewritten_question"] = op.rewritten_query
+                item["stage"] = "vector"
+            else:
+                item["queries"] = multi_query.queries(item["question"], op.queries)
+                rewritten.append(item)
+        if rewritten:
+            await self._retrieve_fused(rewritten)
+
+    async def _retrieve_fused(self, items):
+        try:
+            results = await self.builder.multi_query_retriever.asearch_many(
+                [item["queries"] for item in items], k=self.k
+            )
+        except Exception as e:
+            for item in items:
+                self._fail(item, "vector", e)
+            return
+        self.stats.calls["vector"] += 1
+        for item, documents in zip(items, results):
+            item["documents"] = documents
+            item["stage"] = "grade"
+
+    @timed("batch.summarize")
+    async def _summarize(self, items):
+        packed = [
+            self.builder.context_packer.pack(item["documents"], chain="summarizer")
+            for item in items
+        ]
+        inputs = [
+            {
+                "context": p.context,
+                "question": self._question(item),
+                "citation": p.citation,
+            }
+            for item, p in zip(items, packed)
+        ]
+        results = await self._abatch("summarize", inputs)
+        for item, p, op in zip(items, packed, results):
+            if isinstance(op, Exception):
+                self._fail(item, "summarize", op)
+                continue
+            item["summary"] = op.summary
+            item["citation"] = op.citation
+            item["documents"] = p.documents
+            item["stage"] = "score"
+
+    @timed("batch.score")
+    async def _score(self, items):
+        packer = self.builder.context_packer
+        packed = [packer.pack(item["documents"], chain="scorer") for item in items]
+        inputs = [
+            {
+                "response": item["summary"],
+                "question": self._question(item),
+                "context": p.context,
+            }
+            for item, p in zip(items, packed)
+        ]
+        results = [None] * len(items)
+        analyses, audited = {}, []
+        analyzer = self.builder.grounding_analyzer
+        if analyzer is not None:
+            gathered = await asyncio.gather(
+                *(
+                    asyncio.to_thread(
+                        analyzer.analyze, inp["response"], p.documents, inp["question"]
+                    )
+                    for inp, p in zip(inputs, packed)
+                ),
+                return_exceptions=True,
+            )
+            for i, analysis in enumerate(gathered):
+                if isinstance(analysis, Exception):
+                    logger.warning(
+                        f"Grounding analysis failed, using the LLM scorer: {analysis!r}"
+                    )
+                    continue
+                if not analysis.decisive:
+                    analyzer.record(analysis)
+                    continue
+                results[i] = analysis.response
+                analyses[i] = analysis
+                # Audited responses join the LLM scorer batch to measure agreement.
+                if random.random() < analyzer.audit_rate:
+                    audited.append(i)
+                else:
+                    analyzer.record(analysis)
+        pending = [i for i, op in enumerate(results) if op is None]
+        if pending or audited:
+            llm_results = await self._abatch(
+                "score", [inputs[i] for i in pending + audited]
+            )
+            for i, op in zip(pending + audited, llm_results):
+                if i in analyses:
+                    analyzer.record(
+                        analyses[i], None if isinstance(op, Exception) else op
+                    )
+                else:
+                    results[i] = op
+        for item, op in zip(items, results):
+            if isinstance(op, Exception):
+                self._fail(item, "score", op)
+                continue
+            item["hallucination"] = op.hallucination
+            item["response_score"] = op.response_score
+            item["hallucination_iteration"] = item.get("hallucination_iteration", 0) + 1
+            decision = self.builder.decide_to_accept_reject(item)
+            item["stage"] = "rewrite" if decision == "rewrite_try" else END
+
+    @staticmethod
+    def _question(item):
+        return item.get("rewritten_question") or item["question"]
+
+    @staticmethod
+    def _read_done(output_path):
+        done = set()
+        if not os.path.exists(output_path):
+            return done
+        with open(output_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if not record.get("error"):
+                    done.add(record["id"])
+        return done
+
+    @staticmethod
+    def _record(item):
+        record = validate_response(
+            {
+                key: item.get(key)
+                for key in (
+                    "id",
+                    "question",
+                    "route",
+                    "rewritten_question",
+                    "queries",
+                    "grade_score",
+                    "summary",
+                    "citation",
+                    "hallucination",
+                    "response_score",
+                    "grading_iteration",
+                    "hallucination_iteration",
+                    "error",
+                )
+            }
+        )
+        record["sources"] = [
+            doc.metadata.get("source") for doc in item.get("documents", [])
+        ]
+        return record
+
+    async def arun(self, questions, output_path):
+        """
+        Input: List of questions, either strings or dicts with "question" and optionally "id",
+        and the JSONL output path.
+        Output: BatchRunStats. Every question gets one line in the output; a failed question's
+        line has an "error" and is retried on the next run, and later lines for an id
+        supersede earlier ones.
+        """
+        self.limiter = AsyncRateLimiter(
+            max_concurrency=self.max_concurrency,
+            requests_per_minute=self.requests_per_minute,
+            tokens_per_minute=self.tokens_per_minute,
+        )
+        self.chains = {
+            "route": self._route_chain(),
+            "grade": self._limited(self.builder.doc_grader_chain, "grade"),
+            "rewrite": self._limited(
+                (
+                    self.builder.query_rewrite_chain
+                    if self.builder.multi_query_retriever is None
+                    else self.builder.multi_query_retriever.rewrite_chain
+                ),
+                "rewrite",
+            ),
+            "summarize": self._limited(self.builder.summarizer_chain, "summarize"),
+            "score": self._limited(self.builder.scorer_chain, "score"),
+        }
+        stages = {
+            "route": self._route,
+            "vector": self._retrieve_vector,
+            "web": self._retrieve_web,
+            "grade": self._grade,
+            "rewrite": self._rewrite,
+            "summarize": self._summarize,
+            "score": self._score,
+        }
+        done = self._read_done(output_path)
+        self.stats = BatchRunStats(questions=len(questions))
+        pending = []
+        for question in questions:
+            if isinstance(question, str):
+                question = {"question": question}
+            item = {**question, "stage": "route"}
+            item.setdefault("id", question_id(item["question"]))
+            if item["id"] in done:
+                self.stats.skipped += 1
+            else:
+                pending.append(item)
+        pending.reverse()
+        if os.path.dirname(output_path):
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+        start = time.perf_counter()
+        active = []
+        with open(output_path, "a", encoding="utf-8") as f:
+            while pending or active:
+                while pending and len(active) < self.window_size:
+                    active.append(pending.pop())
+                groups = {}
+                for item in active:
+                    groups.setdefault(item["stage"], []).append(item)
+                await asyncio.gather(
+                    *(stages[stage](items) for stage, items in groups.items())
+                )
+                still_active = []
+                for item in active:
+                    if item["stage"] != END:
+                        still_active.append(item)
+                        continue
+                    f.write(json.dumps(self._record(item)) + "\n")
+                    if item.get("error"):
+                        self.stats.failed += 1
+                    else:
+                        self.stats.completed += 1
+                f.flush()
+                active = still_active
+        self.stats.seconds = time.perf_counter() - start
+        if self.builder.pre_router is not None:
+            self.stats.pre_router = self.builder.pre_router.stats()
+            logger.info(
+                f"Pre-router decided {self.stats.pre_router['short_circuit_rate']:.0%} "
+                f"of the routes locally."
+            )
+        logger.info(
+            f"Answered {self.stats.completed} questions ({self.stats.failed} failed, "
+            f"{self.stats.skipped} already done) in {self.stats.seconds:.1f}s, "
+            f"{self.stats.questions_per_minute:.1f} questions/minute."
+        )
+        return self.stats
+
+    def run(self, questions, output_path):
+        """
+        Synchronous wrapper around arun.
+        """
+        return asyncio.run(self.arun(questions, output_path))
@@ -0,0 +1,179 @@
+"""
+Context Packer Module
+This module builds the `context` and `citation` strings passed to the summarizer and scorer
+chains within a per-chain token budget.
+"""
+
+import re
+from dataclasses import dataclass, field
+
+from langchain_core.documents import Document
+
+from src.utils import count_tokens, get_encoding
+
+DEFAULT_BUDGETS = {
+    "grader": 8000,
+    "summarizer": 6000,
+    "scorer": 6000,
+}
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def format_context(documents):
+    """
+    Joins the documents' content as "Content idx: i - ..." entries, the format the graph
+    nodes pass to the grader, summarizer and scorer chains.
+    """
+    return "\n\n".join(
+        f"Content idx: {i} - {doc.page_content}" for i, doc in enumerate(documents)
+    )
+
+
+def format_citation(documents):
+    """
+    Joins the documents' sources as "Source idx: i - ..." entries aligned with format_context.
+    """
+    return "\n\n".join(
+        f"Source idx: {i} - {doc.metadata.get('source', '')}"
+        for i, doc in enumerate(documents)
+    )
+
+
+def format_keywords(documents):
+    """
+    Joins the documents' keywords as "Keywords set: i - (...)" entries for the query rewriter.
+    """
+    return ",\n".join(
+        f"Keywords set: {i} - ({doc.metadata.get('keywords', '')})"
+        for i, doc in enumerate(documents)
+    )
+
+
+def _shingles(text, size):
+    words = _WORD_PATTERN.findall(text.lower())
+    if len(words) <= size:
+        return {tuple(words)}
+    return {tuple(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+@dataclass
+class PackedContext:
+    """
+    A class to represent a packed prompt context.
+    documents holds the packed documents in prompt order; context and citation are built
+    from them, so "Content idx: i" and "Source idx: i" refer to the same document.
+    """
+
+    documents: list[Document] = field(default_factory=list)
+    context: str = ""
+    citation: str = ""
+    tokens: int = 0
+    duplicates: int = 0
+    dropped: int = 0
+    truncated: bool = False
+
+
+class ContextPacker:
+    """
+    Packs retrieved documents into a prompt context of bounded size:
+        1. Documents are ranked by retrieval score, best first. The score is read from the
+           `scores` argument or the `score_key` metadata field; without either, the
+           retrieval order is kept.
+        2. Near-duplicates (word shingle Jaccard similarity >= dedup_threshold with a
+           higher-ranked document) are dropped.
+        3. Documents are added in rank order while the chain's token budget allows. If not
+           even the best document fits, it is truncated to the budget.
+
+    Args:
+        budgets: Token budget per chain name, merged over DEFAULT_BUDGETS.
+        default_budget: Budget for chains without an entry in budgets.
+        dedup_threshold: Jaccard similarity above which two chunks count as duplicates.
+        shingle_size: Number of words per shingle.
+        score_key: Metadata field holding the retrieval score.
+        encoding_name: tiktoken encoding used to count tokens.
+    """
+
+    def __init__(
+        self,
+        budgets=None,
+        default_budget=6000,
+        dedup_threshold=0.8,
+        shingle_size=3,
+        score_key="score",
+        encoding_name="o200k_base",
+    ):
+        self.budgets = {**DEFAULT_BUDGETS, **(budgets or {})}
+        self.default_budget = default_budget
+        self.dedup_threshold = dedup_threshold
+        self.shingle_size = shingle_size
+        self.score_key = score_key
+        self.encoding_name = encoding_name
+
+    def budget(self, chain):
+        return self.budgets.get(chain, self.default_budget)
+
+    def _rank(self, documents, scores):
+        if scores is None:
+            scores = [doc.metadata.get(self.score_key) for doc in documents]
+        if any(score is None for score in scores):
+            return list(documents)
+        order = sorted(range(len(documents)), key=lambda i: -scores[i])
+        return [documents[i] for i in order]
+
+    def deduplicate(self, documents):
+        """
+        Returns the documents without near-duplicates of an earlier document, and the
+        number of documents dropped.
+        """
+        kept, kept_shingles = [], []
+        for doc in documents:
+            shingles = _shingles(doc.page_content, self.shingle_size)
+            if any(
+                len(shingles & other) / len(shingles | other) >= self.dedup_threshold
+                for other in kept_shingles
+            ):
+                continue
+            kept.append(doc)
+            kept_shingles.append(shingles)
+        return kept, len(documents) - len(kept)
+
+    def _truncate(self, doc, max_tokens):
+        encoding = get_encoding(self.encoding_name)
+        tokens = encoding.encode(doc.page_content, disallowed_special=())
+        return Document(
+            page_content=encoding.decode(tokens[:max_tokens]),
+            metadata=dict(doc.metadata),
+            id=doc.id,
+        )
+
+    def pack(self, documents, chain="summarizer", scores=None):
+        """
+        Input: List of retrieved documents, the chain the context is for, optional scores
+        aligned with the documents.
+        Output: PackedContext within the chain's token budget.
+        """
+        budget = self.budget(chain)
+        ranked, duplicates = self.deduplicate(self._rank(documents, scores))
+        packed, used, truncated = [], 0, False
+        for doc in ranked:
+            entry = f"Content idx: {len(packed)} - {doc.page_content}"
+            tokens = count_tokens(entry, self.encoding_name) + (1 if packed else 0)
+            if used + tokens <= budget:
+                packed.append(doc)
+                used += tokens
+            elif not packed:
+                prefix_tokens = count_tokens("Content idx: 0 - ", self.encoding_name)
+                packed.append(self._truncate(doc, max(budget - prefix_tokens, 0)))
+                used = budget
+                truncated = True
+        context = format_context(packed)
+        return PackedContext(
+            documents=packed,
+            context=context,
+            citation=format_citation(packed),
+            tokens=count_tokens(context, self.encoding_name),
+            duplicates=duplicates,
+            dropped=len(ranked) - len(packed),
+            truncated=truncated,
+        )
@@ -3,8 +3,10 @@ Document Grader Module
 This module provides functionality to assess the relevance of retrieved documents
 """
 
+from dataclasses import dataclass, field
 from pydantic import BaseModel, Field
 from typing import Literal
+from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate
 
 
@@ -70,3 +72,93 @@ def get_doc_grader_chain(llm):
     """
     structured_llm_grader = llm.with_structured_output(schema=GradingDocuments)
     return grader_prompt_template | structured_llm_grader
+
+
+@dataclass
+class DocumentGrades:
+    """
+    A class to represent per-document grading results.
+    labels holds one relevance label per input document, documents the documents kept
+    after pruning, and grade_score the aggregate label for the kept set.
+    """
+
+    labels: list[str] = field(default_factory=list)
+    documents: list[Document] = field(default_factory=list)
+    grade_score: str = "no_relevance"
+
+
+def aggregate_grade_score(labels):
+    """
+    Combines per-document labels into one GradingDocuments label: full_relevance if any
+    document is fully relevant, else partial_relevance if any is partially relevant,
+    else no_relevance.
+    """
+    if "full_relevance" in labels:
+        return "full_relevance"
+    if "partial_relevance" in labels:
+        return "partial_relevance"
+    return "no_relevance"
+
+
+def _per_document_inputs(question, documents):
+    return [
+        {"context": f"Content idx: 0 - {doc.page_content}", "question": question}
+        for doc in documents
+    ]
+
+
+def _build_grades(documents, results, keep):
+    # A chunk whose grading failed is kept as partially relevant rather than dropped.
+    labels = [
+        "partial_relevance" if isinstance(r, Exception) else r.grade_score
+        for r in results
+    ]
+    kept = [doc for doc, label in zip(documents, labels) if label in keep]
+    kept_labels = [label for label in labels if label in keep]
+    return DocumentGrades(
+        labels=labels, documents=kept, grade_score=aggregate_grade_score(kept_labels)
+    )
+
+
+async def agrade_documents(
+    grader_chain,
+    question,
+    documents,
+    max_concurrency=5,
+    keep=("full_relevance", "partial_relevance"),
+):
+    """
+    Grade each retrieved document on its own, running at most max_concurrency grading calls at once.
+    Args:
+        grader_chain: A chain created by get_doc_grader_chain.
+        question: The user question.
+        documents: The retrieved documents.
+        max_concurrency: Maximum number of concurrent grading calls.
+        keep: Labels of the documents kept in the pruned list.
+    Returns:
+        DocumentGrades with a label per document, the pruned documents and the aggregate grade_score.
+    """
+    results = await grader_chain.abatch(
+        _per_document_inputs(question, documents),
+        config={"max_concurrency": max_concurrency},
+        return_exceptions=True,
+    )
+    return _build_grades(documents, results, keep)
+
+
+def grade_documents(
+    grader_chain,
+    question,
+    documents,
+    max_concurrency=5,
+    keep=("full_relevance", "partial_relevance"),
+):
+    """
+    Synchronous version of agrade_documents; the grading calls run on a thread pool.
+    """
+    results = grader_chain.batch(
+        _per_document_inputs(question, documents),
+        config={"max_concurrency": max_concurrency},
+        return_exceptions=True,
+    )
+    return _build_grades(documents, results, keep)
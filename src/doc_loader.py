@@ -1,80 +1,276 @@
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import WebBaseLoader
-from src.theme_generation import get_theme_keywords_chain
-import asyncio
+from src.theme_extractor import ThemeKeywordsExtractor
+from src.web_fetcher import AsyncWebFetcher, build_document
+from src.fetch_cache import CacheEntry, content_hash
+from src.instrumentation import record_cache, timed
+from src.parent_store import CHUNK_FIELDS, make_parent_id
+from src.text_splitter import ParallelTextSplitter
 
 
 class DocumentProcessor:
-    def __init__(self, llm):
+    def __init__(
+        self,
+        llm,
+        theme_keywords_extractor=None,
+        fetch_cache=None,
+        split_workers=None,
+        split_offsets=False,
+        parent_store=None,
+    ):
+        """
+        Input:
+            llm: language model used for theme/keyword extraction
+            theme_keywords_extractor: optional ThemeKeywordsExtractor to control concurrency,
+                rate limits and prompt packing (defaults to one built from llm)
+            fetch_cache: optional FetchCache; when set, unchanged pages are skipped
+            split_workers: worker processes used to split documents (defaults to the
+                number of CPUs; 1 splits in-process)
+            split_offsets: add each chunk's character and token span in its page to the
+                chunk metadata (start_index, end_index, start_token, end_token)
+            parent_store: optional ParentStore; when set, enrichment moves each document's
+                metadata (title, description, language, summary, keywords) into it and leaves
+                only source, parent_id and the store's chunk_fields on the document, so
+                chunks do not repeat it
+        """
         self.llm = llm
-        self.theme_keywords_chain = get_theme_keywords_chain(llm)
+        self.theme_keywords_extractor = (
+            theme_keywords_extractor or ThemeKeywordsExtractor(llm)
+        )
         self.docs_list = []
         self.theme_keywords_results = []
+        self.failed_urls = {}
+        self.fetch_cache = fetch_cache
+        self.unchanged_urls = []
+        self._pending_cache_entries = {}
+        self.split_workers = split_workers
+        self.split_offsets = split_offsets
+        self.parent_store = parent_store
+        self._text_splitters = {}
 
     def load_documents(self, urls):
         """
         Input: List of URLs
         Output: List of loaded documents (self.docs_list)
         """
+        from langchain_community.document_loaders import WebBaseLoader
+
         docs = [WebBaseLoader(url).load() for url in urls]
         self.docs_list = [item for sublist in docs for item in sublist]
         print(f"Loaded {len(self.docs_list)} documents from {len(urls)} URLs.")
         return self.docs_list
 
-    async def extract_theme_keywords(self):
+    @timed("ingestion.load")
+    async def aload_documents(
+        self, urls, max_concurrency=20, requests_per_host=2.0, timeout=30, refresh=False
+    ):
         """
-        Input: Uses self.docs_list
-        Output: List of theme/keyword results (self.theme_keywords_results)
+        Input: List of URLs
+        Output: List of loaded documents (self.docs_list)
+
+        Fetches the URLs concurrently over a shared connection pool, with at most
+        `max_concurrency` requests in flight and `requests_per_host` requests per second
+        to any one host. URLs that fail are recorded in self.failed_urls and skipped.
+
+        With a fetch cache, conditional requests are sent and pages that come back
+        304 Not Modified or with an unchanged content hash are left out of self.docs_list
+        and listed in self.unchanged_urls instead. `refresh=True` reloads every page.
         """
+        use_cache = self.fetch_cache is not None and not refresh
+        headers = (
+            {url: self.fetch_cache.conditional_headers(url) for url in urls}
+            if use_cache
+            else None
+        )
+        async with AsyncWebFetcher(
+            max_concurrency=max_concurrency,
+            requests_per_host=requests_per_host,
+            timeout=timeout,
+        ) as fetcher:
+            results = await fetcher.fetch_all(urls, headers=headers)
+
+        self.failed_urls = {}
+        self.unchanged_urls = []
+        self._pending_cache_entries = {}
+        self.docs_list = []
+        for r in results:
+            doc, pending = self._document_from_result(r, use_cache)
+            if doc is not None:
+                self.docs_list.append(doc)
+            if pending is not None:
+                self._pending_cache_entries[r.url] = pending
+        print(
+            f"Loaded {len(self.docs_list)} documents from {len(urls)} URLs "
+            f"({len(self.unchanged_urls)} unchanged, {len(self.failed_urls)} failed)."
+        )
+        return self.docs_list
 
-        async def process(doc):
-            return await self.theme_keywords_chain.ainvoke(
-                {"page_content": doc.page_content}
+    def _document_from_result(self, result, use_cache):
+        """
+        Input: FetchResult and whether the fetch cache is consulted
+        Output: (document, pending cache entry) for a page that needs processing, or
+        (None, None) for a failed or unchanged page, which is recorded in
+        self.failed_urls or self.unchanged_urls.
+        """
+        if not result.ok:
+            self.failed_urls[result.url] = result.error
+            return None, None
+        pending = None
+        if self.fetch_cache is not None:
+            cached = self.fetch_cache.get(result.url) if use_cache else None
+            if result.status == 304:
+                if cached is None:
+                    self.failed_urls[result.url] = "HTTP 304 without a cached copy"
+                else:
+                    self.unchanged_urls.append(result.url)
+                    record_cache("fetch", "hit")
+                return None, None
+            body_hash = content_hash(result.body)
+            if cached is not None and cached.content_hash == body_hash:
+                self.unchanged_urls.append(result.url)
+                record_cache("fetch", "hit")
+                return None, None
+            if use_cache:
+                record_cache("fetch", "miss")
+            pending = CacheEntry(
+                url=result.url,
+                content_hash=body_hash,
+                etag=result.headers.get("etag"),
+                last_modified=result.headers.get("last-modified"),
             )
+        return build_document(result.url, result.body), pending
 
-        self.theme_keywords_results = await asyncio.gather(
-            *(process(doc) for doc in self.docs_list)
+    @timed("ingestion.theme_keywords")
+    async def extract_theme_keywords(self):
+        """
+        Input: Uses self.docs_list
+        Output: List of theme/keyword results (self.theme_keywords_results), aligned with
+        self.docs_list. Documents whose extraction failed get None.
+        """
+        self.theme_keywords_results = await self.theme_keywords_extractor.aextract(
+            self.docs_list
         )
         return self.theme_keywords_results
 
     def enrich_metadata(self):
         """
         Input: Uses self.docs_list and self.theme_keywords_results
-        Output: Updates self.docs_list in-place with 'summary' and 'keywords' in metadata
+        Output: Updates self.docs_list in-place with 'summary' and 'keywords' in metadata.
+        Documents without a result get empty values so every chunk has the same fields.
+        With a parent store, the enriched metadata is written to it in one transaction and
+        the documents keep only source, parent_id and the store's chunk_fields.
         """
-        for i, doc in enumerate(self.docs_list):
-            doc.metadata["summary"] = self.theme_keywords_results[i].summary
-            doc.metadata["keywords"] = " ".join(self.theme_keywords_results[i].keywords)
+        docs = self.docs_list[: len(self.theme_keywords_results)]
+        self.enrich_documents(docs, self.theme_keywords_results)
         return self.docs_list
 
-    def split_documents(self, chunk_size=1000, chunk_overlap=0):
+    def enrich_documents(self, docs, results, store_parents=True):
         """
-        Input: Uses self.docs_list
+        Input: Documents and their theme/keyword results (None for failed extractions)
+        Output: The same documents with 'summary' and 'keywords' in metadata. With
+        store_parents=True their parents are also stored (see store_parents); pass False
+        to batch that step over more documents.
+        """
+        for doc, result in zip(docs, results):
+            self._add_theme_keywords(doc, result)
+        if store_parents:
+            self.store_parents(docs)
+        return docs
+
+    @staticmethod
+    def _add_theme_keywords(doc, result):
+        doc.metadata["summary"] = result.summary if result else ""
+        doc.metadata["keywords"] = " ".join(result.keywords) if result else ""
+
+    def store_parents(self, docs):
+        """
+        Moves the document-level metadata of docs into the parent store, if one is set, in
+        one transaction. The documents keep source, parent_id and the store's chunk_fields.
+        """
+        if self.parent_store is None or not docs:
+            return docs
+        parents = {}
+        for doc in docs:
+            parent_id = make_parent_id(doc.metadata["source"])
+            parents[parent_id] = {
+                key: value
+                for key, value in doc.metadata.items()
+                if key not in CHUNK_FIELDS
+            }
+            doc.metadata = self.parent_store.chunk_metadata(doc.metadata, parent_id)
+        self.parent_store.put_many(parents)
+        return docs
+
+    def _get_text_splitter(self, chunk_size, chunk_overlap):
+        key = (chunk_size, chunk_overlap)
+        if key not in self._text_splitters:
+            self._text_splitters[key] = ParallelTextSplitter(
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                max_workers=self.split_workers,
+                add_offsets=self.split_offsets,
+            )
+        return self._text_splitters[key]
+
+    @timed("ingestion.split")
+    def split_documents(self, chunk_size=1000, chunk_overlap=0, docs=None):
+        """
+        Input: Uses self.docs_list, or docs if given
         Output: List of split document chunks
         """
-        text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-            chunk_size=chunk_size, chunk_overlap=chunk_overlap
+        text_splitter = self._get_text_splitter(chunk_size, chunk_overlap)
+        doc_splits = text_splitter.split_documents(
+            self.docs_list if docs is None else docs
         )
-        doc_splits = text_splitter.split_documents(self.docs_list)
         print(f"Split into {len(doc_splits)} chunks.")
         return doc_splits
 
-    async def process_all(self, urls, chunk_size=1000, chunk_overlap=0):
+    def commit_fetch_cache(self):
+        """
+        Input: Uses self.docs_list and self.theme_keywords_results
+        Output: Writes the fetched pages' entries to the fetch cache. Pages whose theme/keyword
+        extraction failed are not cached, so they are processed again on the next run.
+        """
+        if self.fetch_cache is None:
+            return
+        for doc, result in zip(self.docs_list, self.theme_keywords_results):
+            entry = self._pending_cache_entries.pop(doc.metadata["source"], None)
+            if entry is None or result is None:
+                continue
+            entry.summary = result.summary
+            entry.keywords = " ".join(result.keywords)
+            self.fetch_cache.put(entry)
+
+    @timed("ingestion.process_all")
+    async def process_all(
+        self, urls, chunk_size=1000, chunk_overlap=0, max_concurrency=20, refresh=False
+    ):
         """
         Public method to run the full pipeline:
-        1. Load documents from URLs
+        1. Load documents from URLs (concurrently, see aload_documents)
         2. Extract theme keywords
         3. Enrich metadata
         4. Split documents
+        5. Record processed pages in the fetch cache, if one is configured
 
         Input:
             urls: list of URLs
             chunk_size: int (default 1000)
             chunk_overlap: int (default 0)
+            max_concurrency: int (default 20), maximum concurrent URL fetches
+            refresh: bool (default False), ignore the fetch cache and reprocess every page
         Output:
-            doc_splits: list of split document chunks
+            doc_splits: list of split document chunks. With a fetch cache, only pages that
+            changed since the last run are split; unchanged ones are in self.unchanged_urls.
         """
-        self.load_documents(urls)
+        await self.aload_documents(
+            urls, max_concurrency=max_concurrency, refresh=refresh
+        )
+        if not self.docs_list:
+            self.theme_keywords_results = []
+            return []
         await self.extract_theme_keywords()
         self.enrich_metadata()
-        return self.split_documents(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        doc_splits = self.split_documents(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap
+        )
+        self.commit_fetch_cache()
+        return doc_splits
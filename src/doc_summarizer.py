@@ -3,8 +3,14 @@ Document Summarizer Module
 This module provides functionality to summarize the content of retrieved documents
 """
 
-from pydantic import BaseModel, Field
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from loguru import logger
+from pydantic import BaseModel, Field, ValidationError
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.utils.function_calling import convert_to_openai_tool
 
 
 class SummarizedResponse(BaseModel):
@@ -49,6 +55,22 @@ Citations: <Citation identifiers matching the order and origin of the retrieved
 """
 
 
+summarizer_prompt_template = ChatPromptTemplate(
+    messages=[
+        {
+            "role": "user",
+            "content": system_prompt_summarizer,
+        },
+        {
+            "role": "human",
+            "content": """Given the following retrieved set of document{context}, citations {citation} and user question {question}, summarize the response to provide a concise answer to the user's question.""",
+        },
+    ],
+    input_variables=["context", "question"],
+    partial_variables={},
+)
+
+
 def get_doc_summarizer_chain(llm):
     """
     Create a document summarization chain using the provided language model (llm).
@@ -60,18 +82,81 @@ def get_doc_summarizer_chain(llm):
 
     """
     structured_llm_summarizer = llm.with_structured_output(schema=SummarizedResponse)
-    summarizer_prompt_template = ChatPromptTemplate(
-        messages=[
-            {
-                "role": "user",
-                "content": system_prompt_summarizer,
-            },
-            {
-                "role": "human",
-                "content": """Given the following retrieved set of document{context}, citations {citation} and user question {question}, summarize the response to provide a concise answer to the user's question.""",
-            },
-        ],
-        input_variables=["context", "question"],
-        partial_variables={},
+    return summarizer_prompt_template | structured_llm_summarizer
+
+
+def get_doc_summarizer_stream_chain(llm):
+    """
+    Create a streaming variant of the document summarization chain.
+    Args:
+        llm: The language model to be used for summarizing documents.
+    Returns:
+        A chain with the same input as get_doc_summarizer_chain whose stream/astream yields
+        the SummarizedResponse fields as a growing partial dict. The schema is bound as a
+        function call with a dict schema, which lets the tool-call parser emit partial output
+        while the arguments are still being generated.
+    """
+    structured_llm_summarizer = llm.with_structured_output(
+        schema=convert_to_openai_tool(SummarizedResponse), method="function_calling"
     )
     return summarizer_prompt_template | structured_llm_summarizer
+
+
+@dataclass
+class SummaryStreamResult:
+    """
+    A class to represent the outcome of a streamed summarization.
+    response is the validated SummarizedResponse once the stream is complete; fields the
+    stream never produced are empty strings, as in the non-streaming summarizer node.
+    """
+
+    response: Optional[SummarizedResponse] = None
+    first_token_seconds: Optional[float] = None
+    total_seconds: float = 0.0
+
+
+async def astream_summary(stream_chain, inputs, result=None):
+    """
+    Stream a summary from a chain created by get_doc_summarizer_stream_chain.
+    Args:
+        stream_chain: The streaming summarizer chain.
+        inputs: The chain input (context, citation, question).
+        result: Optional SummaryStreamResult filled in with the final response and timings.
+    Yields:
+        (field, text) tuples: ("summary", delta) for every new piece of the summary, and
+        (field, value) once for every other field when it is complete.
+    """
+    result = result if result is not None else SummaryStreamResult()
+    start = time.perf_counter()
+    emitted, completed, last = 0, {}, {}
+    async for partial in stream_chain.astream(inputs):
+        if not isinstance(partial, dict):
+            continue
+        last = partial
+        summary = partial.get("summary") or ""
+        if len(summary) > emitted:
+            if result.first_token_seconds is None:
+                result.first_token_seconds = time.perf_counter() - start
+            yield "summary", summary[emitted:]
+            emitted = len(summary)
+        # A field is complete once the model has moved on to a later one.
+        keys = list(partial)
+        for key in keys[:-1]:
+            if key != "summary" and key not in completed:
+                completed[key] = partial[key]
+                yield key, partial[key]
+    for key, value in last.items():
+        if key != "summary" and key not in completed:
+            yield key, value
+    for field in SummarizedResponse.model_fields:
+        if not last.get(field):
+            logger.warning(f"The summary stream ended without a {field}.")
+    try:
+        result.response = SummarizedResponse.model_validate(
+            {field: last.get(field) or "" for field in SummarizedResponse.model_fields}
+        )
+    except ValidationError as e:
+        raise ValueError(
+            f"The summary stream did not produce a valid SummarizedResponse: {e}"
+        ) from e
+    result.total_seconds = time.perf_counter() - start
@@ -0,0 +1,247 @@
+"""
+Embedding Cache Module
+This module provides a drop-in Embeddings wrapper that keeps computed vectors in a local,
+memory-mapped float32 store so identical texts are only embedded once.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+
+from src.instrumentation import record_cache
+
+
+def _namespace_for(embedder):
+    """
+    Builds a cache namespace from the embedder's model/deployment so vectors from
+    different models never mix.
+    """
+    parts = [
+        type(embedder).__name__,
+        getattr(embedder, "deployment", None) or "",
+        getattr(embedder, "model", None) or "",
+        str(getattr(embedder, "dimensions", None) or ""),
+    ]
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", "-".join(p for p in parts if p))
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an Embeddings object with a persistent cache.
+
+    Vectors are stored as rows of a float32 file that is memory-mapped, and a SQLite index
+    maps the hash of each text to its row. Cache misses are de-duplicated and embedded in as
+    few batched calls as possible. When more than `max_entries` vectors are stored, the least
+    recently used ones are evicted and their rows reused.
+
+    Args:
+        embedder: The Embeddings object used on cache misses.
+        cache_dir: Directory for the cache; each model gets its own subdirectory.
+        max_entries: Maximum number of cached vectors.
+        batch_size: Maximum number of texts sent in one call to the wrapped embedder.
+        namespace: Overrides the namespace derived from the embedder's model/deployment.
+    """
+
+    def __init__(
+        self,
+        embedder,
+        cache_dir=".cache/embeddings",
+        max_entries=500_000,
+        batch_size=512,
+        namespace=None,
+    ):
+        self.embedder = embedder
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self.namespace = namespace or _namespace_for(embedder)
+        self.path = os.path.join(cache_dir, self.namespace)
+        os.makedirs(self.path, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.api_calls = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(self.path, "index.sqlite"), check_same_thread=False
+        )
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, row INTEGER, last_used REAL);
+            CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+            CREATE TABLE IF NOT EXISTS free_rows (row INTEGER PRIMARY KEY);
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER);
+            """
+        )
+        meta = dict(self._conn.execute("SELECT name, value FROM meta").fetchall())
+        self.dim = meta.get("dim")
+        self._n_rows = meta.get("n_rows", 0)
+        self._vectors = None
+        self._vectors_path = os.path.join(self.path, "vectors.f32")
+        if self.dim:
+            self._open_vectors()
+
+    def _open_vectors(self, capacity=None):
+        current = (
+            os.path.getsize(self._vectors_path)
+            if os.path.exists(self._vectors_path)
+            else 0
+        )
+        row_bytes = self.dim * 4
+        capacity = max(capacity or 0, current // row_bytes, 1)
+        if capacity * row_bytes > current:
+            with open(self._vectors_path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+        self._vectors = np.memmap(
+            self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim)
+        )
+
+    def _allocate_rows(self, n):
+        rows = [
+            r
+            for (r,) in self._conn.execute(
+                "SELECT row FROM free_rows ORDER BY row LIMIT ?", (n,)
+            ).fetchall()
+        ]
+        if rows:
+            self._conn.executemany(
+                "DELETE FROM free_rows WHERE row = ?", [(r,) for r in rows]
+            )
+        new = n - len(rows)
+        rows.extend(range(self._n_rows, self._n_rows + new))
+        self._n_rows += new
+        if self._n_rows > self._vectors.shape[0]:
+            self._vectors.flush()
+            self._open_vectors(capacity=max(self._n_rows, 2 * self._vectors.shape[0]))
+        return rows
+
+    def _evict(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+        evicted = self._conn.execute(
+            "SELECT key, row FROM entries ORDER BY last_used LIMIT ?", (excess,)
+        ).fetchall()
+        self._conn.executemany(
+            "DELETE FROM entries WHERE key = ?", [(k,) for k, _ in evicted]
+        )
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO free_rows VALUES (?)", [(r,) for _, r in evicted]
+        )
+        logger.info(f"Evicted {len(evicted)} embeddings from the cache.")
+
+    def _lookup(self, keys):
+        found = {}
+        for i in range(0, len(keys), 500):
+            batch = keys[i : i + 500]
+            placeholders = ",".join("?" * len(batch))
+            found.update(
+                self._conn.execute(
+                    f"SELECT key, row FROM entries WHERE key IN ({placeholders})", batch
+                ).fetchall()
+            )
+        return found
+
+    def _store(self, keys, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('dim', ?)", (self.dim,)
+            )
+            self._open_vectors()
+        # Another thread may have stored some of the keys since they were looked up;
+        # allocating a second row for them would orphan the first one.
+        existing = self._lookup(keys)
+        if existing:
+            new = [i for i, k in enumerate(keys) if k not in existing]
+            keys, vectors = [keys[i] for i in new], vectors[new]
+            if not keys:
+                return
+        rows = self._allocate_rows(len(keys))
+        self._vectors[rows] = vectors
+        self._vectors.flush()
+        now = time.time()
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?)",
+            [(k, r, now) for k, r in zip(keys, rows)],
+        )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta VALUES ('n_rows', ?)", (self._n_rows,)
+        )
+
+    def _embed(self, texts, prefix, embed, batched=True):
+        """
+        Returns the vectors of texts, embedding the cache misses with `embed`: called once
+        per batch of texts when batched, and once per text otherwise.
+        """
+        keys = [
+            prefix + hashlib.sha256(text.encode("utf-8")).hexdigest() for text in texts
+        ]
+        with self._lock:
+            found = self._lookup(list(set(keys)))
+            if found:
+                self._conn.executemany(
+                    "UPDATE entries SET last_used = ? WHERE key = ?",
+                    [(time.time(), k) for k in found],
+                )
+            result = {k: np.array(self._vectors[r]) for k, r in found.items()}
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in result:
+                missing.setdefault(key, text)
+        n_missing = sum(1 for k in keys if k in missing)
+        with self._lock:
+            self.hits += len(keys) - n_missing
+            self.misses += n_missing
+        record_cache("embedding", "hit", len(keys) - n_missing)
+        record_cache("embedding", "miss", n_missing)
+
+        missing_keys = list(missing)
+        for i in range(0, len(missing_keys), self.batch_size):
+            batch_keys = missing_keys[i : i + self.batch_size]
+            batch_texts = [missing[k] for k in batch_keys]
+            if batched:
+                vectors = embed(batch_texts)
+            else:
+                vectors = [embed(text) for text in batch_texts]
+            with self._lock:
+                self.api_calls += 1 if batched else len(batch_texts)
+                self._store(batch_keys, vectors)
+            result.update(zip(batch_keys, np.asarray(vectors, dtype=np.float32)))
+        if missing_keys:
+            with self._lock:
+                self._evict()
+                self._conn.commit()
+        elif found:
+            with self._lock:
+                self._conn.commit()
+        return [result[k].tolist() for k in keys]
+
+    def embed_documents(self, texts):
+        return self._embed(texts, "doc:", self.embedder.embed_documents)
+
+    def embed_query(self, text):
+        (vector,) = self._embed(
+            [text], "query:", self.embedder.embed_query, batched=False
+        )
+        return vector
+
+    def stats(self):
+        """
+        Returns the hit/miss counters of this cache instance.
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "api_calls": self.api_calls,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
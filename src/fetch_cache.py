@@ -0,0 +1,92 @@
+"""
+Fetch Cache Module
+This module provides an on-disk cache of fetched web pages used to send conditional
+requests and to skip reprocessing pages that have not changed.
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheEntry:
+    """
+    A class to represent the cached state of one URL.
+    """
+
+    url: str
+    content_hash: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    summary: Optional[str] = None
+    keywords: Optional[str] = None
+
+
+class FetchCache:
+    """
+    Stores, per URL, the page's ETag, Last-Modified and content hash plus the summary and
+    keywords extracted from it. Each URL is kept as a small JSON file named after the hash
+    of the URL, so entries can be read and written independently. Page bodies are not
+    stored: an unchanged page is skipped rather than processed again.
+
+    Args:
+        cache_dir: Directory the cache files are written to.
+    """
+
+    def __init__(self, cache_dir=".cache/fetch"):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, url, suffix):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.cache_dir, f"{key}.{suffix}")
+
+    def get(self, url):
+        """
+        Returns the CacheEntry for the URL, or None if it was never cached.
+        """
+        try:
+            with open(self._path(url, "json"), encoding="utf-8") as f:
+                return CacheEntry(**json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError, TypeError):
+            return None
+
+    def conditional_headers(self, url):
+        """
+        Returns the If-None-Match / If-Modified-Since headers for a conditional request.
+        """
+        entry = self.get(url)
+        if entry is None:
+            return {}
+        headers = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def _write(self, url, suffix, payload):
+        path = self._path(url, suffix)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+    def put(self, entry):
+        """
+        Writes the entry, replacing any previous version atomically.
+        """
+        self._write(entry.url, "json", json.dumps(asdict(entry)))
+
+    def delete(self, url):
+        try:
+            os.remove(self._path(url, "json"))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,130 @@
+"""
+Filters Module
+This module provides the metadata filters accepted by the vector store managers, translated
+to Milvus boolean expressions for VectorDBManager and to row predicates for
+NumpyVectorDBManager.
+
+A filter is a dict mapping a metadata field to a condition:
+    {"source_family": "investor_updates"}             field == value
+    {"source": ["https://a", "https://b"]}            field in [...]
+    {"month": {"gte": "2024-01", "lt": "2024-04"}}    range (any of the OPERATORS)
+Conditions on several fields are combined with "and".
+"""
+
+import json
+
+OPERATORS = {
+    "eq": "==",
+    "ne": "!=",
+    "gt": ">",
+    "gte": ">=",
+    "lt": "<",
+    "lte": "<=",
+    "in": "in",
+    "nin": "not in",
+}
+
+
+def _conditions(filters):
+    """
+    Yields (field, operator, value) for every condition of the filters.
+    """
+    for field, condition in (filters or {}).items():
+        if isinstance(condition, dict):
+            for op, value in condition.items():
+                if op not in OPERATORS:
+                    raise ValueError(f"Unsupported filter operator: {op}")
+                yield field, op, value
+        elif isinstance(condition, (list, tuple, set, frozenset)):
+            yield field, "in", list(condition)
+        else:
+            yield field, "eq", condition
+
+
+def search_scope(
+    expr=None, filters=None, partitions=None, search_params=None, fetch_k=None
+):
+    """
+    Collects the scoping options of a search into one dict (None when no option is set),
+    used as part of the retrieval cache key and passed on to the backend search.
+    """
+    scope = {
+        "expr": expr,
+        "filters": filters,
+        "partitions": sorted(partitions) if partitions else None,
+        "search_params": search_params,
+        "fetch_k": fetch_k,
+    }
+    return {name: value for name, value in scope.items() if value} or None
+
+
+def _literal(value):
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return "[" + ", ".join(_literal(v) for v in value) + "]"
+    return json.dumps(value)
+
+
+def build_filter_expr(filters=None, expr=None):
+    """
+    Input: Filters as described in the module docstring and an optional raw Milvus expression.
+    Output: One Milvus boolean expression combining both with "and", or None if both are empty.
+    """
+    clauses = [
+        f"{field} {OPERATORS[op]} {_literal(value)}"
+        for field, op, value in _conditions(filters)
+    ]
+    if expr:
+        clauses.append(f"({expr})" if clauses else expr)
+    return " and ".join(clauses) or None
+
+
+def equality_values(filters, field):
+    """
+    Returns the values an "eq" or "in" condition of the filters restricts the field to, or
+    None if the field is not restricted that way. Used to prune partitions.
+    """
+    values = None
+    for name, op, value in _conditions(filters):
+        if name != field or op not in ("eq", "in"):
+            continue
+        allowed = set(value) if op == "in" else {value}
+        values = allowed if values is None else values & allowed
+    return values
+
+
+def _matches(metadata, field, op, value):
+    if field not in metadata:
+        return op in ("ne", "nin")
+    actual = metadata[field]
+    if op == "eq":
+        return actual == value
+    if op == "ne":
+        return actual != value
+    if op == "in":
+        return actual in value
+    if op == "nin":
+        return actual not in value
+    try:
+        if op == "gt":
+            return actual > value
+        if op == "gte":
+            return actual >= value
+        if op == "lt":
+            return actual < value
+        return actual <= value
+    except TypeError:
+        return False
+
+
+def compile_filter(filters):
+    """
+    Input: Filters as described in the module docstring.
+    Output: A predicate taking a metadata dict, True when every condition holds; None when
+    the filters are empty.
+    """
+    conditions = list(_conditions(filters))
+    if not conditions:
+        return None
+    return lambda metadata: all(
+        _matches(metadata, field, op, value) for field, op, value in conditions
+    )
@@ -0,0 +1,555 @@
+"""
+Graph Builder Module
+This module builds the self-improving RAG graph: route -> retrieve -> grade -> rewrite ->
+summarize -> score, as developed in notebooks/self-improvise_agent/graph_builder.ipynb.
+"""
+
+import asyncio
+from collections import Counter
+from dataclasses import asdict
+from typing import Optional
+
+from langchain_core.documents import Document
+from langgraph.config import get_stream_writer
+from langgraph.graph import END, START, StateGraph
+from loguru import logger
+from typing_extensions import TypedDict
+
+from src.context_packer import ContextPacker, format_keywords
+from src.doc_grader import get_doc_grader_chain, grade_documents
+from src.doc_summarizer import (
+    SummaryStreamResult,
+    astream_summary,
+    get_doc_summarizer_chain,
+    get_doc_summarizer_stream_chain,
+)
+from src.instrumentation import timed
+from src.query_rewriter import get_multi_query_rewrite_chain, get_query_rewrite_chain
+from src.query_router import get_question_router_chain
+from src.response_scorer import get_response_scorer_chain
+from src.utils import load_env
+
+
+class GraphState(TypedDict):
+    """
+    A state in the graph representing a node with a specific type and content.
+    """
+
+    question: str
+    documents: list[Document]
+    rewritten_question: Optional[str]
+    summary: str
+    citation: list[str]
+    grade_score: Optional[str]
+    hallucination: Optional[str]
+    response_score: Optional[float]
+    grading_iteration: Optional[int]
+    hallucination_iteration: Optional[int]
+    route: Optional[str]
+    grounding: Optional[list[dict]]
+    filters: Optional[dict]
+    queries: Optional[list[str]]
+
+
+def _active_question(state):
+    return (
+        state["rewritten_question"]
+        if state.get("rewritten_question")
+        else state["question"]
+    )
+
+
+def validate_response(response_dict):
+    """
+    Validates a response dictionary and sets summary, citation and grade_score to None if
+    hallucination is 'yes'.
+    """
+    validated_response = response_dict.copy()
+    if validated_response.get("hallucination") == "yes":
+        validated_response["summary"] = None
+        validated_response["citation"] = None
+        validated_response["grade_score"] = None
+    return validated_response
+
+
+DEFAULT_SPECULATION_POLICY = {"vector_retriever": True, "web_search": False}
+
+
+class GraphBuilder:
+    """
+    Builds the RAG graph from the chain factories in src.
+
+    Args:
+        llm: The language model used by every chain.
+        vector_db_manager: VectorDBManager (or NumpyVectorDBManager) used for vector retrieval.
+        web_search_retriever: Retriever returning Tavily-style results (dicts with url and content).
+            Defaults to TavilySearchResults.
+        context_packer: ContextPacker bounding the grader, summarizer and scorer contexts.
+        k: Number of documents retrieved from the vector store.
+        max_grading_iterations: Grading rounds before the graph summarizes whatever it has.
+        max_hallucination_iterations: Scoring rounds before the response is rejected.
+        acceptance_score: Minimum response_score for the response to be accepted.
+        stream_summary: If True, the summarizer node streams the summary as it is generated.
+            The graph must then be run with ainvoke/astream; with
+            graph.astream(inputs, stream_mode=["custom", "values"]) the summarizer emits
+            {"node", "field", "value"} custom events carrying summary deltas and the citation.
+        speculative: If True, retrieval starts at the same time as the routing call and is kept
+            or cancelled once the route is known. The graph must then be run with ainvoke/astream.
+        speculation_policy: Which sources may be retrieved speculatively, by RouteQuery source.
+            Defaults to DEFAULT_SPECULATION_POLICY: the vector store only, since an unused web
+            search is billed while an unused vector search is cheap.
+        grounding_analyzer: Optional GroundingAnalyzer checking the summary locally; the LLM
+            scorer then only runs for ambiguous responses. Its per-sentence evidence is
+            returned in the state's `grounding` field.
+        multi_query_retriever: Optional MultiQueryRetriever. When set, a partial_relevance
+            grade (or a response sent back for another try) leads to one multi-query rewrite
+            and a fused retrieval of all variants instead of a single rewrite followed by
+            another retrieval round trip; the queries searched are returned in the state's
+            `queries` field. Its vector store and rewrite chain default to the builder's.
+        pre_router: Optional PreRouter. When set, the router nodes route with its local
+            classifier and only call the LLM router when it is not confident. Its router
+            chain defaults to the builder's; fit it on the collection beforehand, otherwise
+            only its keyword rules apply.
+        per_document_grading: If True, the grader node grades every retrieved document on
+            its own (see grade_documents), replaces the documents with the relevant ones and
+            takes the aggregate label as grade_score, instead of grading the packed context
+            in one call.
+        grading_concurrency: Maximum concurrent grading calls per question with
+            per_document_grading.
+    """
+
+    def __init__(
+        self,
+        llm,
+        vector_db_manager,
+        web_search_retriever=None,
+        context_packer=None,
+        k=5,
+        max_grading_iterations=2,
+        max_hallucination_iterations=2,
+        acceptance_score=0.7,
+        stream_summary=False,
+        speculative=False,
+        speculation_policy=None,
+        grounding_analyzer=None,
+        multi_query_retriever=None,
+        pre_router=None,
+        per_document_grading=False,
+        grading_concurrency=5,
+    ):
+        self.vector_db_manager = vector_db_manager
+        if web_search_retriever is None:
+            from langchain_community.tools.tavily_search import TavilySearchResults
+
+            load_env()
+            web_search_retriever = TavilySearchResults(
+                max_results=5,
+                include_answer=False,
+                include_raw_content=True,
+                search_depth="basic",
+            )
+        self.web_search_retriever = web_search_retriever
+        self.context_packer = context_packer or ContextPacker()
+        self.k = k
+        self.max_grading_iterations = max_grading_iterations
+        self.max_hallucination_iterations = max_hallucination_iterations
+        self.acceptance_score = acceptance_score
+        self.stream_summary = stream_summary
+        self.speculative = speculative
+        self.speculation_policy = {
+            **DEFAULT_SPECULATION_POLICY,
+            **(speculation_policy or {}),
+        }
+        self.speculation_stats = Counter()
+        self.per_document_grading = per_document_grading
+        self.grading_concurrency = grading_concurrency
+        self.question_router_chain = get_question_router_chain(llm)
+        self.doc_grader_chain = get_doc_grader_chain(llm)
+        self.query_rewrite_chain = get_query_rewrite_chain(llm)
+        self.summarizer_chain = get_doc_summarizer_chain(llm)
+        self.summarizer_stream_chain = (
+            get_doc_summarizer_stream_chain(llm) if stream_summary else None
+        )
+        self.scorer_chain = get_response_scorer_chain(llm)
+        self.grounding_analyzer = grounding_analyzer
+        if grounding_analyzer is not None and grounding_analyzer.scorer_chain is None:
+            grounding_analyzer.scorer_chain = self.scorer_chain
+        self.multi_query_retriever = multi_query_retriever
+        if multi_query_retriever is not None:
+            if multi_query_retriever.vector_db_manager is None:
+                multi_query_retriever.vector_db_manager = vector_db_manager
+            if multi_query_retriever.rewrite_chain is None:
+                multi_query_retriever.rewrite_chain = get_multi_query_rewrite_chain(llm)
+        self.pre_router = pre_router
+        if pre_router is not None and pre_router.router_chain is None:
+            pre_router.router_chain = self.question_router_chain
+
+    def vector_retriever(self, state: GraphState):
+        """
+        Retrieves documents from the vector store for the active question, restricted to the
+        metadata filters in the state's `filters` field (see src.filters), if any.
+        """
+        question = _active_question(state)
+        logger.info(f"Vector retriever question: {question}")
+        documents = self.vector_db_manager.retrieve_similar(
+            question, k=self.k, filters=state.get("filters")
+        )
+        return {"documents": documents, "question": state["question"]}
+
+    def web_search(self, state: GraphState):
+        """
+        Retrieves documents from the web search for the question. Tavily's relevance score
+        is kept in the metadata so the context packer can rank by it.
+        """
+        question = state["question"]
+        logger.info(f"Web search question: {question}")
+        results = self.web_search_retriever.invoke(question)
+        return {"documents": self._web_documents(results), "question": question}
+
+    @staticmethod
+    def _web_documents(results):
+        return [
+            Document(
+                page_content=result["content"],
+                metadata={"source": result["url"], "score": result.get("score")},
+            )
+            for result in results
+        ]
+
+    async def _aretrieve(self, source, question, filters=None):
+        if source == "vector_retriever":
+            return await self.vector_db_manager.aretrieve_similar(
+                question, k=self.k, filters=filters
+            )
+        return self._web_documents(await self.web_search_retriever.ainvoke(question))
+
+    def _route(self, question):
+        if self.pre_router is not None:
+            return self.pre_router.route(question)
+        return self.question_router_chain.invoke({"query": question})
+
+    async def _aroute(self, question):
+        if self.pre_router is not None:
+            return await self.pre_router.aroute(question)
+        return await self.question_router_chain.ainvoke({"query": question})
+
+    def router_node(self, state: GraphState):
+        """
+        Routes the question to the appropriate source, through the pre-router if one is set.
+        """
+        op = self._route(state["question"])
+        logger.info(f"Routing to {op.source}.")
+        return "vectordb" if op.source == "vector_retriever" else "web"
+
+    async def speculative_router_node(self, state: GraphState):
+        """
+        Runs the routing call while the sources allowed by the speculation policy are already
+        being retrieved. The retrieval for the chosen source is kept, the others are cancelled.
+        If the chosen source was not started, or its speculative retrieval failed, no documents
+        are returned and the regular retriever node runs.
+        """
+        question = state["question"]
+        tasks = {
+            source: asyncio.create_task(
+                self._aretrieve(source, question, state.get("filters"))
+            )
+            for source, allowed in self.speculation_policy.items()
+            if allowed
+        }
+        self.speculation_stats["started"] += len(tasks)
+        try:
+            op = await self._aroute(question)
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        logger.info(f"Routing to {op.source}.")
+        for source, task in tasks.items():
+            if source != op.source:
+                task.cancel()
+                self.speculation_stats["cancelled"] += 1
+        update = {"route": op.source, "question": question}
+        task = tasks.get(op.source)
+        if task is not None:
+            try:
+                update["documents"] = await task
+                self.speculation_stats["used"] += 1
+            except Exception as e:
+                logger.warning(
+                    f"Speculative {op.source} retrieval failed, retrying: {e}"
+                )
+                self.speculation_stats["failed"] += 1
+        return update
+
+    def decide_after_speculative_route(self, state: GraphState):
+        """
+        Skips the retriever node when the speculative router already returned its documents.
+        """
+        prefetched = "documents" in state
+        if state["route"] == "vector_retriever":
+            return "vectordb_prefetched" if prefetched else "vectordb"
+        return "web_prefetched" if prefetched else "web"
+
+    def document_grader_node(self, state: GraphState):
+        """
+        Grades the retrieved documents for relevance to the active question. With
+        per_document_grading, the documents graded irrelevant are removed from the state.
+        """
+        question = _active_question(state)
+        if self.per_document_grading:
+            grades = grade_documents(
+                self.doc_grader_chain,
+                question,
+                state.get("documents", []),
+                max_concurrency=self.grading_concurrency,
+            )
+            logger.info(
+                f"Graded {len(grades.labels)} documents one by one, kept "
+                f"{len(grades.documents)}: {grades.grade_score}"
+            )
+            return {
+                "documents": grades.documents,
+                "grade_score": grades.grade_score,
+                "grading_iteration": state.get("grading_iteration", 0) + 1,
+            }
+        packed = self.context_packer.pack(state.get("documents", []), chain="grader")
+        op = self.doc_grader_chain.invoke(
+            {"context": packed.context, "question": question}
+        )
+        grade_score = getattr(op, "grade_score", None)
+        logger.info(f"Graded documents with score: {grade_score}")
+        return {
+            "grade_score": grade_score,
+            "grading_iteration": state.get("grading_iteration", 0) + 1,
+        }
+
+    def decide_to_generate_rewrite(self, state: GraphState):
+        """
+        Decides whether to summarize, rewrite the question or stop based on the grading score.
+        """
+        grade_score = state.get("grade_score")
+        if state.get("grading_iteration", 0) > self.max_grading_iterations:
+            logger.info(
+                "Grading iteration exceeded the limit. Stopping further attempts."
+            )
+            return "generate"
+        if grade_score == "full_relevance":
+            return "generate"
+        if grade_score == "partial_relevance":
+            return "rewrite"
+        return END
+
+    def keyword_contexts(self, document_lists):
+        """
+        Returns the rewriter's keyword context for every list of documents. When the vector
+        store keeps document-level metadata in a parent store, the keywords of all lists are
+        resolved in one lookup.
+        """
+        parent_store = getattr(self.vector_db_manager, "parent_store", None)
+        if parent_store is not None:
+            document_lists = parent_store.resolve_many(document_lists)
+        return [format_keywords(documents) for documents in document_lists]
+
+    def query_rewriter_node(self, state: GraphState):
+        """
+        Rewrites the active question using the keywords of the retrieved documents.
+        """
+        question = _active_question(state)
+        only_keyword = self.keyword_contexts([state.get("documents", [])])[0]
+        op = self.query_rewrite_chain.invoke(
+            {"context": only_keyword, "question": question}
+        )
+        rewritten_question = getattr(op, "rewritten_query", "")
+        logger.info(f"Rewritten question: {rewritten_question}")
+        return {"rewritten_question": rewritten_question}
+
+    def multi_query_retriever_node(self, state: GraphState):
+        """
+        Rewrites the original question into several queries using the keywords of the
+        retrieved documents and replaces the documents with the fused results of all of them.
+        """
+        question = state["question"]
+        only_keyword = self.keyword_contexts([state.get("documents", [])])[0]
+        documents, queries = self.multi_query_retriever.retrieve(
+            question, only_keyword, k=self.k, filters=state.get("filters")
+        )
+        logger.info(f"Multi-query retrieval: {len(documents)} documents for {queries}")
+        return {"documents": documents, "queries": queries}
+
+    def _summarizer_inputs(self, state):
+        question = _active_question(state)
+        packed = self.context_packer.pack(
+            state.get("documents", []), chain="summarizer"
+        )
+        logger.info(
+            f"Summarizer context: {len(packed.documents)} documents, {packed.tokens} tokens "
+            f"({packed.duplicates} duplicates, {packed.dropped} over budget)."
+        )
+        inputs = {
+            "context": packed.context,
+            "question": question,
+            "citation": packed.citation,
+        }
+        return inputs, packed
+
+    def response_summarizer_node(self, state: GraphState):
+        """
+        Summarizes the response from the packed documents. The packed documents replace the
+        state's documents, so the scorer sees the same "Content idx" numbering the citations
+        refer to.
+        """
+        inputs, packed = self._summarizer_inputs(state)
+        op = self.summarizer_chain.invoke(inputs)
+        return {
+            "summary": getattr(op, "summary", ""),
+            "citation": getattr(op, "citation", ""),
+            "documents": packed.documents,
+        }
+
+    async def astream_summarizer_node(self, state: GraphState):
+        """
+        Streaming version of response_summarizer_node. Summary deltas are written to the
+        graph's custom stream as they arrive; the state update is the same structured result.
+        """
+        inputs, packed = self._summarizer_inputs(state)
+        writer = get_stream_writer()
+        result = SummaryStreamResult()
+        async for field, value in astream_summary(
+            self.summarizer_stream_chain, inputs, result
+        ):
+            writer({"node": "response_summarizer_node", "field": field, "value": value})
+        logger.info(
+            f"Summary first token after {result.first_token_seconds or 0:.2f}s, "
+            f"complete after {result.total_seconds:.2f}s."
+        )
+        return {
+            "summary": result.response.summary,
+            "citation": result.response.citation,
+            "documents": packed.documents,
+        }
+
+    def hallucination_grader_node(self, state: GraphState):
+        """
+        Checks the summarized response for hallucinations and grades it.
+        """
+        question = _active_question(state)
+        packed = self.context_packer.pack(state.get("documents", []), chain="scorer")
+        inputs = {
+            "response": state.get("summary", ""),
+            "question": question,
+            "context": packed.context,
+        }
+        grounding = None
+        if self.grounding_analyzer is None:
+            op = self.scorer_chain.invoke(inputs)
+        else:
+            op, result = self.grounding_analyzer.grade(inputs, packed.documents)
+            grounding = [asdict(evidence) for evidence in result.evidence]
+            logger.info(
+                f"Grounding: {dict(result.counts())}, confidence {result.confidence:.2f}, "
+                + ("decided locally." if result.decisive else "sent to the LLM scorer.")
+            )
+        logger.info(
+            f"Hallucination: {op.hallucination}, response score: {op.response_score}"
+        )
+        return {
+            "hallucination": op.hallucination,
+            "response_score": op.response_score,
+            "hallucination_iteration": state.get("hallucination_iteration", 0) + 1,
+            "grounding": grounding,
+        }
+
+    def decide_to_accept_reject(self, state: GraphState):
+        """
+        Decides whether to accept or reject the summarized response.
+        """
+        if state.get("hallucination_iteration", 0) > self.max_hallucination_iterations:
+            logger.info(
+                "Hallucination iteration exceeded the limit. Rejecting the response."
+            )
+            return "not_acceptable"
+        if state.get("hallucination") == "yes":
+            return "not_acceptable"
+        if state.get("response_score", 0.0) >= self.acceptance_score:
+            return "acceptable"
+        return "rewrite_try"
+
+    def build(self):
+        """
+        Returns the compiled graph. Every node, and the routing call on the START edge, is
+        timed with src.instrumentation.
+        """
+        workflow = StateGraph(GraphState)
+
+        def add_node(name, func):
+            workflow.add_node(name, timed(name, kind="node")(func))
+
+        add_node("vector_retriever", self.vector_retriever)
+        add_node("web_search", self.web_search)
+        add_node("document_grader_node", self.document_grader_node)
+        if self.multi_query_retriever is None:
+            rewrite_node = "query_rewriter_node"
+            add_node(rewrite_node, self.query_rewriter_node)
+            workflow.add_edge(rewrite_node, "vector_retriever")
+        else:
+            rewrite_node = "multi_query_retriever"
+            add_node(rewrite_node, self.multi_query_retriever_node)
+            workflow.add_edge(rewrite_node, "document_grader_node")
+        add_node(
+            "response_summarizer_node",
+            (
+                self.astream_summarizer_node
+                if self.stream_summary
+                else self.response_summarizer_node
+            ),
+        )
+        add_node("hallucination_grader_node", self.hallucination_grader_node)
+
+        if self.speculative:
+            add_node("speculative_router_node", self.speculative_router_node)
+            workflow.add_edge(START, "speculative_router_node")
+            workflow.add_conditional_edges(
+                "speculative_router_node",
+                self.decide_after_speculative_route,
+                {
+                    "vectordb": "vector_retriever",
+                    "web": "web_search",
+                    "vectordb_prefetched": "document_grader_node",
+                    "web_prefetched": "response_summarizer_node",
+                },
+            )
+        else:
+            workflow.add_conditional_edges(
+                START,
+                timed("router_node", kind="edge")(self.router_node),
+                {"vectordb": "vector_retriever", "web": "web_search"},
+            )
+        workflow.add_edge("vector_retriever", "document_grader_node")
+        workflow.add_edge("web_search", "response_summarizer_node")
+        workflow.add_conditional_edges(
+            "document_grader_node",
+            self.decide_to_generate_rewrite,
+            {
+                "generate": "response_summarizer_node",
+                "rewrite": rewrite_node,
+                END: END,
+            },
+        )
+        workflow.add_edge("response_summarizer_node", "hallucination_grader_node")
+        workflow.add_conditional_edges(
+            "hallucination_grader_node",
+            self.decide_to_accept_reject,
+            {
+                "acceptable": END,
+                "not_acceptable": END,
+                "rewrite_try": rewrite_node,
+            },
+        )
+        return workflow.compile()
+
+
+def build_graph(llm, vector_db_manager, **kwargs):
+    """
+    Create the compiled RAG graph. Keyword arguments are passed to GraphBuilder.
+    """
+    return GraphBuilder(llm, vector_db_manager, **kwargs).build()
@@ -0,0 +1,365 @@
+"""
+Grounding Module
+This module provides a local check of how well a summarized response is supported by the
+retrieved documents, answering most hallucination checks before falling back to the LLM
+response scorer.
+"""
+
+import random
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+from src.response_scorer import CheckandGradeResponse
+
+_SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+|\n+")
+_CITATION_PATTERN = re.compile(
+    r"\[\d+(?:,\s*\d+)*\]|\(?(?:source|content) idx:?\s*\d+\)?", re.I
+)
+_WORD_PATTERN = re.compile(r"[a-z0-9]+(?:[.,'][a-z0-9]+)*")
+_NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)*")
+
+STOPWORDS = frozenset(
+    "a an and are as at be been but by can could did do does for from had has have how in "
+    "into is it its may might more most not of on or over should so such than that the "
+    "their them then there these they this those to under was were what when where which "
+    "while who why will with would also about after before between both each other".split()
+)
+
+
+def split_sentences(text, min_words=3):
+    """
+    Splits a response into sentences, dropping fragments shorter than min_words words
+    (headings, empty bullets).
+    """
+    sentences = (s.strip(" -*\t") for s in _SENTENCE_PATTERN.split(text or ""))
+    return [s for s in sentences if len(s.split()) >= min_words]
+
+
+def _ngrams(text, sizes):
+    words = _WORD_PATTERN.findall(_CITATION_PATTERN.sub(" ", text.lower()))
+    grams = set()
+    for size in sizes:
+        if size == 1:
+            grams.update((w,) for w in words if len(w) > 2 and w not in STOPWORDS)
+        else:
+            grams.update(
+                tuple(words[i : i + size]) for i in range(len(words) - size + 1)
+            )
+    return grams
+
+
+def _numbers(text):
+    text = _CITATION_PATTERN.sub(" ", text)
+    return {n.replace(",", "").rstrip(".") for n in _NUMBER_PATTERN.findall(text)}
+
+
+def _normalize(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=-1, keepdims=True), 1e-12)
+
+
+@dataclass
+class SentenceEvidence:
+    """
+    A class to represent how one sentence of the response is supported.
+    verdict is "supported", "unsupported" or "uncertain"; document is the index of the best
+    matching document in the scorer context ("Content idx"), or None without documents.
+    """
+
+    sentence: str
+    verdict: str
+    overlap: float = 0.0
+    similarity: Optional[float] = None
+    document: Optional[int] = None
+    missing_numbers: list[str] = field(default_factory=list)
+
+
+@dataclass
+class GroundingResult:
+    """
+    A class to represent the local grounding analysis of a response.
+    response is the provisional CheckandGradeResponse and confidence the share of
+    sentences agreeing with it; decisive is True when it can replace the LLM scorer.
+    """
+
+    response: CheckandGradeResponse
+    confidence: float
+    decisive: bool
+    relevance: float = 0.0
+    evidence: list[SentenceEvidence] = field(default_factory=list)
+
+    def counts(self):
+        return Counter(e.verdict for e in self.evidence)
+
+
+class GroundingAnalyzer:
+    """
+    Checks a response sentence by sentence against the documents given to the scorer:
+        1. Word n-gram overlap: the share of a sentence's content words and word n-grams
+           found in a document, for every sentence/document pair in one matrix product.
+        2. Embedding similarity (with an embedder): cosine similarity between sentence and
+           document embeddings, computed from one batched embedding call.
+        A sentence is "supported" when its best overlap or similarity reaches the support
+        threshold, "unsupported" when both stay below the reject threshold, and "uncertain"
+        otherwise. A sentence quoting a number found in no document is never supported.
+
+    The provisional response is decisive when
+        - no sentence is unsupported, at least accept_share are supported and the response
+          covers the question (relevance >= min_relevance): hallucination "no", or
+        - at least reject_share of the sentences are unsupported: hallucination "yes".
+    Everything else goes to the LLM scorer.
+
+    Args:
+        scorer_chain: The chain created by get_response_scorer_chain, used as fallback.
+            GraphBuilder fills in its own scorer chain when this is None.
+        embedder: Optional Embeddings object for sentence/document similarity.
+        ngram_sizes: Word n-gram sizes compared (1 counts content words only).
+        support_overlap: Overlap at which a sentence is supported.
+        reject_overlap: Overlap below which a sentence may be unsupported.
+        support_similarity: Similarity at which a sentence is supported.
+        reject_similarity: Similarity below which a sentence may be unsupported.
+        accept_share: Share of supported sentences needed to accept locally.
+        reject_share: Share of unsupported sentences needed to reject locally.
+        min_relevance: Minimum question relevance to accept locally.
+        audit_rate: Share of locally decided responses also sent to the LLM scorer to
+            measure agreement.
+    """
+
+    def __init__(
+        self,
+        scorer_chain=None,
+        embedder=None,
+        ngram_sizes=(1, 2),
+        support_overlap=0.6,
+        reject_overlap=0.25,
+        support_similarity=0.85,
+        reject_similarity=0.6,
+        accept_share=0.8,
+        reject_share=0.5,
+        min_relevance=0.3,
+        audit_rate=0.05,
+    ):
+        self.scorer_chain = scorer_chain
+        self.embedder = embedder
+        self.ngram_sizes = tuple(ngram_sizes)
+        self.support_overlap = support_overlap
+        self.reject_overlap = reject_overlap
+        self.support_similarity = support_similarity
+        self.reject_similarity = reject_similarity
+        self.accept_share = accept_share
+        self.reject_share = reject_share
+        self.min_relevance = min_relevance
+        self.audit_rate = audit_rate
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    def _overlap(self, sentences, texts):
+        """
+        Returns the (sentences x documents) matrix of n-gram coverage and the number of
+        n-grams per sentence.
+        """
+        vocabulary = {}
+        sentence_rows = [
+            [
+                vocabulary.setdefault(gram, len(vocabulary))
+                for gram in _ngrams(sentence, self.ngram_sizes)
+            ]
+            for sentence in sentences
+        ]
+        n_sentence_grams = len(vocabulary)
+        document_rows = [
+            [vocabulary[g] for g in _ngrams(t, self.ngram_sizes) if g in vocabulary]
+            for t in texts
+        ]
+        sentence_matrix = np.zeros((len(sentences), n_sentence_grams), dtype=np.float32)
+        document_matrix = np.zeros((len(texts), n_sentence_grams), dtype=np.float32)
+        for i, row in enumerate(sentence_rows):
+            sentence_matrix[i, row] = 1.0
+        for i, row in enumerate(document_rows):
+            document_matrix[i, row] = 1.0
+        sizes = sentence_matrix.sum(axis=1)
+        overlap = (sentence_matrix @ document_matrix.T) / np.maximum(sizes, 1.0)[
+            :, None
+        ]
+        return overlap, sizes
+
+    def _similarity(self, sentences, texts, question, response):
+        vectors = _normalize(
+            self.embedder.embed_documents(
+                list(sentences) + list(texts) + [question, response]
+            )
+        )
+        n = len(sentences)
+        similarity = vectors[:n] @ vectors[n : n + len(texts)].T
+        return similarity, float(vectors[-2] @ vectors[-1])
+
+    def _verdict(self, overlap, similarity, sized, missing_numbers):
+        if not sized:
+            return "uncertain"
+        supported = overlap >= self.support_overlap or (
+            similarity is not None and similarity >= self.support_similarity
+        )
+        if supported and not missing_numbers:
+            return "supported"
+        if overlap < self.reject_overlap and (
+            similarity is None or similarity < self.reject_similarity
+        ):
+            return "unsupported"
+        return "uncertain"
+
+    def analyze(self, response, documents, question=""):
+        """
+        Input: The summarized response, the documents it should be grounded in (in scorer
+        context order) and the question.
+        Output: GroundingResult with the provisional CheckandGradeResponse and the evidence
+        for every sentence.
+        """
+        sentences = split_sentences(response)
+        texts = [doc.page_content for doc in documents]
+        if not sentences:
+            return GroundingResult(
+                response=CheckandGradeResponse(hallucination="no", response_score=0.0),
+                confidence=0.0,
+                decisive=False,
+            )
+
+        overlap, sizes = self._overlap(sentences, texts)
+        similarity = None
+        question_words = _ngrams(question, (1,))
+        relevance = (
+            len(question_words & _ngrams(response, (1,))) / len(question_words)
+            if question_words
+            else 1.0
+        )
+        if self.embedder is not None and texts:
+            similarity, question_similarity = self._similarity(
+                sentences, texts, question or response, response
+            )
+            relevance = max(relevance, question_similarity)
+        document_numbers = (
+            set().union(*(_numbers(t) for t in texts)) if texts else set()
+        )
+
+        evidence = []
+        for i, sentence in enumerate(sentences):
+            missing = sorted(_numbers(sentence) - document_numbers)
+            if not texts:
+                evidence.append(
+                    SentenceEvidence(sentence, "unsupported", missing_numbers=missing)
+                )
+                continue
+            combined = overlap[i] if similarity is None else overlap[i] + similarity[i]
+            best = int(np.argmax(combined))
+            best_overlap = float(overlap[i].max())
+            best_similarity = (
+                None if similarity is None else round(float(similarity[i].max()), 3)
+            )
+            evidence.append(
+                SentenceEvidence(
+                    sentence=sentence,
+                    verdict=self._verdict(
+                        best_overlap, best_similarity, sizes[i], missing
+                    ),
+                    overlap=round(best_overlap, 3),
+                    similarity=best_similarity,
+                    document=best,
+                    missing_numbers=missing,
+                )
+            )
+
+        counts = Counter(e.verdict for e in evidence)
+        n = len(evidence)
+        supported_share = counts["supported"] / n
+        unsupported_share = counts["unsupported"] / n
+        if unsupported_share >= self.reject_share:
+            provisional = CheckandGradeResponse(hallucination="yes", response_score=0.0)
+            return GroundingResult(
+                provisional, unsupported_share, True, round(relevance, 3), evidence
+            )
+        score = round((counts["supported"] + 0.5 * counts["uncertain"]) / n, 2)
+        decisive = (
+            counts["unsupported"] == 0
+            and supported_share >= self.accept_share
+            and relevance >= self.min_relevance
+        )
+        provisional = CheckandGradeResponse(
+            hallucination="yes" if counts["unsupported"] else "no",
+            response_score=0.0 if counts["unsupported"] else score,
+        )
+        confidence = unsupported_share if counts["unsupported"] else supported_share
+        return GroundingResult(
+            provisional, confidence, decisive, round(relevance, 3), evidence
+        )
+
+    def record(self, result, llm_response=None):
+        """
+        Counts a graded response for stats(); llm_response is the LLM scorer's answer for
+        an audited, locally decided response.
+        """
+        with self._lock:
+            self._stats["responses"] += 1
+            if not result.decisive:
+                self._stats["llm_fallbacks"] += 1
+                return
+            self._stats["short_circuited"] += 1
+            self._stats[
+                "grounded" if result.response.hallucination == "no" else "ungrounded"
+            ] += 1
+            if llm_response is not None:
+                self._stats["audited"] += 1
+                self._stats["agreements"] += int(
+                    llm_response.hallucination == result.response.hallucination
+                )
+
+    def grade(self, inputs, documents):
+        """
+        Input: The scorer chain inputs (response, question, context) and the documents the
+        context was built from.
+        Output: (CheckandGradeResponse, GroundingResult). The response comes from the local
+        analysis when it is decisive and from the LLM scorer otherwise.
+        """
+        result = self.analyze(inputs["response"], documents, inputs.get("question", ""))
+        if not result.decisive:
+            self.record(result)
+            return self.scorer_chain.invoke(inputs), result
+        llm_response = None
+        if random.random() < self.audit_rate:
+            llm_response = self.scorer_chain.invoke(inputs)
+        self.record(result, llm_response)
+        return result.response, result
+
+    async def agrade(self, inputs, documents):
+        """
+        Async version of grade.
+        """
+        result = self.analyze(inputs["response"], documents, inputs.get("question", ""))
+        if not result.decisive:
+            self.record(result)
+            return await self.scorer_chain.ainvoke(inputs), result
+        llm_response = None
+        if random.random() < self.audit_rate:
+            llm_response = await self.scorer_chain.ainvoke(inputs)
+        self.record(result, llm_response)
+        return result.response, result
+
+    def stats(self):
+        """
+        Returns counters plus the share of responses graded locally and the agreement rate
+        with the LLM scorer on audited responses.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        responses = stats.get("responses", 0)
+        audited = stats.get("audited", 0)
+        stats["short_circuit_rate"] = (
+            stats.get("short_circuited", 0) / responses if responses else 0.0
+        )
+        stats["agreement_rate"] = (
+            stats.get("agreements", 0) / audited if audited else None
+        )
+        return stats
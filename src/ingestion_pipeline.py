@@ -0,0 +1,301 @@
+"""
+Ingestion Pipeline Module
+This module provides a streaming ingestion engine that runs fetch -> theme/keywords -> enrich ->
+split -> embed -> insert as concurrent stages joined by bounded queues.
+"""
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from loguru import logger
+
+from src.instrumentation import timed
+from src.web_fetcher import AsyncWebFetcher
+
+_DONE = object()
+
+
+@dataclass
+class PipelineStats:
+    """
+    A class to represent the outcome of an IngestionPipeline run.
+    """
+
+    urls: int = 0
+    documents: int = 0
+    unchanged: int = 0
+    failed: int = 0
+    chunks: int = 0
+    inserted: int = 0
+    deleted: int = 0
+    seconds: float = 0.0
+    first_chunk_seconds: Optional[float] = None
+
+
+async def _run_stage(worker, inbox, outbox, concurrency):
+    """
+    Runs `concurrency` copies of an async generator worker over the inbox queue and
+    puts everything they yield on the outbox. The end-of-stream marker is handed back
+    to the inbox so sibling workers see it too, then forwarded once to the outbox.
+    """
+
+    async def loop():
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                await inbox.put(_DONE)
+                return
+            async for output in worker(item):
+                await outbox.put(output)
+
+    workers = [asyncio.create_task(loop()) for _ in range(concurrency)]
+    try:
+        await asyncio.gather(*workers)
+    except BaseException:
+        # Stop the sibling workers and still end the stream for the next stage. Its reader may
+        # be gone and the queue full, so the marker is only forwarded if it fits.
+        for task in workers:
+            task.cancel()
+        if not outbox.full():
+            outbox.put_nowait(_DONE)
+        raise
+    await outbox.put(_DONE)
+
+
+async def _take_available(queue, first, limit):
+    """
+    Returns `first` followed by the items already waiting in the queue, up to `limit` items,
+    without waiting for more. An end-of-stream marker is put back for the sibling workers.
+    """
+    items = [first]
+    while len(items) < limit:
+        try:
+            item = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            break
+        if item is _DONE:
+            await queue.put(_DONE)
+            break
+        items.append(item)
+    return items
+
+
+async def _next_item(queue, tasks):
+    """
+    Waits for the next item of the queue while watching the stage tasks. The first task that
+    fails raises its exception here, instead of leaving the reader waiting on a queue nothing
+    fills anymore. Tasks that finished cleanly are removed from `tasks`.
+    """
+    getter = asyncio.ensure_future(queue.get())
+    try:
+        while not getter.done():
+            done, _ = await asyncio.wait(
+                {getter, *tasks}, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task is not getter:
+                    tasks.discard(task)
+                    task.result()
+        return getter.result()
+    finally:
+        getter.cancel()
+
+
+class IngestionPipeline:
+    """
+    Streams URLs through a DocumentProcessor into a VectorDBManager.
+
+    Every stage has its own worker count and is connected to the next by a queue of at most
+    `queue_size` items, so the first chunks reach the index while later URLs are still being
+    downloaded, and memory is bounded by the queue sizes rather than the corpus size.
+
+    Args:
+        processor: DocumentProcessor providing the fetch cache, theme/keyword extractor and splitter.
+        vector_db_manager: Optional VectorDBManager the chunks are inserted into.
+        fetch_concurrency: Concurrent page downloads.
+        requests_per_host: Maximum requests per second to any one host.
+        theme_concurrency: Concurrent theme/keyword workers.
+        theme_batch_size: Documents handed to the extractor at once, so prompt packing can apply.
+        split_concurrency: Concurrent split workers. Large pages are split in the
+            processor's worker processes, so this defaults to the number of CPUs.
+        insert_batch_size: Chunks embedded and inserted per batch.
+        queue_size: Capacity of each queue between stages.
+        chunk_size: Token chunk size for splitting.
+        chunk_overlap: Token overlap for splitting.
+    """
+
+    def __init__(
+        self,
+        processor,
+        vector_db_manager=None,
+        fetch_concurrency=20,
+        requests_per_host=2.0,
+        theme_concurrency=8,
+        theme_batch_size=1,
+        split_concurrency=None,
+        insert_batch_size=256,
+        queue_size=64,
+        chunk_size=1000,
+        chunk_overlap=0,
+    ):
+        self.processor = processor
+        self.vector_db_manager = vector_db_manager
+        self.fetch_concurrency = fetch_concurrency
+        self.requests_per_host = requests_per_host
+        self.theme_concurrency = theme_concurrency
+        self.theme_batch_size = theme_batch_size
+        self.split_concurrency = split_concurrency or os.cpu_count() or 1
+        self.insert_batch_size = insert_batch_size
+        self.queue_size = queue_size
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.stats = PipelineStats()
+        self._pending_entries = {}
+
+    def commit_fetch_cache(self):
+        """
+        Writes the fetch cache entries of the pages processed by the last run.
+        Pages whose theme/keyword extraction failed are left out so they are retried next time.
+        """
+        if self.processor.fetch_cache is not None:
+            for entry in self._pending_entries.values():
+                self.processor.fetch_cache.put(entry)
+        self._pending_entries = {}
+
+    async def astream(self, urls, refresh=False, commit_cache=True):
+        """
+        Input: List of URLs
+        Output: Async generator of split document chunks, produced as soon as each page is processed.
+        Failed and unchanged pages are recorded on the processor as in aload_documents.
+        Fetch cache entries are written once the stream is exhausted, unless commit_cache=False,
+        in which case commit_fetch_cache() must be called by the consumer.
+        """
+        processor = self.processor
+        fetch_cache = processor.fetch_cache
+        use_cache = fetch_cache is not None and not refresh
+        processor.failed_urls = {}
+        processor.unchanged_urls = []
+        pending_entries = self._pending_entries = {}
+        self.stats = PipelineStats(urls=len(urls))
+        start = time.perf_counter()
+
+        url_queue = asyncio.Queue(maxsize=self.queue_size)
+        doc_queue = asyncio.Queue(maxsize=self.queue_size)
+        enriched_queue = asyncio.Queue(maxsize=self.queue_size)
+        chunk_queue = asyncio.Queue(maxsize=self.queue_size)
+
+        async def feed():
+            for url in urls:
+                await url_queue.put(url)
+            await url_queue.put(_DONE)
+
+        async def fetch(url):
+            headers = fetch_cache.conditional_headers(url) if use_cache else None
+            async with timed("ingestion.fetch"):
+                result = await fetcher.fetch(url, headers=headers)
+            doc, pending = processor._document_from_result(result, use_cache)
+            if pending is not None:
+                pending_entries[url] = pending
+            if doc is not None:
+                self.stats.documents += 1
+                yield doc
+
+        async def extract(doc):
+            docs = await _take_available(doc_queue, doc, self.theme_batch_size)
+            async with timed("ingestion.theme_keywords"):
+                results = await processor.theme_keywords_extractor.aextract(
+                    docs, errors={}
+                )
+            for doc, result in zip(docs, results):
+                entry = pending_entries.get(doc.metadata["source"])
+                if entry is not None and result is not None:
+                    entry.summary = result.summary
+                    entry.keywords = " ".join(result.keywords)
+                elif entry is not None:
+                    pending_entries.pop(doc.metadata["source"], None)
+            for doc in processor.enrich_documents(docs, results, store_parents=False):
+                yield doc
+
+        text_splitter = processor._get_text_splitter(
+            self.chunk_size, self.chunk_overlap
+        )
+
+        async def split(doc):
+            # The parents of all enriched documents waiting here are stored in one transaction.
+            docs = await _take_available(enriched_queue, doc, self.queue_size)
+            processor.store_parents(docs)
+            async with timed("ingestion.split"):
+                chunks = await text_splitter.asplit_documents(docs)
+            for chunk in chunks:
+                yield chunk
+
+        async with AsyncWebFetcher(
+            max_concurrency=self.fetch_concurrency,
+            requests_per_host=self.requests_per_host,
+        ) as fetcher:
+            tasks = [
+                asyncio.create_task(feed()),
+                asyncio.create_task(
+                    _run_stage(fetch, url_queue, doc_queue, self.fetch_concurrency)
+                ),
+                asyncio.create_task(
+                    _run_stage(
+                        extract, doc_queue, enriched_queue, self.theme_concurrency
+                    )
+                ),
+                asyncio.create_task(
+                    _run_stage(
+                        split, enriched_queue, chunk_queue, self.split_concurrency
+                    )
+                ),
+            ]
+            running = set(tasks)
+            try:
+                while (chunk := await _next_item(chunk_queue, running)) is not _DONE:
+                    if self.stats.first_chunk_seconds is None:
+                        self.stats.first_chunk_seconds = time.perf_counter() - start
+                    self.stats.chunks += 1
+                    yield chunk
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+        if commit_cache:
+            self.commit_fetch_cache()
+        self.stats.unchanged = len(processor.unchanged_urls)
+        self.stats.failed = len(processor.failed_urls)
+        self.stats.seconds = time.perf_counter() - start
+
+    @timed("ingestion.pipeline")
+    async def arun(self, urls, refresh=False, deterministic_ids=True):
+        """
+        Input: List of URLs
+        Output: PipelineStats. Streams every chunk into the VectorDBManager while later pages
+        are still being fetched and processed. Fetch cache entries are written only after
+        all chunks were inserted. With deterministic_ids=True, re-ingested pages are synced:
+        unchanged chunks are skipped and chunks a page no longer produces are deleted.
+        """
+        if self.vector_db_manager is None:
+            raise ValueError(
+                "arun needs a vector_db_manager; use astream to only produce chunks."
+            )
+        insert_stats = await self.vector_db_manager.aadd_documents_streaming(
+            self.astream(urls, refresh=refresh, commit_cache=False),
+            batch_size=self.insert_batch_size,
+            deterministic_ids=deterministic_ids,
+        )
+        self.commit_fetch_cache()
+        self.stats.inserted = insert_stats.documents
+        self.stats.deleted = insert_stats.deleted
+        logger.info(
+            f"Ingested {self.stats.urls} URLs -> {self.stats.documents} documents -> "
+            f"{self.stats.inserted} chunks inserted, {self.stats.deleted} deleted "
+            f"in {self.stats.seconds:.1f}s "
+            f"(first chunk after {self.stats.first_chunk_seconds or 0:.1f}s, "
+            f"{self.stats.unchanged} unchanged, {self.stats.failed} failed)."
+        )
+        return self.stats
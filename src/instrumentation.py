@@ -0,0 +1,440 @@
+"""
+Instrumentation Module
+This module records stage and graph node latencies, LLM token usage per chain, retrieval
+result counts and cache hits, and exports them as Prometheus text or a JSON snapshot.
+
+Recording is off until `metrics.enable()` is called (or the RAG_METRICS environment variable
+is set to 1); while disabled, an instrumented call costs one attribute check.
+
+    from src.instrumentation import metrics, timed
+
+    @timed("ingestion.split")
+    def split_documents(...): ...
+
+    async with timed("retrieval", backend="milvus"):
+        ...
+"""
+
+import inspect
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.callbacks import BaseCallbackHandler
+from loguru import logger
+
+# Prometheus client default buckets, extended for multi-second LLM calls.
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class Histogram:
+    """
+    A cumulative-bucket histogram in the Prometheus layout: a value is counted in the first
+    bucket whose upper bound is >= the value, or in the +Inf bucket.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """
+        Estimates the q-quantile by linear interpolation inside its bucket, as Prometheus'
+        histogram_quantile does. Values in the +Inf bucket are reported as the last bound.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, n in enumerate(self.counts[:-1]):
+            if n and cumulative + n >= rank:
+                lower = self.buckets[i - 1] if i else min(0.0, self.buckets[0])
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / n
+            cumulative += n
+        return self.buckets[-1]
+
+
+class _Timer:
+    """
+    Records the duration of a block or of every call of a function in the
+    `stage_latency_seconds` histogram. Works as a decorator on sync functions, coroutine
+    functions and async generators, and as a sync or async context manager. A context
+    manager instance times one block at a time; create one per block.
+    """
+
+    def __init__(self, registry, stage, labels):
+        self.registry = registry
+        self.stage = stage
+        self.labels = labels
+        self._start = None
+
+    def _record(self, start, failed):
+        self.registry.record_latency(
+            self.stage, time.perf_counter() - start, failed, **self.labels
+        )
+
+    def __enter__(self):
+        self._start = time.perf_counter() if self.registry.enabled else None
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._start is not None:
+            self._record(self._start, exc_type is not None)
+            self._start = None
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+    def __call__(self, func):
+        registry = self.registry
+
+        if inspect.isasyncgenfunction(func):
+
+            @wraps(func)
+            async def agen_wrapper(*args, **kwargs):
+                if not registry.enabled:
+                    async for item in func(*args, **kwargs):
+                        yield item
+                    return
+                start, failed = time.perf_counter(), True
+                try:
+                    async for item in func(*args, **kwargs):
+                        yield item
+                    failed = False
+                finally:
+                    self._record(start, failed)
+
+            return agen_wrapper
+
+        if inspect.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not registry.enabled:
+                    return await func(*args, **kwargs)
+                start, failed = time.perf_counter(), True
+                try:
+                    result = await func(*args, **kwargs)
+                    failed = False
+                    return result
+                finally:
+                    self._record(start, failed)
+
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return func(*args, **kwargs)
+            start, failed = time.perf_counter(), True
+            try:
+                result = func(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                self._record(start, failed)
+
+        return wrapper
+
+
+class MetricsRegistry:
+    """
+    Holds counters and histograms, each keyed by name and label set.
+
+    Args:
+        enabled: Whether values are recorded.
+        prefix: Prefix of the exported Prometheus metric names.
+    """
+
+    def __init__(self, enabled=False, prefix="rag"):
+        self.enabled = enabled
+        self.prefix = prefix
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self._counters = {}
+            self._histograms = {}
+
+    def increment(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def record_latency(self, stage, seconds, failed=False, **labels):
+        self.observe("stage_latency_seconds", seconds, stage=stage, **labels)
+        if failed:
+            self.increment("stage_errors_total", stage=stage, **labels)
+
+    def timed(self, stage, **labels):
+        """
+        Returns a decorator / context manager timing `stage`. Extra keyword arguments are
+        added as labels, e.g. timed("document_grader_node", kind="node").
+        """
+        return _Timer(self, stage, labels)
+
+    def snapshot(self):
+        """
+        Returns every series as a JSON-serializable dict. Histograms are summarized with
+        their count, sum, mean and estimated p50/p95/p99.
+        """
+        with self._lock:
+            counters = {
+                name: [
+                    {"labels": dict(key), "value": value}
+                    for key, value in series.items()
+                ]
+                for name, series in sorted(self._counters.items())
+            }
+            histograms = {
+                name: [
+                    {
+                        "labels": dict(key),
+                        "count": h.count,
+                        "sum": h.sum,
+                        "mean": h.sum / h.count if h.count else None,
+                        "p50": h.quantile(0.5),
+                        "p95": h.quantile(0.95),
+                        "p99": h.quantile(0.99),
+                    }
+                    for key, h in series.items()
+                ]
+                for name, series in sorted(self._histograms.items())
+            }
+        return {"counters": counters, "histograms": histograms}
+
+    def to_json(self, indent=2):
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self):
+        """
+        Returns the metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                metric = f"{self.prefix}_{name}"
+                lines.append(f"# TYPE {metric} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{metric}{_format_labels(key)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                metric = f"{self.prefix}_{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                for key, h in sorted(series.items()):
+                    cumulative = 0
+                    for bound, n in zip(h.buckets + ("+Inf",), h.counts):
+                        cumulative += n
+                        labels = _format_labels(key, [("le", str(bound))])
+                        lines.append(f"{metric}_bucket{labels} {cumulative}")
+                    lines.append(f"{metric}_sum{_format_labels(key)} {h.sum}")
+                    lines.append(f"{metric}_count{_format_labels(key)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=9464, host="0.0.0.0"):
+        """
+        Serves /metrics (Prometheus text) and /metrics.json (snapshot) from a daemon thread.
+        Returns the HTTP server; call its shutdown() to stop it.
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = (
+                        registry.to_prometheus(),
+                        "text/plain; version=0.0.4",
+                    )
+                elif self.path == "/metrics.json":
+                    body, content_type = registry.to_json(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                payload = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        logger.info(f"Serving metrics on http://{host}:{server.server_port}/metrics")
+        return server
+
+
+metrics = MetricsRegistry(
+    enabled=os.getenv("RAG_METRICS", "").lower() in ("1", "true", "yes")
+)
+
+
+def timed(stage, **labels):
+    """
+    Times `stage` in the global registry; see MetricsRegistry.timed.
+    """
+    return metrics.timed(stage, **labels)
+
+
+def record_cache(cache, result, n=1, **labels):
+    """
+    Counts n requests to `cache` ("retrieval", "embedding", "llm", "fetch") with the given
+    result ("hit", "semantic_hit" or "miss").
+    """
+    if n:
+        metrics.increment(
+            "cache_requests_total", n, cache=cache, result=result, **labels
+        )
+
+
+def record_retrieval(documents, **labels):
+    """
+    Records the number of documents a retrieval returned, and returns the documents.
+    """
+    metrics.observe("retrieval_results", len(documents), COUNT_BUCKETS, **labels)
+    return documents
+
+
+class TokenUsageCallback(BaseCallbackHandler):
+    """
+    Records LLM calls, latency and token usage per chain. Structured output chains are
+    named after their schema (RouteQuery, GradingDocuments, ...); other calls after the
+    run name. Attach it to the model, e.g. get_llm(callbacks=[TokenUsageCallback()]).
+
+    Args:
+        registry: MetricsRegistry to record into (defaults to the global one).
+    """
+
+    run_inline = True
+
+    def __init__(self, registry=None):
+        self.registry = registry or metrics
+        self._runs = {}
+
+    @staticmethod
+    def _chain_name(kwargs):
+        structured = (kwargs.get("options") or {}).get("ls_structured_output_format")
+        if structured:
+            schema = structured.get("schema") or {}
+            schema = schema.get("function", schema)
+            name = schema.get("title") or schema.get("name")
+            if name:
+                return name
+        for tool in (kwargs.get("invocation_params") or {}).get("tools") or []:
+            name = tool.get("function", {}).get("name")
+            if name:
+                return name
+        return kwargs.get("name") or "unstructured"
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        if self.registry.enabled:
+            self._runs[run_id] = (self._chain_name(kwargs), time.perf_counter())
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        if self.registry.enabled:
+            self._runs[run_id] = (self._chain_name(kwargs), time.perf_counter())
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        chain, start = run
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(
+                    getattr(generation, "message", None), "usage_metadata", None
+                )
+                if usage:
+                    input_tokens += usage.get("input_tokens", 0)
+                    output_tokens += usage.get("output_tokens", 0)
+        if not input_tokens and not output_tokens:
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            input_tokens = usage.get("prompt_tokens", 0)
+            output_tokens = usage.get("completion_tokens", 0)
+        self.registry.increment("llm_calls_total", chain=chain)
+        self.registry.increment(
+            "llm_tokens_total", input_tokens, chain=chain, type="input"
+        )
+        self.registry.increment(
+            "llm_tokens_total", output_tokens, chain=chain, type="output"
+        )
+        self.registry.observe(
+            "llm_latency_seconds", time.perf_counter() - start, chain=chain
+        )
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            self.registry.increment(
+                "llm_errors_total", chain=run[0], error=type(error).__name__
+            )
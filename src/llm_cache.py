@@ -0,0 +1,209 @@
+"""
+LLM Cache Module
+This module provides a persistent SQLite cache of LLM responses with size/TTL eviction and
+per-chain hit statistics, used by passing it as `cache` to get_llm.
+"""
+
+import hashlib
+import importlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import ChatGeneration
+from pydantic import BaseModel
+
+from src.instrumentation import record_cache
+
+# Structured output shows up in the llm_string either as a bound response_format class
+# (json_schema method) or as a bound tool/function definition (function_calling method).
+_SCHEMA_CLASS_PATTERN = re.compile(r"<class '([\w.]+)'>")
+_SCHEMA_NAME_PATTERN = re.compile(r"""['"]name['"]: ['"](\w+)['"]""")
+
+
+@lru_cache(maxsize=256)
+def _schema_fingerprint(class_path):
+    """
+    Hashes the JSON schema of a pydantic class given by its dotted path, so a changed output
+    schema does not reuse responses produced for the old one.
+    """
+    module_name, _, class_name = class_path.rpartition(".")
+    try:
+        schema = getattr(importlib.import_module(module_name), class_name)
+        schema_json = json.dumps(schema.model_json_schema(), sort_keys=True)
+    except (ImportError, AttributeError, TypeError, ValueError):
+        return ""
+    return hashlib.sha256(schema_json.encode("utf-8")).hexdigest()[:16]
+
+
+def chain_name(llm_string):
+    """
+    Returns the output schema name bound to the model, which identifies the chain
+    (RouteQuery, GradeDocuments, ...), or "default" for plain calls.
+    """
+    params = llm_string.rpartition("---")[2]
+    match = _SCHEMA_CLASS_PATTERN.search(params)
+    if match:
+        return match.group(1).rpartition(".")[2]
+    match = _SCHEMA_NAME_PATTERN.search(params)
+    return match.group(1) if match else "default"
+
+
+def _storable(generation):
+    """
+    Structured outputs carry the parsed pydantic object in the message; it is stored as a dict,
+    which the structured output parser converts back into the schema.
+    """
+    if isinstance(generation, ChatGeneration):
+        parsed = generation.message.additional_kwargs.get("parsed")
+        if isinstance(parsed, BaseModel):
+            message = generation.message.model_copy(deep=True)
+            message.additional_kwargs["parsed"] = parsed.model_dump()
+            return generation.model_copy(update={"message": message})
+    return generation
+
+
+class SQLiteLLMCache(BaseCache):
+    """
+    Caches LLM generations in a SQLite database.
+
+    The key is the hash of the rendered prompt and the llm_string, which holds the deployment,
+    sampling parameters and the bound output schema, plus a fingerprint of that schema's
+    JSON schema. Works for sync, async and with_structured_output calls.
+
+    Args:
+        db_path: Path to the SQLite database file.
+        ttl: Seconds an entry stays valid, or None to keep entries until evicted.
+        max_entries: Maximum number of entries; the least recently used are evicted first.
+    """
+
+    def __init__(
+        self, db_path=".cache/llm/llm_cache.sqlite", ttl=None, max_entries=100_000
+    ):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = Counter()
+        self.misses = Counter()
+        self._lock = threading.Lock()
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, chain TEXT, response TEXT, "
+            "created_at REAL, accessed_at REAL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _key(prompt, llm_string):
+        match = _SCHEMA_CLASS_PATTERN.search(llm_string.rpartition("---")[2])
+        fingerprint = _schema_fingerprint(match.group(1)) if match else ""
+        payload = "\x00".join((prompt, llm_string, fingerprint))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt, llm_string):
+        key = self._key(prompt, llm_string)
+        chain = chain_name(llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl is not None and row[1] + self.ttl <= now:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses[chain] += 1
+                record_cache("llm", "miss", chain=chain)
+                return None
+            self._conn.execute(
+                "UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits[chain] += 1
+        record_cache("llm", "hit", chain=chain)
+        return [loads(generation) for generation in json.loads(row[0])]
+
+    def update(self, prompt, llm_string, return_val):
+        key = self._key(prompt, llm_string)
+        response = json.dumps(
+            [dumps(_storable(generation)) for generation in return_val]
+        )
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?)",
+                (key, chain_name(llm_string), response, now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        if self.ttl is not None:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE created_at <= ?", (time.time() - self.ttl,)
+            )
+        excess = (
+            self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            - self.max_entries
+        )
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY accessed_at LIMIT ?)",
+                (excess,),
+            )
+
+    def clear(self, **kwargs):
+        """
+        Deletes every entry, or only those of one chain if `chain` is given.
+        """
+        with self._lock:
+            if "chain" in kwargs:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE chain = ?", (kwargs["chain"],)
+                )
+            else:
+                self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def stats(self):
+        """
+        Returns the number of entries and the hits, misses and hit rate per chain.
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            per_chain = {}
+            for chain in set(self.hits) | set(self.misses):
+                hits, misses = self.hits[chain], self.misses[chain]
+                per_chain[chain] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": hits / (hits + misses),
+                }
+            hits, misses = sum(self.hits.values()), sum(self.misses.values())
+        return {
+            "entries": entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "chains": per_chain,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,202 @@
+"""
+Multi-Query Module
+This module provides multi-query retrieval: one LLM call rewrites the question into several
+search queries, all of them are searched in one batched retrieve_many call, and the result
+lists are merged locally with reciprocal rank fusion.
+"""
+
+import hashlib
+import threading
+from collections import Counter
+
+from langchain_core.documents import Document
+
+from src.retrieval_cache import normalize_query
+
+
+def document_key(doc):
+    """
+    Returns the chunk ID of a retrieved document (its "pk" metadata field), or a hash of its
+    source and text when the backend does not return one.
+    """
+    pk = doc.metadata.get("pk")
+    if pk is not None:
+        return pk
+    source = str(doc.metadata.get("source", ""))
+    return hashlib.sha256(f"{source}\n{doc.page_content}".encode("utf-8")).hexdigest()
+
+
+def reciprocal_rank_fusion(result_lists, rrf_k=60, limit=None, score_key="score"):
+    """
+    Input: Ranked document lists (one per query), the RRF constant and an optional limit.
+    Output: The documents of all lists deduplicated by chunk ID and ordered by their fused
+    score, sum(1 / (rrf_k + rank)) over the lists they appear in (rank starting at 1). Ties
+    keep the order of first appearance. The fused score is stored in the score_key metadata
+    field of the returned copies, so ContextPacker ranks by it.
+    """
+    scores = {}
+    documents = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = document_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            documents.setdefault(key, doc)
+    order = sorted(scores, key=lambda key: -scores[key])
+    if limit is not None:
+        order = order[:limit]
+    return [
+        Document(
+            page_content=documents[key].page_content,
+            metadata={**documents[key].metadata, score_key: scores[key]},
+        )
+        for key in order
+    ]
+
+
+class MultiQueryRetriever:
+    """
+    Replaces serial rewrite -> retrieve round trips with a single fused retrieval:
+        1. The rewrite chain (get_multi_query_rewrite_chain) returns several query variants
+           in one call.
+        2. The original question and the distinct variants are embedded in one batch and
+           searched together with the vector store's retrieve_many.
+        3. The result lists are merged with reciprocal rank fusion, deduplicated by chunk ID.
+
+    Args:
+        vector_db_manager: VectorDBManager (or NumpyVectorDBManager) searched. GraphBuilder
+            fills in its own when this is None.
+        rewrite_chain: The chain created by get_multi_query_rewrite_chain. GraphBuilder fills
+            in one built from its llm when this is None.
+        k: Number of fused documents returned.
+        per_query_k: Documents retrieved per query before fusion (defaults to 2 * k).
+        rrf_k: Reciprocal rank fusion constant; larger values flatten the rank weights.
+        include_original: Also search the original question, not only its variants.
+        max_queries: Maximum number of queries searched per question.
+        method: Ranking method of each hybrid search ("weighted" or "rrf").
+    """
+
+    def __init__(
+        self,
+        vector_db_manager=None,
+        rewrite_chain=None,
+        k=5,
+        per_query_k=None,
+        rrf_k=60,
+        include_original=True,
+        max_queries=6,
+        method="weighted",
+    ):
+        self.vector_db_manager = vector_db_manager
+        self.rewrite_chain = rewrite_chain
+        self.k = k
+        self.per_query_k = per_query_k
+        self.rrf_k = rrf_k
+        self.include_original = include_original
+        self.max_queries = max_queries
+        self.method = method
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    def queries(self, question, variants):
+        """
+        Returns the queries to search: the original question (if included) followed by the
+        variants, without empty or repeated (after normalization) queries.
+        """
+        seen = set()
+        queries = []
+        for query in ([question] if self.include_original else []) + list(variants):
+            normalized = normalize_query(query or "")
+            if normalized and normalized not in seen:
+                seen.add(normalized)
+                queries.append(query.strip())
+        return queries[: self.max_queries]
+
+    def _search_kwargs(self, k, filters):
+        kwargs = {"k": self.per_query_k or 2 * k, "method": self.method}
+        if filters:
+            kwargs["filters"] = filters
+        return kwargs
+
+    def _fuse_all(self, query_lists, results, k):
+        fused, start = [], 0
+        for queries in query_lists:
+            lists = results[start : start + len(queries)]
+            start += len(queries)
+            documents = reciprocal_rank_fusion(lists, self.rrf_k, limit=k)
+            fused.append(documents)
+            with self._lock:
+                self._stats["questions"] += 1
+                self._stats["queries"] += len(queries)
+                self._stats["candidates"] += sum(len(docs) for docs in lists)
+                self._stats["fused"] += len(documents)
+        return fused
+
+    def search_many(self, query_lists, k=None, filters=None):
+        """
+        Input: One list of queries per question.
+        Output: One fused document list per question. The queries of all questions are sent
+        as a single retrieve_many call.
+        """
+        k = k or self.k
+        flat = [query for queries in query_lists for query in queries]
+        if not flat:
+            return [[] for _ in query_lists]
+        results = self.vector_db_manager.retrieve_many(
+            flat, **self._search_kwargs(k, filters)
+        )
+        return self._fuse_all(query_lists, results, k)
+
+    async def asearch_many(self, query_lists, k=None, filters=None):
+        """
+        Async version of search_many.
+        """
+        k = k or self.k
+        flat = [query for queries in query_lists for query in queries]
+        if not flat:
+            return [[] for _ in query_lists]
+        results = await self.vector_db_manager.aretrieve_many(
+            flat, **self._search_kwargs(k, filters)
+        )
+        return self._fuse_all(query_lists, results, k)
+
+    def _variants(self, op):
+        with self._lock:
+            self._stats["rewrite_calls"] += 1
+        return getattr(op, "queries", None) or []
+
+    def retrieve(self, question, context="", k=None, filters=None):
+        """
+        Input: The question, the keywords of the documents retrieved so far (rewrite context),
+        the number of documents and optional metadata filters.
+        Output: (fused documents, queries searched).
+        """
+        op = self.rewrite_chain.invoke({"question": question, "context": context})
+        queries = self.queries(question, self._variants(op))
+        return self.search_many([queries], k, filters)[0], queries
+
+    async def aretrieve(self, question, context="", k=None, filters=None):
+        """
+        Async version of retrieve.
+        """
+        op = await self.rewrite_chain.ainvoke(
+            {"question": question, "context": context}
+        )
+        queries = self.queries(question, self._variants(op))
+        return (await self.asearch_many([queries], k, filters))[0], queries
+
+    def stats(self):
+        """
+        Returns counters plus the average number of queries per question and the share of
+        retrieved candidates that were duplicates across queries or cut by the fusion limit.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        questions = stats.get("questions", 0)
+        candidates = stats.get("candidates", 0)
+        stats["queries_per_question"] = (
+            stats.get("queries", 0) / questions if questions else 0.0
+        )
+        stats["fusion_reduction"] = (
+            1 - stats.get("fused", 0) / candidates if candidates else 0.0
+        )
+        return stats
@@ -0,0 +1,758 @@
+"""
+NumPy Vector DB Module
+This module provides an in-process hybrid (dense + BM25) search backend with the same
+interface as VectorDBManager, for small and medium collections and for tests.
+"""
+
+import asyncio
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import time
+from collections import defaultdict
+from uuid import uuid4
+
+import numpy as np
+from langchain_core.documents import Document
+from loguru import logger
+
+from src.filters import compile_filter, equality_values, search_scope
+from src.instrumentation import record_retrieval, timed
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def _top_k(scores, k):
+    """
+    Returns the indices of the k highest scores, best first.
+    """
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+class BM25Index:
+    """
+    An inverted index over tokenized texts, scored with Okapi BM25.
+    Postings are kept as Python lists while documents are added and converted
+    to NumPy arrays on first search.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = defaultdict(lambda: ([], []))
+        self._arrays = {}
+        self.doc_lengths = np.zeros(0, dtype=np.float32)
+
+    def add(self, row, text):
+        tokens = tokenize(text)
+        counts = defaultdict(int)
+        for token in tokens:
+            counts[token] += 1
+        for token, count in counts.items():
+            rows, tfs = self._postings[token]
+            rows.append(row)
+            tfs.append(count)
+            self._arrays.pop(token, None)
+        if row >= self.doc_lengths.shape[0]:
+            grown = np.zeros(
+                max(row + 1, 2 * self.doc_lengths.shape[0]), dtype=np.float32
+            )
+            grown[: self.doc_lengths.shape[0]] = self.doc_lengths
+            self.doc_lengths = grown
+        self.doc_lengths[row] = len(tokens)
+
+    def _postings_array(self, token):
+        if token not in self._arrays:
+            rows, tfs = self._postings[token]
+            self._arrays[token] = (
+                np.asarray(rows, dtype=np.int64),
+                np.asarray(tfs, dtype=np.float32),
+            )
+        return self._arrays[token]
+
+    def score(self, query, n_rows, alive, mask=None):
+        """
+        Returns a BM25 score for every row. Rows that are not alive, or not in mask when one
+        is given, score 0; the corpus statistics always cover every live row.
+        """
+        scores = np.zeros(n_rows, dtype=np.float32)
+        n_docs = int(alive[:n_rows].sum())
+        if n_docs == 0:
+            return scores
+        lengths = self.doc_lengths[:n_rows]
+        avg_length = float(lengths[alive[:n_rows]].mean()) or 1.0
+        for token in set(tokenize(query)):
+            if token not in self._postings:
+                continue
+            rows, tfs = self._postings_array(token)
+            live = alive[rows]
+            rows, tfs = rows[live], tfs[live]
+            if rows.size == 0:
+                continue
+            # Document frequency counts every live row; the mask only limits what is scored.
+            idf = math.log(1 + (n_docs - rows.size + 0.5) / (rows.size + 0.5))
+            if mask is not None:
+                in_scope = mask[rows]
+                rows, tfs = rows[in_scope], tfs[in_scope]
+                if rows.size == 0:
+                    continue
+            norm = self.k1 * (1 - self.b + self.b * lengths[rows] / avg_length)
+            np.add.at(scores, rows, idf * tfs * (self.k1 + 1) / (tfs + norm))
+        return scores
+
+
+class NumpyVectorDBManager:
+    """
+    An embedded hybrid search backend with the same methods as VectorDBManager.
+
+    Dense vectors are kept L2-normalised in one contiguous float32 matrix and searched with
+    a single matrix product and a partial sort. A BM25 inverted index covers page_content.
+    Scores are fused with the same "weighted" and "rrf" methods as the Milvus backend.
+
+    With db_path set, every collection is stored under db_path/<collection_name> and loaded
+    on construction (the vectors memory-mapped). Changes are appended: new rows to the vector
+    and JSON lines files, deletions to a tombstone log. Deleted and replaced rows stay in
+    memory and on disk until the collection is compacted, which happens automatically once
+    they make up more than compact_threshold of the rows, or on compact()/save().
+
+    Searches can be scoped with metadata filters (see src.filters). With partition_key_field
+    set, the rows of every value of that field are indexed, so a search filtered on the field
+    (or given partitions) scores only those rows instead of the whole collection.
+
+    Args:
+        embedder: The embedding model used for documents and queries.
+        collection_name: Name of the collection.
+        db_path: Optional directory for persistence; None keeps the collection in memory only.
+        drop_old: If True, an existing collection with the same name is discarded.
+        retrieval_cache: Optional RetrievalCache, invalidated on every change.
+        bm25_k1: BM25 term frequency saturation.
+        bm25_b: BM25 length normalisation.
+        compact_threshold: Share of dead rows that triggers compact(); None disables it.
+        partition_key_field: Optional metadata field whose values partition the collection.
+        parent_store: Optional ParentStore holding the document-level metadata of chunks
+            that only carry a parent_id and its chunk_fields (the partition key field is
+            added to them); used by resolve_parents=True.
+    """
+
+    def __init__(
+        self,
+        embedder,
+        collection_name,
+        db_path=None,
+        drop_old=False,
+        retrieval_cache=None,
+        bm25_k1=1.5,
+        bm25_b=0.75,
+        compact_threshold=0.3,
+        partition_key_field=None,
+        parent_store=None,
+    ):
+        self.embedder = embedder
+        self.collection_name = collection_name
+        self.db_path = db_path
+        self.retrieval_cache = retrieval_cache
+        self.bm25_k1 = bm25_k1
+        self.bm25_b = bm25_b
+        self.compact_threshold = compact_threshold
+        self.partition_key_field = partition_key_field
+        self.parent_store = parent_store
+        if parent_store is not None:
+            # Chunks must keep the partition key, or they could not be partitioned or found.
+            parent_store.keep_on_chunks(partition_key_field)
+        self._lock = threading.RLock()
+        self._reset()
+        if drop_old and self.check_collections():
+            logger.warning(
+                f"drop_old=True: Collection '{self.collection_name}' will be dropped and recreated. All previous data will be lost."
+            )
+            self.drop_collections(self.collection_name)
+        elif self.db_path and os.path.exists(self._collection_path()):
+            self.load()
+
+    def _reset(self):
+        self._dense = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._n_rows = 0
+        self._ids = []
+        self._texts = []
+        self._metadatas = []
+        self._row_of = {}
+        self._partition_rows = defaultdict(list)
+        self._bm25 = BM25Index(self.bm25_k1, self.bm25_b)
+
+    def _index_partition(self, row, metadata):
+        if self.partition_key_field:
+            self._partition_rows[metadata.get(self.partition_key_field)].append(row)
+
+    def _collection_path(self, collection_name=None):
+        return os.path.join(self.db_path, collection_name or self.collection_name)
+
+    def _invalidate_cache(self):
+        if self.retrieval_cache is not None:
+            self.retrieval_cache.invalidate()
+
+    def warmup(self, embed=True):
+        """
+        Same as VectorDBManager.warmup; the collection is already in memory, so only the
+        embedder is exercised. Returns the seconds spent.
+        """
+        start = time.perf_counter()
+        if embed:
+            self.embedder.embed_query("warmup")
+        return time.perf_counter() - start
+
+    def __len__(self):
+        return int(self._alive[: self._n_rows].sum())
+
+    def _ensure_capacity(self, n_new, dim):
+        needed = self._n_rows + n_new
+        if self._dense is None:
+            self._dense = np.zeros((max(needed, 1024), dim), dtype=np.float32)
+            self._alive = np.zeros(self._dense.shape[0], dtype=bool)
+        elif needed > self._dense.shape[0] or not self._dense.flags.writeable:
+            capacity = max(needed, 2 * self._dense.shape[0])
+            dense = np.zeros((capacity, dim), dtype=np.float32)
+            dense[: self._n_rows] = self._dense[: self._n_rows]
+            alive = np.zeros(capacity, dtype=bool)
+            alive[: self._n_rows] = self._alive[: self._n_rows]
+            self._dense, self._alive = dense, alive
+
+    @timed("ingestion.insert", backend="numpy")
+    def add_documents(self, docs: list[Document], uuids: list[str] = None):
+        """
+        Adds documents to the collection.
+        If uuids are not provided, generates new ones. Documents whose ID already
+        exists replace the stored version.
+        """
+        if not docs:
+            return
+        if uuids is None:
+            uuids = [str(uuid4()) for _ in range(len(docs))]
+        vectors = np.asarray(
+            self.embedder.embed_documents([doc.page_content for doc in docs]),
+            dtype=np.float32,
+        )
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        with self._lock:
+            self._ensure_capacity(len(docs), vectors.shape[1])
+            rows = np.arange(self._n_rows, self._n_rows + len(docs))
+            self._dense[rows] = vectors
+            self._alive[rows] = True
+            for row, doc, id_ in zip(rows, docs, uuids):
+                self._add_record(int(row), id_, doc.page_content, dict(doc.metadata))
+            self._n_rows += len(docs)
+            self._append_rows(rows)
+            self._maybe_compact()
+        self._invalidate_cache()
+        logger.info(
+            f"Added {len(docs)} documents to the collection '{self.collection_name}'."
+        )
+
+    def delete(self, ids):
+        """
+        Deletes documents by ID.
+        """
+        with self._lock:
+            deleted = []
+            for id_ in ids:
+                row = self._row_of.pop(id_, None)
+                if row is not None:
+                    self._alive[row] = False
+                    deleted.append(row)
+            self._append_tombstones(deleted)
+            self._maybe_compact()
+        self._invalidate_cache()
+
+    def _document(self, row):
+        return Document(
+            page_content=self._texts[row],
+            metadata={**self._metadatas[row], "pk": self._ids[row]},
+        )
+
+    def _scope_mask(self, scope):
+        """
+        Returns the rows a scoped search may return as a boolean mask, or None when the
+        scope does not filter. Partition hints and equality filters on the partition key
+        field select rows from the partition index; other filters are then checked on the
+        metadata of those rows only.
+        """
+        scope = scope or {}
+        if "expr" in scope:
+            raise ValueError(
+                "Milvus expressions are not supported by NumpyVectorDBManager; use filters."
+            )
+        partitions = scope.get("partitions")
+        filters = scope.get("filters")
+        if not partitions and not filters:
+            return None
+        if partitions and not self.partition_key_field:
+            raise ValueError("partitions need a partition_key_field.")
+        alive = self._alive[: self._n_rows]
+        values = set(partitions) if partitions else None
+        if self.partition_key_field:
+            restricted = equality_values(filters, self.partition_key_field)
+            if restricted is not None:
+                values = restricted if values is None else values & restricted
+        if values is None:
+            mask = alive.copy()
+        else:
+            mask = np.zeros(self._n_rows, dtype=bool)
+            for value in values:
+                mask[self._partition_rows.get(value, [])] = True
+            mask &= alive
+        predicate = compile_filter(filters)
+        if predicate is not None:
+            for row in np.flatnonzero(mask):
+                if not predicate(self._metadatas[row]):
+                    mask[row] = False
+        return mask
+
+    def _fuse(
+        self, dense_scores, sparse_scores, k, method, ranker_params, fetch_k, mask=None
+    ):
+        """
+        Fuses dense and BM25 scores of one query and returns the top-k rows.
+        Like Milvus, only the fetch_k best candidates of each search take part in the fusion.
+        """
+        alive = self._alive[: self._n_rows] if mask is None else mask
+        dense_scores = np.where(alive, dense_scores, -np.inf)
+        sparse_scores = np.where(alive & (sparse_scores > 0), sparse_scores, -np.inf)
+        dense_top = _top_k(dense_scores, fetch_k)
+        dense_top = dense_top[np.isfinite(dense_scores[dense_top])]
+        sparse_top = _top_k(sparse_scores, fetch_k)
+        sparse_top = sparse_top[np.isfinite(sparse_scores[sparse_top])]
+        candidates = np.union1d(dense_top, sparse_top)
+        if candidates.size == 0:
+            return []
+        fused = np.zeros(candidates.size, dtype=np.float32)
+        if method == "weighted":
+            weights = (ranker_params or {"weights": [0.5, 0.5]})["weights"]
+            # Same normalisation as the Milvus WeightedRanker for COSINE and BM25 scores.
+            in_dense = np.isin(candidates, dense_top)
+            in_sparse = np.isin(candidates, sparse_top)
+            fused += np.where(
+                in_dense,
+                weights[0] * (0.5 + np.arctan(dense_scores[candidates]) / np.pi),
+                0,
+            )
+            fused += np.where(
+                in_sparse,
+                weights[1] * (2 * np.arctan(sparse_scores[candidates]) / np.pi),
+                0,
+            )
+        elif method == "rrf":
+            rrf_k = (ranker_params or {"k": 100})["k"]
+            for top in (dense_top, sparse_top):
+                ranks = np.full(self._n_rows, -1, dtype=np.int64)
+                ranks[top] = np.arange(top.size)
+                candidate_ranks = ranks[candidates]
+                fused += np.where(
+                    candidate_ranks >= 0, 1.0 / (rrf_k + candidate_ranks + 1), 0
+                )
+        else:
+            raise ValueError(f"Unsupported retrieval method: {method}")
+        return [int(candidates[i]) for i in _top_k(fused, k)]
+
+    def _search_many(
+        self, queries, vectors, k, method, ranker_params, fetch_k, scope=None
+    ):
+        if method not in ("weighted", "rrf"):
+            raise ValueError(f"Unsupported retrieval method: {method}")
+        fetch_k = fetch_k or (scope or {}).get("fetch_k") or max(k, 4)
+        with self._lock:
+            if self._n_rows == 0:
+                return [[] for _ in queries]
+            mask = self._scope_mask(scope)
+            queries_matrix = np.asarray(vectors, dtype=np.float32)
+            queries_matrix /= np.maximum(
+                np.linalg.norm(queries_matrix, axis=1, keepdims=True), 1e-12
+            )
+            if mask is None:
+                dense_scores = queries_matrix @ self._dense[: self._n_rows].T
+            else:
+                # Only the rows in scope are scored.
+                rows = np.flatnonzero(mask)
+                dense_scores = np.full(
+                    (len(queries), self._n_rows), -np.inf, dtype=np.float32
+                )
+                dense_scores[:, rows] = queries_matrix @ self._dense[rows].T
+            results = []
+            for query, query_dense in zip(queries, dense_scores):
+                sparse_scores = self._bm25.score(query, self._n_rows, self._alive, mask)
+                rows = self._fuse(
+                    query_dense, sparse_scores, k, method, ranker_params, fetch_k, mask
+                )
+                results.append([self._document(row) for row in rows])
+            return results
+
+    def _search(self, query, k, method, ranker_params, scope=None):
+        return self._search_many(
+            [query],
+            [self.embedder.embed_query(query)],
+            k,
+            method,
+            ranker_params,
+            None,
+            scope,
+        )[0]
+
+    @timed("retrieval.similar", backend="numpy")
+    def retrieve_similar(
+        self,
+        query,
+        k=2,
+        method="weighted",
+        ranker_params=None,
+        expr=None,
+        filters=None,
+        partitions=None,
+        search_params=None,
+        fetch_k=None,
+        resolve_parents=False,
+    ):
+        """
+        Retrieves similar documents using different methods.
+        Supported methods:
+            - "weighted": Uses a weighted ranker.
+            - "rrf": Uses reciprocal rank fusion.
+        Takes the same scoping options as VectorDBManager.retrieve_similar, except that
+        Milvus expressions (expr) are not supported, partitions are values of the partition
+        key field, and search_params are ignored since the dense search is exact.
+        With resolve_parents=True, the parent metadata is merged in from the parent store.
+        Results are served from the retrieval cache when one is configured.
+        """
+        scope = search_scope(expr, filters, partitions, search_params, fetch_k)
+        if self.retrieval_cache is None:
+            docs = self._search(query, k, method, ranker_params, scope)
+            return record_retrieval(
+                self._resolve_parents(docs, resolve_parents), backend="numpy"
+            )
+        cached = self.retrieval_cache.get(query, k, method, ranker_params, scope)
+        if cached is not None:
+            return record_retrieval(
+                self._resolve_parents(cached, resolve_parents), backend="numpy"
+            )
+        generation = self.retrieval_cache.generation
+        docs = self._search(query, k, method, ranker_params, scope)
+        self.retrieval_cache.put(
+            query, k, method, ranker_params, docs, generation=generation, scope=scope
+        )
+        return record_retrieval(
+            self._resolve_parents(docs, resolve_parents), backend="numpy"
+        )
+
+    def _resolve_parents(self, documents, resolve_parents):
+        if not resolve_parents or self.parent_store is None:
+            return documents
+        return self.parent_store.resolve(documents)
+
+    async def aretrieve_similar(
+        self, query, k=2, method="weighted", ranker_params=None, **kwargs
+    ):
+        return await asyncio.to_thread(
+            self.retrieve_similar, query, k, method, ranker_params, **kwargs
+        )
+
+    @timed("retrieval.many", backend="numpy")
+    def retrieve_many(
+        self,
+        queries,
+        k=2,
+        method="weighted",
+        ranker_params=None,
+        fetch_k=None,
+        expr=None,
+        filters=None,
+        partitions=None,
+        search_params=None,
+        resolve_parents=False,
+    ):
+        """
+        Retrieves similar documents for several queries, embedding them in one batch call
+        and scoring all of them against the dense matrix with a single matrix product.
+        The scoping options and resolve_parents apply to every query, as in retrieve_similar.
+        """
+        if not queries:
+            return []
+        scope = search_scope(expr, filters, partitions, search_params)
+        vectors = self.embedder.embed_documents(list(queries))
+        results = self._search_many(
+            queries, vectors, k, method, ranker_params, fetch_k, scope
+        )
+        if resolve_parents and self.parent_store is not None:
+            results = self.parent_store.resolve_many(results)
+        for docs in results:
+            record_retrieval(docs, backend="numpy")
+        return results
+
+    async def aretrieve_many(
+        self,
+        queries,
+        k=2,
+        method="weighted",
+        ranker_params=None,
+        fetch_k=None,
+        **kwargs,
+    ):
+        return await asyncio.to_thread(
+            self.retrieve_many, queries, k, method, ranker_params, fetch_k, **kwargs
+        )
+
+    def iter_metadata(self, fields, batch_size=1000, limit=-1):
+        """
+        Yields the requested metadata fields of every stored chunk as dicts.
+        """
+        rows = np.flatnonzero(self._alive[: self._n_rows])
+        if limit is not None and limit >= 0:
+            rows = rows[:limit]
+        for row in rows:
+            metadata = self._metadatas[row]
+            yield {field: metadata.get(field) for field in fields}
+
+    def check_collections(self):
+        """
+        Checks if the collection exists, in memory or on disk.
+        Returns True if it exists, False otherwise.
+        """
+        exists = self._n_rows > 0 or bool(
+            self.db_path and os.path.exists(self._collection_path())
+        )
+        if exists:
+            logger.info(f"Collection '{self.collection_name}' exists.")
+        else:
+            logger.warning(f"Collection '{self.collection_name}' does not exist.")
+        return exists
+
+    def drop_collections(self, collections_to_drop):
+        """
+        Drops one or more collections. The collection managed by this instance is also
+        cleared from memory; others are removed from db_path.
+        """
+        if isinstance(collections_to_drop, str):
+            collections_to_drop = [collections_to_drop]
+        for collection_name in collections_to_drop:
+            dropped = False
+            if collection_name == self.collection_name:
+                with self._lock:
+                    dropped = self._n_rows > 0
+                    self._reset()
+                self._invalidate_cache()
+            if self.db_path and os.path.exists(self._collection_path(collection_name)):
+                shutil.rmtree(self._collection_path(collection_name))
+                dropped = True
+            if dropped:
+                logger.info(f"Collection '{collection_name}' has been dropped.")
+            else:
+                logger.warning(
+                    f"Collection '{collection_name}' does not exist and cannot be dropped."
+                )
+
+    def _write_meta(self, path, rows, dim):
+        tmp_meta = os.path.join(path, "meta.json.tmp")
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump({"rows": int(rows), "dim": int(dim)}, f)
+        os.replace(tmp_meta, os.path.join(path, "meta.json"))
+
+    def _append_rows(self, rows):
+        """
+        Appends new rows to the collection files: their vectors to dense.f32 and their
+        records to docs.jsonl. meta.json, which holds the number of committed rows, is
+        rewritten last, so a partially written append is ignored (and truncated) on load.
+        """
+        if not self.db_path:
+            return
+        path = self._collection_path()
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            self._write_snapshot(path)
+            return
+        with open(os.path.join(path, "dense.f32"), "ab") as f:
+            self._dense[rows].tofile(f)
+        with open(os.path.join(path, "docs.jsonl"), "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(self._record_line(row))
+        self._write_meta(path, self._n_rows, self._dense.shape[1])
+
+    def _append_tombstones(self, rows):
+        """
+        Appends the numbers of deleted rows to tombstones.txt.
+        """
+        if not self.db_path or not rows:
+            return
+        path = self._collection_path()
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            self._write_snapshot(path)
+            return
+        with open(os.path.join(path, "tombstones.txt"), "a", encoding="utf-8") as f:
+            f.write("".join(f"{row}\n" for row in rows))
+
+    def _record_line(self, row):
+        return (
+            json.dumps(
+                {
+                    "id": self._ids[row],
+                    "text": self._texts[row],
+                    "metadata": self._metadatas[row],
+                }
+            )
+            + "\n"
+        )
+
+    def _maybe_compact(self):
+        dead = self._n_rows - len(self)
+        if (
+            self.compact_threshold is not None
+            and dead
+            and dead / self._n_rows > self.compact_threshold
+        ):
+            self.compact()
+
+    def compact(self):
+        """
+        Drops the deleted and replaced rows: the in-memory matrix, texts and indexes are
+        rebuilt from the live rows, and with db_path the collection files are rewritten
+        without them and the tombstone log is cleared. Runs automatically once the share
+        of dead rows exceeds compact_threshold. Returns the number of rows dropped.
+        """
+        with self._lock:
+            rows = np.flatnonzero(self._alive[: self._n_rows])
+            dropped = self._n_rows - rows.size
+            if dropped:
+                dense = self._dense[rows] if self._dense is not None else None
+                ids = [self._ids[row] for row in rows]
+                texts = [self._texts[row] for row in rows]
+                metadatas = [self._metadatas[row] for row in rows]
+                self._reset()
+                self._dense = dense
+                self._alive = np.ones(rows.size, dtype=bool)
+                for row, (id_, text, metadata) in enumerate(zip(ids, texts, metadatas)):
+                    self._add_record(row, id_, text, metadata)
+                self._n_rows = rows.size
+            if self.db_path and (
+                dropped or not os.path.exists(self._collection_path())
+            ):
+                self._write_snapshot(self._collection_path())
+        if dropped:
+            self._invalidate_cache()
+            logger.info(
+                f"Compacted collection '{self.collection_name}': dropped {dropped} dead rows."
+            )
+        return dropped
+
+    def _add_record(self, row, id_, text, metadata):
+        previous = self._row_of.get(id_)
+        if previous is not None:
+            self._alive[previous] = False
+        self._row_of[id_] = row
+        self._ids.append(id_)
+        self._texts.append(text)
+        self._metadatas.append(metadata)
+        self._index_partition(row, metadata)
+        self._bm25.add(row, text)
+
+    def _write_snapshot(self, path):
+        """
+        Writes the live rows to path: the dense matrix as a raw float32 file, the texts, IDs
+        and metadata as JSON lines, an empty tombstone log and meta.json.
+        """
+        os.makedirs(path, exist_ok=True)
+        rows = np.flatnonzero(self._alive[: self._n_rows])
+        dense = (
+            self._dense[rows]
+            if self._dense is not None
+            else np.zeros((0, 0), dtype=np.float32)
+        )
+        tmp_dense = os.path.join(path, "dense.f32.tmp")
+        dense.tofile(tmp_dense)
+        tmp_docs = os.path.join(path, "docs.jsonl.tmp")
+        with open(tmp_docs, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(self._record_line(row))
+        os.replace(tmp_dense, os.path.join(path, "dense.f32"))
+        os.replace(tmp_docs, os.path.join(path, "docs.jsonl"))
+        open(os.path.join(path, "tombstones.txt"), "w").close()
+        self._write_meta(path, rows.size, dense.shape[1])
+
+    def save(self, path=None):
+        """
+        Writes the live rows to path. Changes are already appended to db_path as they are
+        made, so saving to the collection's own directory compacts it (see compact); any
+        other path receives a compacted copy.
+        """
+        if path is None or (
+            self.db_path
+            and os.path.abspath(path) == os.path.abspath(self._collection_path())
+        ):
+            if not self.db_path:
+                raise ValueError("save() needs a path when db_path is not set.")
+            self.compact()
+            return
+        with self._lock:
+            self._write_snapshot(path)
+
+    def load(self, path=None):
+        """
+        Loads a collection written by save() or by appends. The dense matrix is
+        memory-mapped copy-on-write, so it is paged in on demand; the BM25 index is rebuilt
+        from the stored texts. Rows beyond the committed count in meta.json (an interrupted
+        append) are truncated, and the rows in the tombstone log are marked dead.
+        """
+        path = path or self._collection_path()
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        n_rows, dim = meta["rows"], meta["dim"]
+        with self._lock:
+            self._reset()
+            dense_path = os.path.join(path, "dense.f32")
+            if os.path.getsize(dense_path) > n_rows * dim * 4:
+                os.truncate(dense_path, n_rows * dim * 4)
+            if n_rows:
+                self._dense = np.memmap(
+                    dense_path, dtype=np.float32, mode="c", shape=(n_rows, dim)
+                )
+                self._dense.flags.writeable = False
+            self._alive = np.ones(n_rows, dtype=bool)
+            docs_path = os.path.join(path, "docs.jsonl")
+            with open(docs_path, "rb") as f:
+                for row in range(n_rows):
+                    record = json.loads(f.readline())
+                    self._add_record(
+                        row, record["id"], record["text"], record["metadata"]
+                    )
+                committed = f.tell()
+            if os.path.getsize(docs_path) > committed:
+                os.truncate(docs_path, committed)
+            self._n_rows = n_rows
+            self._load_tombstones(os.path.join(path, "tombstones.txt"))
+        self._invalidate_cache()
+        logger.info(
+            f"Loaded {len(self)} documents into collection '{self.collection_name}'."
+        )
+        self._maybe_compact()
+
+    def _load_tombstones(self, tombstones_path):
+        if not os.path.exists(tombstones_path):
+            return
+        with open(tombstones_path, "rb") as f:
+            data = f.read()
+        if data and not data.endswith(b"\n"):
+            # Drop a partially written last line, so later appends start on a new one.
+            data = data[: data.rfind(b"\n") + 1]
+            with open(tombstones_path, "wb") as f:
+                f.write(data)
+        for line in data.split():
+            row = int(line)
+            if row < self._n_rows:
+                self._alive[row] = False
+                if self._row_of.get(self._ids[row]) == row:
+                    del self._row_of[self._ids[row]]
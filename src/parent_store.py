@@ -0,0 +1,239 @@
+"""
+Parent Store Module
+This module provides a compact SQLite store for document-level metadata (title, summary,
+keywords, ...), so chunks only carry the ID of their parent document instead of a copy of it.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from langchain_core.documents import Document
+
+from src.instrumentation import record_cache
+
+PARENT_ID_FIELD = "parent_id"
+
+# Metadata always kept on every chunk when its document-level metadata moves to the parent
+# store. ParentStore.chunk_fields adds the fields searches filter or partition on.
+CHUNK_FIELDS = ("source", PARENT_ID_FIELD)
+
+# SQLite's default limit on host parameters per statement is 999.
+_MAX_PARAMS = 900
+
+
+def make_parent_id(source):
+    """
+    Builds a stable parent ID from the source URL; it is the same source hash that prefixes
+    the chunk IDs of make_chunk_id.
+    """
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+
+
+class ParentStore:
+    """
+    Stores one JSON metadata record per parent document in a SQLite table keyed by parent
+    ID, with an in-process LRU cache in front of it. Lookups for many IDs are answered from
+    the cache first and the misses are read in one query.
+
+    Args:
+        path: SQLite database file (":memory:" keeps the store in memory).
+        cache_size: Maximum number of parent records kept in the LRU cache.
+        chunk_fields: Document-level metadata fields also kept on the chunks, besides
+            CHUNK_FIELDS, because searches filter on them (src.filters only sees chunk
+            metadata). Vector store managers add their partition_key_field themselves.
+    """
+
+    def __init__(self, path=".cache/parents.sqlite3", cache_size=4096, chunk_fields=()):
+        self.path = path
+        self.cache_size = cache_size
+        self.chunk_fields = set(CHUNK_FIELDS)
+        self.keep_on_chunks(*chunk_fields)
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS parents "
+            "(parent_id TEXT PRIMARY KEY, metadata TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def keep_on_chunks(self, *fields):
+        """
+        Adds metadata fields to the ones kept on the chunks. Only affects documents enriched
+        afterwards.
+        """
+        self.chunk_fields.update(field for field in fields if field)
+
+    def chunk_metadata(self, metadata, parent_id):
+        """
+        Returns the metadata left on a chunk of the document: its chunk_fields and parent_id.
+        """
+        kept = {
+            key: value for key, value in metadata.items() if key in self.chunk_fields
+        }
+        kept[PARENT_ID_FIELD] = parent_id
+        return kept
+
+    def _cache_put(self, parent_id, metadata):
+        self._cache[parent_id] = metadata
+        self._cache.move_to_end(parent_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def put_many(self, parents):
+        """
+        Writes {parent_id: metadata} records in one transaction, replacing existing ones.
+        """
+        if not parents:
+            return
+        rows = [
+            (parent_id, json.dumps(metadata, separators=(",", ":"), default=str))
+            for parent_id, metadata in parents.items()
+        ]
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO parents (parent_id, metadata) VALUES (?, ?)",
+                    rows,
+                )
+            for parent_id, metadata in parents.items():
+                self._cache_put(parent_id, dict(metadata))
+
+    def put(self, parent_id, metadata):
+        self.put_many({parent_id: metadata})
+
+    def get_many(self, parent_ids):
+        """
+        Returns {parent_id: metadata} for the IDs that are stored. The returned dicts are
+        shared with the cache and must not be modified.
+        """
+        found = {}
+        with self._lock:
+            missing = []
+            for parent_id in dict.fromkeys(parent_ids):
+                if parent_id in self._cache:
+                    self._cache.move_to_end(parent_id)
+                    found[parent_id] = self._cache[parent_id]
+                else:
+                    missing.append(parent_id)
+            n_hits = len(found)
+            self.hits += n_hits
+            self.misses += len(missing)
+            for i in range(0, len(missing), _MAX_PARAMS):
+                batch = missing[i : i + _MAX_PARAMS]
+                placeholders = ", ".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT parent_id, metadata FROM parents WHERE parent_id IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for parent_id, metadata in rows:
+                    found[parent_id] = json.loads(metadata)
+                    self._cache_put(parent_id, found[parent_id])
+        if n_hits:
+            record_cache("parent", "hit", n_hits)
+        if missing:
+            record_cache("parent", "miss", len(missing))
+        return found
+
+    def get(self, parent_id):
+        return self.get_many([parent_id]).get(parent_id)
+
+    def delete(self, parent_ids):
+        """
+        Deletes the records of the given parent IDs.
+        """
+        parent_ids = list(parent_ids)
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "DELETE FROM parents WHERE parent_id = ?",
+                    [(parent_id,) for parent_id in parent_ids],
+                )
+            for parent_id in parent_ids:
+                self._cache.pop(parent_id, None)
+
+    def resolve_many(self, document_lists):
+        """
+        Input: Lists of retrieved chunks.
+        Output: The same lists with every chunk's parent metadata merged into copies of the
+        chunks (chunk fields take precedence). All parents are looked up in one get_many.
+        """
+        parent_ids = {
+            doc.metadata[PARENT_ID_FIELD]
+            for documents in document_lists
+            for doc in documents
+            if doc.metadata.get(PARENT_ID_FIELD) is not None
+        }
+        if not parent_ids:
+            return [list(documents) for documents in document_lists]
+        parents = self.get_many(list(parent_ids))
+        return [
+            [
+                Document(
+                    page_content=doc.page_content,
+                    metadata={
+                        **parents.get(doc.metadata.get(PARENT_ID_FIELD), {}),
+                        **doc.metadata,
+                    },
+                )
+                for doc in documents
+            ]
+            for documents in document_lists
+        ]
+
+    def resolve(self, documents):
+        """
+        Same as resolve_many for a single list of chunks.
+        """
+        return self.resolve_many([documents])[0]
+
+    def iter_metadata(self, fields, batch_size=1000, limit=-1):
+        """
+        Yields the requested fields of every parent record as dicts, like
+        VectorDBManager.iter_metadata does for chunks.
+        """
+        last, remaining = "", limit
+        while remaining != 0:
+            size = batch_size if remaining < 0 else min(batch_size, remaining)
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT parent_id, metadata FROM parents WHERE parent_id > ? "
+                    "ORDER BY parent_id LIMIT ?",
+                    (last, size),
+                ).fetchall()
+            if not rows:
+                return
+            for last, metadata in rows:
+                metadata = json.loads(metadata)
+                yield {field: metadata.get(field) for field in fields}
+            if remaining > 0:
+                remaining -= len(rows)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM parents").fetchone()[0]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "parents": len(self),
+            "cached": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,312 @@
+"""
+Pre-Router Module
+This module provides a cheap local classifier that answers most routing decisions before
+falling back to the LLM query router.
+"""
+
+import random
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+from loguru import logger
+
+from src.query_router import RouteQuery
+
+# Example questions describing what the web_search route covers. They seed the
+# web_search centroids, since the collection itself only describes vector_retriever.
+DEFAULT_WEB_SEED_QUERIES = [
+    "What is the weather forecast for tomorrow?",
+    "Who won the football match last night?",
+    "What are today's top news headlines?",
+    "Who is the current president of France?",
+    "How do I bake sourdough bread?",
+    "What time does the museum open on Sunday?",
+    "What is the capital of Australia?",
+    "Which movies are showing in cinemas this week?",
+    "How tall is Mount Everest?",
+    "What is the latest smartphone release?",
+]
+
+DEFAULT_WEB_KEYWORDS = [
+    "weather",
+    "forecast",
+    "recipe",
+    "movie",
+    "football",
+    "match",
+    "celebrity",
+    "tonight",
+    "yesterday",
+    "capital of",
+    "who won",
+    "how to",
+]
+
+DEFAULT_VECTOR_KEYWORDS = [
+    "investment",
+    "portfolio",
+    "market",
+    "equities",
+    "bond",
+    "stock",
+    "inflation",
+    "interest rate",
+    "economy",
+    "fund",
+    "sector",
+    "return",
+]
+
+_TOKEN_PATTERN = re.compile(r"[a-z][a-z0-9\-]+")
+
+
+def _keyword_pattern(keywords):
+    """
+    Matches any of the keywords as whole words, allowing a plural "s"; findall returns
+    the keyword itself, so each keyword counts once however it is inflected.
+    """
+    if not keywords:
+        return None
+    alternatives = "|".join(
+        re.escape(kw) for kw in sorted(keywords, key=len, reverse=True)
+    )
+    return re.compile(rf"\b({alternatives})s?\b")
+
+
+def _keyword_hits(pattern, text):
+    return set(pattern.findall(text)) if pattern is not None else set()
+
+
+def _normalize(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=-1, keepdims=True), 1e-12)
+
+
+def _kmeans(vectors, n_clusters, iterations=10, seed=0):
+    """
+    Spherical k-means on L2-normalised vectors; returns normalised centroids.
+    """
+    if len(vectors) <= n_clusters:
+        return vectors
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)]
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        for c in range(n_clusters):
+            members = vectors[assignment == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+        centroids = _normalize(centroids)
+    return centroids
+
+
+class PreRouter:
+    """
+    A two-tier query router. A local classifier runs first; only when it is not confident
+    is the LLM router chain called.
+
+    The classifier has two layers:
+        1. Keyword rules: terms taken from the indexed collection's `keywords` metadata plus
+           fixed vector/web keyword lists, matched as whole words. vector_retriever needs
+           two distinct matching terms and no web term.
+        2. Embedding centroids: clusters of the collection's `summary`/`keywords` metadata
+           for vector_retriever, and of seed questions for web_search. The route is taken
+           when the best vector and web similarities differ by at least `margin`.
+
+    Args:
+        embedder: Embeddings object used for the centroids and queries.
+        router_chain: The chain created by get_question_router_chain, used as fallback.
+            GraphBuilder fills in its own when this is None.
+        margin: Minimum similarity difference between the routes to decide locally.
+        n_centroids: Number of vector_retriever centroids built from the collection.
+        n_collection_terms: Number of the most frequent collection keywords used as rules.
+        audit_rate: Share of locally routed queries also sent to the LLM to measure agreement.
+        web_seed_queries: Example web_search questions.
+        web_keywords: Terms that route to web_search.
+        vector_keywords: Terms that route to vector_retriever.
+    """
+
+    def __init__(
+        self,
+        embedder,
+        router_chain=None,
+        margin=0.08,
+        n_centroids=16,
+        n_collection_terms=200,
+        audit_rate=0.05,
+        web_seed_queries=None,
+        web_keywords=None,
+        vector_keywords=None,
+    ):
+        self.embedder = embedder
+        self.router_chain = router_chain
+        self.margin = margin
+        self.n_centroids = n_centroids
+        self.n_collection_terms = n_collection_terms
+        self.audit_rate = audit_rate
+        self.web_seed_queries = web_seed_queries or DEFAULT_WEB_SEED_QUERIES
+        self.web_keywords = set(web_keywords or DEFAULT_WEB_KEYWORDS)
+        self.vector_keywords = set(vector_keywords or DEFAULT_VECTOR_KEYWORDS)
+        self._web_pattern = _keyword_pattern(self.web_keywords)
+        self._vector_pattern = _keyword_pattern(self.vector_keywords)
+        self.collection_terms = set()
+        self.vector_centroids = None
+        self.web_centroids = None
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    @property
+    def is_fitted(self):
+        return self.vector_centroids is not None
+
+    def fit(self, vector_db_manager, max_chunks=5000):
+        """
+        Builds the centroids and keyword rules from the collection's `summary` and `keywords`
+        metadata, read from the manager's parent store when it has one. Call again to refresh
+        after the collection changes.
+        """
+        texts, term_counts = set(), Counter()
+        metadata_source = getattr(vector_db_manager, "parent_store", None)
+        if metadata_source is None:
+            metadata_source = vector_db_manager
+        for row in metadata_source.iter_metadata(
+            ["summary", "keywords"], limit=max_chunks
+        ):
+            for field in ("summary", "keywords"):
+                if row.get(field):
+                    texts.add(row[field])
+            term_counts.update(
+                term.lower() for term in (row.get("keywords") or "").split()
+            )
+        if not texts:
+            raise ValueError(
+                "The collection has no summary/keywords metadata to build the pre-router from."
+            )
+        texts = sorted(texts)
+        vector_embeddings = _normalize(self.embedder.embed_documents(texts))
+        web_embeddings = _normalize(
+            self.embedder.embed_documents(self.web_seed_queries)
+        )
+        self.vector_centroids = _kmeans(vector_embeddings, self.n_centroids)
+        self.web_centroids = web_embeddings
+        self.collection_terms = {
+            term
+            for term, _ in term_counts.most_common(self.n_collection_terms)
+            if len(term) > 3 and term not in self.web_keywords
+        }
+        logger.info(
+            f"Pre-router fitted on {len(texts)} metadata texts: "
+            f"{len(self.vector_centroids)} vector centroids, {len(self.collection_terms)} collection terms."
+        )
+        return self
+
+    def _rule(self, query):
+        lowered = query.lower()
+        tokens = set(_TOKEN_PATTERN.findall(lowered))
+        web_hits = _keyword_hits(self._web_pattern, lowered)
+        vector_hits = _keyword_hits(self._vector_pattern, lowered) | (
+            tokens & self.collection_terms
+        )
+        if len(vector_hits) >= 2 and not web_hits:
+            return "vector_retriever"
+        if web_hits and not vector_hits:
+            return "web_search"
+        return None
+
+    def classify(self, query):
+        """
+        Returns (source, layer) where source is the locally decided route, or None when the
+        classifier is not confident, and layer is "rule", "embedding" or None.
+        """
+        source = self._rule(query)
+        if source is not None:
+            return source, "rule"
+        if not self.is_fitted:
+            return None, None
+        return self._nearest(self.embedder.embed_query(query))
+
+    async def aclassify(self, query):
+        """
+        Async version of classify; embeds the query without blocking the event loop.
+        """
+        source = self._rule(query)
+        if source is not None:
+            return source, "rule"
+        if not self.is_fitted:
+            return None, None
+        return self._nearest(await self.embedder.aembed_query(query))
+
+    def _nearest(self, embedding):
+        embedding = _normalize(embedding)
+        vector_score = float(np.max(self.vector_centroids @ embedding))
+        web_score = float(np.max(self.web_centroids @ embedding))
+        if vector_score - web_score >= self.margin:
+            return "vector_retriever", "embedding"
+        if web_score - vector_score >= self.margin:
+            return "web_search", "embedding"
+        return None, None
+
+    def _record(self, layer, local_source=None, llm_source=None):
+        with self._lock:
+            self._stats["queries"] += 1
+            if layer is None:
+                self._stats["llm_fallbacks"] += 1
+                return
+            self._stats["short_circuited"] += 1
+            self._stats[f"{layer}_hits"] += 1
+            if llm_source is not None:
+                self._stats["audited"] += 1
+                self._stats["agreements"] += int(llm_source == local_source)
+
+    def route(self, query, router_chain=None):
+        """
+        Returns a RouteQuery, from the local classifier when it is confident and from the
+        LLM router chain otherwise. `router_chain` replaces self.router_chain for this call,
+        e.g. with a rate-limited wrapper of it.
+        """
+        router_chain = router_chain or self.router_chain
+        source, layer = self.classify(query)
+        if source is None:
+            result = router_chain.invoke({"query": query})
+            self._record(None)
+            return result
+        llm_source = None
+        if random.random() < self.audit_rate:
+            llm_source = router_chain.invoke({"query": query}).source
+        self._record(layer, source, llm_source)
+        return RouteQuery(source=source)
+
+    async def aroute(self, query, router_chain=None):
+        """
+        Async version of route.
+        """
+        router_chain = router_chain or self.router_chain
+        source, layer = await self.aclassify(query)
+        if source is None:
+            result = await router_chain.ainvoke({"query": query})
+            self._record(None)
+            return result
+        llm_source = None
+        if random.random() < self.audit_rate:
+            llm_source = (await router_chain.ainvoke({"query": query})).source
+        self._record(layer, source, llm_source)
+        return RouteQuery(source=source)
+
+    def stats(self):
+        """
+        Returns counters plus the share of queries answered locally and the agreement
+        rate with the LLM router on audited queries.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        queries = stats.get("queries", 0)
+        audited = stats.get("audited", 0)
+        stats["short_circuit_rate"] = (
+            stats.get("short_circuited", 0) / queries if queries else 0.0
+        )
+        stats["agreement_rate"] = (
+            stats.get("agreements", 0) / audited if audited else None
+        )
+        return stats
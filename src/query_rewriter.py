@@ -57,3 +57,57 @@ def get_query_rewrite_chain(llm):
     """
     structured_query_rewriter = llm.with_structured_output(schema=RewriteQuery)
     return rewrite_prompt_template | structured_query_rewriter
+
+
+class MultiRewriteQuery(BaseModel):
+    """
+    A class to represent several rewritings of a query, each approaching the original
+    question from a different angle, generated in one call for multi-query retrieval.
+    """
+
+    queries: list[str] = Field(
+        ...,
+        description="Distinct rewritten queries, each preserving the intent of the original question.",
+    )
+
+
+system_prompt_multi_rewriter = """
+Task:
+Write {n_queries} different search queries for the user's original question, so that together they retrieve every document relevant to it.
+
+Instructions:
+1. Carefully read the original question and the provided document keywords or context.
+2. Make each query approach the question from a different angle: use synonyms and the terms of the documents, name the specific entities, periods or metrics involved, or split a compound question into its parts.
+3. Do not add unrelated information or change the intent of the original question.
+4. Return only the list of queries.
+"""
+
+multi_rewrite_prompt_template = ChatPromptTemplate(
+    messages=[
+        {
+            "role": "user",
+            "content": system_prompt_multi_rewriter,
+        },
+        {
+            "role": "human",
+            "content": """Given the following original question {question} and document keyword {context}, write {n_queries} search queries that together cover the question.""",
+        },
+    ],
+    input_variables=["context", "question"],
+    partial_variables={"n_queries": "3"},
+)
+
+
+def get_multi_query_rewrite_chain(llm, n_queries=3):
+    """
+    Create a chain rewriting a question into several search queries in one call.
+    Args:
+        llm: The language model to be used for rewriting queries.
+        n_queries: Number of query variants requested.
+    Returns:
+        A structured query rewriting chain that takes the original question and context as input
+        and outputs a MultiRewriteQuery.
+    """
+    structured_query_rewriter = llm.with_structured_output(schema=MultiRewriteQuery)
+    prompt = multi_rewrite_prompt_template.partial(n_queries=str(n_queries))
+    return prompt | structured_query_rewriter
@@ -0,0 +1,218 @@
+"""
+Rate Limiter Module
+This module provides an asyncio rate limiter for LLM calls with a concurrency cap,
+requests/tokens-per-minute budgets and adaptive backoff on rate-limit errors.
+"""
+
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+
+from loguru import logger
+
+try:
+    from openai import APIConnectionError, APITimeoutError, InternalServerError
+
+    TRANSIENT_ERRORS = (
+        asyncio.TimeoutError,
+        ConnectionError,
+        APITimeoutError,
+        APIConnectionError,
+        InternalServerError,
+    )
+except ImportError:
+    TRANSIENT_ERRORS = (asyncio.TimeoutError, ConnectionError)
+
+
+def is_rate_limit_error(exc):
+    """
+    Returns True for an HTTP 429 / rate-limit error: an exception carrying status code 429
+    (itself or on its response), or a RateLimitError as raised by the OpenAI and Azure clients.
+    """
+    for obj in (exc, getattr(exc, "response", None)):
+        if 429 in (getattr(obj, "status_code", None), getattr(obj, "status", None)):
+            return True
+    return any(cls.__name__ == "RateLimitError" for cls in type(exc).__mro__)
+
+
+def is_transient_error(exc):
+    """
+    Returns True for an error worth retrying after a backoff: a timeout or connection
+    error (including the OpenAI client's APITimeoutError/APIConnectionError) or an HTTP
+    5xx server error.
+    """
+    if isinstance(exc, TRANSIENT_ERRORS):
+        return True
+    for obj in (exc, getattr(exc, "response", None)):
+        for status in (getattr(obj, "status_code", None), getattr(obj, "status", None)):
+            if isinstance(status, int) and 500 <= status < 600:
+                return True
+    return False
+
+
+def get_retry_after(exc):
+    """
+    Extracts the server suggested wait (in seconds) from a rate-limit error, if any.
+    """
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for key in ("retry-after-ms", "retry-after"):
+        value = headers.get(key)
+        if value is None:
+            continue
+        try:
+            seconds = float(value)
+        except (TypeError, ValueError):
+            continue
+        return seconds / 1000 if key == "retry-after-ms" else seconds
+    return None
+
+
+class TokenBucket:
+    """
+    A token bucket refilled continuously at `per_minute / 60` units per second.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.available = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(
+            self.capacity, self.available + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+    def wait_time(self, amount):
+        """
+        Returns the seconds to wait before `amount` units are available.
+        """
+        amount = min(float(amount), self.capacity)
+        self._refill()
+        return max(0.0, (amount - self.available) / self.rate)
+
+    def consume(self, amount):
+        self.available -= min(float(amount), self.capacity)
+
+
+class AsyncRateLimiter:
+    """
+    Limits concurrent LLM calls and keeps them within requests/tokens-per-minute budgets.
+    When a call is rejected with a rate-limit error, every caller pauses for a shared,
+    exponentially growing cooldown that shrinks again as calls succeed.
+
+    Args:
+        max_concurrency: Maximum number of calls in flight.
+        requests_per_minute: Optional requests-per-minute budget.
+        tokens_per_minute: Optional tokens-per-minute budget.
+        initial_backoff: Cooldown in seconds after the first rate-limit error.
+        max_backoff: Upper bound for the cooldown in seconds.
+    """
+
+    def __init__(
+        self,
+        max_concurrency=8,
+        requests_per_minute=None,
+        tokens_per_minute=None,
+        initial_backoff=1.0,
+        max_backoff=60.0,
+    ):
+        self.max_concurrency = max_concurrency
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.backoff = 0.0
+        self.cooldown_until = 0.0
+        self.rate_limit_errors = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._lock = asyncio.Lock()
+        self._requests = (
+            TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    async def _wait_for_budget(self, tokens):
+        while True:
+            async with self._lock:
+                delay = max(
+                    self.cooldown_until - time.monotonic(),
+                    self._requests.wait_time(1) if self._requests else 0.0,
+                    self._tokens.wait_time(tokens) if self._tokens else 0.0,
+                )
+                if delay <= 0:
+                    if self._requests:
+                        self._requests.consume(1)
+                    if self._tokens:
+                        self._tokens.consume(tokens)
+                    return
+            await asyncio.sleep(delay)
+
+    @asynccontextmanager
+    async def limit(self, tokens=0):
+        """
+        Async context manager that holds a concurrency slot and waits until `tokens`
+        fit in the per-minute budgets before entering.
+        """
+        async with self._semaphore:
+            await self._wait_for_budget(tokens)
+            yield
+
+    def report_rate_limit(self, retry_after=None):
+        """
+        Registers a rate-limit error and pushes back the shared cooldown.
+        """
+        self.rate_limit_errors += 1
+        self.backoff = min(
+            self.max_backoff, max(self.initial_backoff, self.backoff * 2)
+        )
+        wait = max(self.backoff, retry_after or 0.0) * (1 + random.random() * 0.25)
+        self.cooldown_until = max(self.cooldown_until, time.monotonic() + wait)
+        logger.warning(f"Rate limited, backing off for {wait:.1f}s.")
+
+    def retry_delay(self, attempt):
+        """
+        Returns the jittered wait before retrying a call that failed with a transient
+        (timeout or connection) error for the attempt-th time: exponential in the attempt,
+        between half and all of min(max_backoff, initial_backoff * 2 ** (attempt - 1)).
+        """
+        delay = min(self.max_backoff, self.initial_backoff * 2 ** (attempt - 1))
+        return delay * (0.5 + random.random() * 0.5)
+
+    def report_success(self):
+        """
+        Registers a successful call and decays the backoff.
+        """
+        self.backoff = self.backoff / 2 if self.backoff > self.initial_backoff else 0.0
+
+
+async def ainvoke_with_limiter(limiter, chain, inputs, tokens=0, max_retries=5):
+    """
+    Invokes the chain under the rate limiter, retrying rate-limit and transient errors.
+    Rate-limit errors push back the limiter's shared cooldown; transient errors (timeouts,
+    connection and 5xx server errors, see is_transient_error) are retried after the call's own jittered backoff (see retry_delay), waited out
+    without holding a concurrency slot. Any other error (e.g. an output parsing failure)
+    is raised immediately.
+    """
+    for attempt in range(1, max_retries + 1):
+        delay = 0.0
+        async with limiter.limit(tokens):
+            try:
+                result = await chain.ainvoke(inputs)
+            except Exception as e:
+                if is_rate_limit_error(e):
+                    limiter.report_rate_limit(get_retry_after(e))
+                elif is_transient_error(e):
+                    delay = limiter.retry_delay(attempt)
+                else:
+                    raise
+                if attempt == max_retries:
+                    raise
+            else:
+                limiter.report_success()
+                return result
+        if delay:
+            logger.warning(f"Transient error, retrying in {delay:.1f}s.")
+            await asyncio.sleep(delay)
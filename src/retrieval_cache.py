@@ -0,0 +1,161 @@
+"""
+Retrieval Cache Module
+This module provides an in-process LRU + TTL cache for vector store retrieval results,
+with an optional semantic mode that reuses results for near-identical queries.
+"""
+
+import copy
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from src.instrumentation import record_cache
+
+
+def normalize_query(query):
+    return " ".join(query.lower().split())
+
+
+class RetrievalCache:
+    """
+    Caches retrieval results keyed on the normalized query text, k, method, ranker params and
+    scope (the filters, partitions and search params of a scoped search).
+
+    Args:
+        max_size: Maximum number of cached queries; the least recently used are evicted first.
+        ttl: Seconds a cached result stays valid.
+        semantic_threshold: If set together with an embedder, a query whose embedding has a
+            cosine similarity of at least this value with a cached query (same k, method and
+            ranker params and scope) reuses that query's results.
+        embedder: Embeddings object used for semantic hits.
+    """
+
+    def __init__(self, max_size=1024, ttl=300, semantic_threshold=None, embedder=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.semantic_threshold = semantic_threshold
+        self.embedder = embedder
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._recent_embeddings = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def semantic(self):
+        return self.semantic_threshold is not None and self.embedder is not None
+
+    @staticmethod
+    def _key(query, k, method, ranker_params, scope=None):
+        params = json.dumps(ranker_params, sort_keys=True, default=str)
+        scope = json.dumps(scope, sort_keys=True, default=str) if scope else None
+        return (normalize_query(query), k, method, params, scope)
+
+    def _embed(self, query):
+        vector = np.asarray(self.embedder.embed_query(query), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _query_embedding(self, normalized_query):
+        with self._lock:
+            embedding = self._recent_embeddings.get(normalized_query)
+        if embedding is None:
+            embedding = self._embed(normalized_query)
+            with self._lock:
+                self._recent_embeddings[normalized_query] = embedding
+                while len(self._recent_embeddings) > 64:
+                    self._recent_embeddings.popitem(last=False)
+        return embedding
+
+    def _semantic_match(self, key, embedding):
+        candidates = [
+            entry_key
+            for entry_key, entry in self._entries.items()
+            if entry_key[1:] == key[1:] and entry["embedding"] is not None
+        ]
+        if not candidates:
+            return None
+        matrix = np.stack([self._entries[c]["embedding"] for c in candidates])
+        scores = matrix @ embedding
+        best = int(np.argmax(scores))
+        return candidates[best] if scores[best] >= self.semantic_threshold else None
+
+    def get(self, query, k, method, ranker_params, scope=None):
+        """
+        Returns a copy of the cached documents, or None on a miss.
+        """
+        key = self._key(query, k, method, ranker_params, scope)
+        with self._lock:
+            self._expire()
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                record_cache("retrieval", "hit")
+                return copy.deepcopy(self._entries[key]["documents"])
+        if self.semantic:
+            embedding = self._query_embedding(key[0])
+            with self._lock:
+                match = self._semantic_match(key, embedding)
+                if match is not None:
+                    self._entries.move_to_end(match)
+                    self.semantic_hits += 1
+                    record_cache("retrieval", "semantic_hit")
+                    return copy.deepcopy(self._entries[match]["documents"])
+        with self._lock:
+            self.misses += 1
+        record_cache("retrieval", "miss")
+        return None
+
+    def put(
+        self, query, k, method, ranker_params, documents, generation=None, scope=None
+    ):
+        """
+        Stores the documents. If `generation` is given and the cache was invalidated since it
+        was read, the result may predate a collection change and is not stored.
+        """
+        key = self._key(query, k, method, ranker_params, scope)
+        embedding = self._query_embedding(key[0]) if self.semantic else None
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = {
+                "documents": copy.deepcopy(documents),
+                "embedding": embedding,
+                "expires_at": time.monotonic() + self.ttl,
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _expire(self):
+        now = time.monotonic()
+        expired = [
+            key for key, entry in self._entries.items() if entry["expires_at"] <= now
+        ]
+        for key in expired:
+            del self._entries[key]
+
+    def invalidate(self):
+        """
+        Drops every cached result. Called whenever the underlying collection changes.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+            self.generation += 1
+
+    def stats(self):
+        total = self.hits + self.semantic_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": (self.hits + self.semantic_hits) / total if total else 0.0,
+        }
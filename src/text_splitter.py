@@ -0,0 +1,269 @@
+"""
+Text Splitter Module
+This module provides a token-based splitter producing the same chunks as
+RecursiveCharacterTextSplitter.from_tiktoken_encoder, with the documents spread across a
+process pool and, optionally, the character/token span of every chunk in its metadata.
+"""
+
+import asyncio
+import copy
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+
+from langchain_core.documents import Document
+from loguru import logger
+
+from src.utils import get_encoding
+
+OFFSET_FIELDS = ("start_index", "end_index", "start_token", "end_token")
+
+
+class TokenCounter:
+    """
+    Length function counting tiktoken tokens the way from_tiktoken_encoder does. The
+    recursive splitter measures the same pieces several times (once when splitting, again
+    when merging and when popping the overlap); counts are memoized per document so each
+    distinct piece is encoded once.
+    """
+
+    def __init__(self, encoding_name="gpt2"):
+        self.encoding = get_encoding(encoding_name)
+        self._encode = self._encode_checked
+        self._counts = {}
+
+    def _encode_checked(self, text):
+        return self.encoding.encode(
+            text, allowed_special=set(), disallowed_special="all"
+        )
+
+    def start_document(self, text):
+        """
+        Clears the memo for a new document. A document without special token strings is
+        encoded with encode_ordinary, which gives the same tokens without tiktoken's
+        per-call special token scan; otherwise the checked encode raises on them exactly as
+        the original splitter does.
+        """
+        self._counts = {}
+        if any(token in text for token in self.encoding.special_tokens_set):
+            self._encode = self._encode_checked
+        else:
+            self._encode = self.encoding.encode_ordinary
+
+    def __call__(self, text):
+        count = self._counts.get(text)
+        if count is None:
+            count = self._counts[text] = len(self._encode(text))
+        return count
+
+
+class _DocumentSplitter:
+    """
+    Splits documents within one process (or thread); holds the encoding and memo.
+    """
+
+    def __init__(self, chunk_size, chunk_overlap, encoding_name, add_offsets):
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+        self.counter = TokenCounter(encoding_name)
+        self.splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=self.counter,
+        )
+        self.add_offsets = add_offsets
+
+    def _offsets(self, text, chunks):
+        # Chunks come in document order and each starts after the previous one, so every
+        # chunk is searched for from just past the previous start (TextSplitter's
+        # add_start_index subtracts the overlap as if it were in characters, which misses
+        # overlapping chunks). Token offsets come from one encoding of the whole document.
+        # A chunk that cannot be located gets None offsets rather than a wrong span.
+        _, token_starts = self.counter.encoding.decode_with_offsets(
+            self.counter._encode(text)
+        )
+        offsets, previous = [], -1
+        for chunk in chunks:
+            index = text.find(chunk, previous + 1)
+            if index == -1:
+                index = text.find(chunk)
+            if index == -1:
+                logger.warning(
+                    f"Chunk not found in its document, no offsets: {chunk[:50]!r}"
+                )
+                offsets.append(dict.fromkeys(OFFSET_FIELDS))
+                continue
+            previous = index
+            end = index + len(chunk)
+            # The token containing the chunk's first character; the bytes of one character
+            # can span several tokens that share its offset, so take the first of them.
+            token = max(bisect_right(token_starts, index) - 1, 0)
+            start_token = (
+                bisect_left(token_starts, token_starts[token]) if token_starts else 0
+            )
+            offsets.append(
+                {
+                    "start_index": index,
+                    "end_index": end,
+                    "start_token": start_token,
+                    "end_token": bisect_left(token_starts, end),
+                }
+            )
+        return offsets
+
+    def split(self, docs):
+        chunks = []
+        for doc in docs:
+            text = doc.page_content
+            self.counter.start_document(text)
+            pieces = self.splitter.split_text(text)
+            offsets = self._offsets(text, pieces) if self.add_offsets else None
+            for i, piece in enumerate(pieces):
+                metadata = copy.deepcopy(doc.metadata)
+                if offsets is not None:
+                    metadata.update(offsets[i])
+                chunks.append(Document(page_content=piece, metadata=metadata))
+        self.counter.start_document("")
+        return chunks
+
+
+_worker_splitter = None
+
+
+def _init_worker(*args):
+    global _worker_splitter
+    _worker_splitter = _DocumentSplitter(*args)
+
+
+def _split_in_worker(docs):
+    return _worker_splitter.split(docs)
+
+
+class ParallelTextSplitter:
+    """
+    Splits documents into token-sized chunks identical to those of
+    RecursiveCharacterTextSplitter.from_tiktoken_encoder(chunk_size=..., chunk_overlap=...).
+    Every worker process loads the encoding once; inputs smaller than min_parallel_chars are
+    split in the calling process, where pickling to the pool would cost more than it saves.
+
+    Args:
+        chunk_size: Maximum chunk size in tokens.
+        chunk_overlap: Token overlap between consecutive chunks.
+        encoding_name: tiktoken encoding ("gpt2" is from_tiktoken_encoder's default).
+        max_workers: Worker processes (defaults to the number of CPUs); 1 disables the pool.
+        min_parallel_chars: Inputs with fewer characters in total are split in-process.
+        add_offsets: Adds start_index/end_index (characters) and start_token/end_token
+            (tokens, end exclusive) of each chunk within its source document to the metadata.
+    """
+
+    def __init__(
+        self,
+        chunk_size=1000,
+        chunk_overlap=0,
+        encoding_name="gpt2",
+        max_workers=None,
+        min_parallel_chars=20_000,
+        add_offsets=False,
+    ):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.encoding_name = encoding_name
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.min_parallel_chars = min_parallel_chars
+        self.add_offsets = add_offsets
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _splitter_args(self):
+        return (
+            self.chunk_size,
+            self.chunk_overlap,
+            self.encoding_name,
+            self.add_offsets,
+        )
+
+    def _local_splitter(self):
+        splitter = getattr(self._local, "splitter", None)
+        if splitter is None:
+            splitter = self._local.splitter = _DocumentSplitter(*self._splitter_args())
+        return splitter
+
+    def _split_local(self, docs):
+        return self._local_splitter().split(docs)
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    self.max_workers,
+                    initializer=_init_worker,
+                    initargs=self._splitter_args(),
+                )
+            return self._pool
+
+    def _use_pool(self, docs):
+        return (
+            self.max_workers > 1
+            and sum(len(doc.page_content) for doc in docs) >= self.min_parallel_chars
+        )
+
+    def _batches(self, docs):
+        """
+        Cuts the documents, in order, into about four batches per worker of similar size
+        in characters.
+        """
+        target = sum(len(doc.page_content) for doc in docs) / (self.max_workers * 4)
+        batches, batch, size = [], [], 0
+        for doc in docs:
+            batch.append(doc)
+            size += len(doc.page_content)
+            if size >= target:
+                batches.append(batch)
+                batch, size = [], 0
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def split_documents(self, documents):
+        """
+        Input: Iterable of documents
+        Output: List of chunks, in document order, with each document's metadata copied.
+        """
+        docs = list(documents)
+        if not self._use_pool(docs):
+            return self._split_local(docs)
+        results = self._get_pool().map(_split_in_worker, self._batches(docs))
+        return [chunk for batch in results for chunk in batch]
+
+    async def asplit_documents(self, documents):
+        """
+        Async version of split_documents; the event loop is not blocked while splitting.
+        """
+        docs = list(documents)
+        if not self._use_pool(docs):
+            return await asyncio.to_thread(self._split_local, docs)
+        pool = self._get_pool()
+        results = await asyncio.gather(
+            *(
+                asyncio.wrap_future(pool.submit(_split_in_worker, batch))
+                for batch in self._batches(docs)
+            )
+        )
+        return [chunk for batch in results for chunk in batch]
+
+    def close(self):
+        """
+        Shuts the worker processes down; the pool is started again on the next large input.
+        """
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
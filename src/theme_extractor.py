@@ -0,0 +1,163 @@
+"""
+Theme Extractor Module
+This module provides a rate-limited, batched engine that runs the theme/keyword chains over many documents.
+"""
+
+import asyncio
+
+from loguru import logger
+
+from src.rate_limiter import AsyncRateLimiter, ainvoke_with_limiter
+from src.theme_generation import (
+    ThemeKeywords,
+    get_theme_keywords_batch_chain,
+    get_theme_keywords_chain,
+)
+from src.utils import count_tokens
+
+# Tokens used by the prompt template and format instructions around the page content.
+PROMPT_OVERHEAD_TOKENS = 400
+
+
+class ThemeKeywordsExtractor:
+    """
+    Extracts a ThemeKeywords result for every document while staying under the
+    deployment's rate limits.
+
+    Args:
+        llm: The language model used by the theme/keyword chains.
+        max_concurrency: Maximum number of LLM calls in flight.
+        tokens_per_minute: Optional tokens-per-minute budget shared by all calls.
+        requests_per_minute: Optional requests-per-minute budget shared by all calls.
+        max_retries: Attempts per call on rate-limit or transient errors.
+        pack_size: Maximum number of short documents packed into one prompt (1 disables packing).
+        pack_max_tokens: Maximum page content tokens in a packed prompt. Documents longer than
+            this are always sent on their own.
+        output_tokens_per_document: Expected completion tokens per document, counted against the budget.
+    """
+
+    def __init__(
+        self,
+        llm,
+        max_concurrency=8,
+        tokens_per_minute=None,
+        requests_per_minute=None,
+        max_retries=5,
+        pack_size=1,
+        pack_max_tokens=2000,
+        output_tokens_per_document=150,
+    ):
+        self.chain = get_theme_keywords_chain(llm)
+        self.batch_chain = (
+            get_theme_keywords_batch_chain(llm) if pack_size > 1 else None
+        )
+        self.limiter = AsyncRateLimiter(
+            max_concurrency=max_concurrency,
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+        )
+        self.max_retries = max_retries
+        self.pack_size = pack_size
+        self.pack_max_tokens = pack_max_tokens
+        self.output_tokens_per_document = output_tokens_per_document
+        self.errors = {}
+
+    async def _call(self, chain, inputs, tokens):
+        return await ainvoke_with_limiter(
+            self.limiter, chain, inputs, tokens=tokens, max_retries=self.max_retries
+        )
+
+    async def _extract_one(self, index, doc, n_tokens, errors):
+        tokens = n_tokens + PROMPT_OVERHEAD_TOKENS + self.output_tokens_per_document
+        try:
+            return await self._call(
+                self.chain, {"page_content": doc.page_content}, tokens
+            )
+        except Exception as e:
+            errors[index] = f"{type(e).__name__}: {e}"
+            logger.error(f"Theme/keyword extraction failed for document {index}: {e}")
+            return None
+
+    async def _extract_packed(self, indexed_docs, n_tokens, errors):
+        """
+        Extracts results for several documents in one prompt. Documents missing from
+        the response, or the whole pack if it fails, are retried one at a time.
+        """
+        rendered = "\n\n".join(
+            f"Document idx: {i}\n{doc.page_content}" for i, doc in indexed_docs
+        )
+        tokens = (
+            sum(n_tokens[i] for i, _ in indexed_docs)
+            + PROMPT_OVERHEAD_TOKENS
+            + self.output_tokens_per_document * len(indexed_docs)
+        )
+        results = {}
+        try:
+            batch = await self._call(self.batch_chain, {"documents": rendered}, tokens)
+            results = {
+                r.document_index: ThemeKeywords(summary=r.summary, keywords=r.keywords)
+                for r in batch.results
+            }
+        except Exception as e:
+            logger.warning(
+                f"Packed extraction of {len(indexed_docs)} documents failed, retrying individually: {e}"
+            )
+        missing = [(i, doc) for i, doc in indexed_docs if i not in results]
+        retried = await asyncio.gather(
+            *(self._extract_one(i, doc, n_tokens[i], errors) for i, doc in missing)
+        )
+        results.update({i: r for (i, _), r in zip(missing, retried)})
+        return [results[i] for i, _ in indexed_docs]
+
+    def _make_groups(self, docs, n_tokens):
+        """
+        Groups consecutive short documents into packs of up to pack_size documents and
+        pack_max_tokens tokens. Long documents form a group of their own.
+        """
+        groups, current, current_tokens = [], [], 0
+        for i, doc in enumerate(docs):
+            if self.pack_size <= 1 or n_tokens[i] > self.pack_max_tokens:
+                groups.append([(i, doc)])
+                continue
+            if current and (
+                len(current) >= self.pack_size
+                or current_tokens + n_tokens[i] > self.pack_max_tokens
+            ):
+                groups.append(current)
+                current, current_tokens = [], 0
+            current.append((i, doc))
+            current_tokens += n_tokens[i]
+        if current:
+            groups.append(current)
+        return groups
+
+    async def aextract(self, docs, errors=None):
+        """
+        Input: List of documents and an optional dict collecting the errors of this call.
+        Output: List of ThemeKeywords aligned with the input documents. Documents whose
+        extraction failed get None and their error is recorded by document index in `errors`,
+        or in self.errors (reset on every call) when no dict is given. Concurrent callers
+        should pass their own dict.
+        """
+        if errors is None:
+            errors = self.errors = {}
+        n_tokens = [count_tokens(doc.page_content) for doc in docs]
+
+        results = [None] * len(docs)
+
+        async def run(group):
+            if len(group) == 1:
+                i, doc = group[0]
+                group_results = [await self._extract_one(i, doc, n_tokens[i], errors)]
+            else:
+                group_results = await self._extract_packed(group, n_tokens, errors)
+            for (i, _), result in zip(group, group_results):
+                results[i] = result
+
+        groups = self._make_groups(docs, n_tokens)
+        await asyncio.gather(*(run(group) for group in groups))
+        logger.info(
+            f"Extracted themes/keywords for {len(docs) - len(errors)}/{len(docs)} documents "
+            f"in {len(groups)} prompts ({self.limiter.rate_limit_errors} rate-limit errors)."
+        )
+        return results
@@ -14,9 +14,23 @@ class ThemeKeywords(BaseModel):
     )
 
 
+class IndexedThemeKeywords(ThemeKeywords):
+    document_index: int = Field(
+        ..., description="The index of the document these results belong to."
+    )
+
+
+class ThemeKeywordsBatch(BaseModel):
+    results: list[IndexedThemeKeywords] = Field(
+        ...,
+        description="One summary and keyword list for every document in the input, identified by its document index.",
+    )
+
+
 # Patch for Pydantic v1 compatibility
-if not hasattr(ThemeKeywords, "model_json_schema"):
-    ThemeKeywords.model_json_schema = ThemeKeywords.schema
+for _model in (ThemeKeywords, IndexedThemeKeywords, ThemeKeywordsBatch):
+    if not hasattr(_model, "model_json_schema"):
+        _model.model_json_schema = _model.schema
 
 
 def get_theme_keywords_chain(llm):
@@ -48,3 +62,37 @@ Return your answer  in the given format:
     )
 
     return theme_keywords_prompt | llm | parser
+
+
+def get_theme_keywords_batch_chain(llm):
+    """
+    Returns a chain that extracts a summary and keywords for each of several documents packed
+    into a single prompt. The `documents` input is the documents rendered with their index, e.g.
+    "Document idx: 0\n<page content>". Results are matched back by `document_index`.
+    """
+    parser = PydanticOutputParser(pydantic_object=ThemeKeywordsBatch)
+    format_instructions = parser.get_format_instructions()
+
+    theme_keywords_batch_prompt = ChatPromptTemplate(
+        messages=[
+            {
+                "role": "user",
+                "content": """You are an expert in content analysis and keyword extraction. Your task is to analyze each of the provided documents independently and extract its main theme and important keywords.
+For every document below, extract:
+1. A summary of the document content in 1-2 sentences which covers the most important aspects described in the document and is easy to understand.
+2. A list of the most important keywords from the document.
+Return exactly one result per document and set document_index to the index shown for that document.
+
+Documents:
+{documents}
+
+Return your answer  in the given format:
+{format_instructions}
+""",
+            }
+        ],
+        input_variables=["documents"],
+        partial_variables={"format_instructions": format_instructions},
+    )
+
+    return theme_keywords_batch_prompt | llm | parser
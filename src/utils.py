@@ -1,11 +1,21 @@
+import inspect
 from typing import List
-
-from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
-from dotenv import load_dotenv
+from functools import lru_cache, wraps
 from pprint import pprint
 from time import time
 
-load_dotenv()
+# langchain_openai, tiktoken and dotenv are imported on first use, so modules that only
+# need the helpers below do not pay for them at import time.
+
+
+@lru_cache(maxsize=None)
+def load_env():
+    """
+    Loads the .env file into the environment, once per process.
+    """
+    from dotenv import load_dotenv
+
+    load_dotenv()
 
 
 def get_llm(
@@ -15,7 +25,18 @@ def get_llm(
     timeout=600,
     max_tokens=4096,
     max_retries=2,
+    cache=None,
+    callbacks=None,
 ):
+    """
+    Returns the Azure OpenAI chat model. If cache is given (e.g. a SQLiteLLMCache),
+    identical prompts with the same deployment, sampling params and output schema are
+    answered from it. callbacks are attached to every call, e.g.
+    [TokenUsageCallback()] to record token usage per chain.
+    """
+    from langchain_openai import AzureChatOpenAI
+
+    load_env()
     return AzureChatOpenAI(
         azure_deployment=azure_deployment,
         api_version=api_version,
@@ -23,29 +44,80 @@ def get_llm(
         timeout=timeout,
         max_tokens=max_tokens,
         max_retries=max_retries,
+        cache=cache,
+        callbacks=callbacks,
     )
 
 
 def get_embedder(
-    openai_api_version="2023-05-15", azure_deployment="text-embedding-3-small"
+    openai_api_version="2023-05-15",
+    azure_deployment="text-embedding-3-small",
+    cache_dir=None,
+    cache_max_entries=500_000,
 ):
+    """
+    Returns the Azure OpenAI embedder. If cache_dir is given, it is wrapped in a
+    persistent CachedEmbeddings store so identical texts are only embedded once.
+    """
+    from langchain_openai import AzureOpenAIEmbeddings
+
+    load_env()
     embeddings = AzureOpenAIEmbeddings(
         openai_api_version=openai_api_version, azure_deployment=azure_deployment
     )
+    if cache_dir is not None:
+        from src.embedding_cache import CachedEmbeddings
+
+        return CachedEmbeddings(
+            embeddings, cache_dir=cache_dir, max_entries=cache_max_entries
+        )
     return embeddings
 
 
+@lru_cache(maxsize=None)
+def get_encoding(encoding_name="o200k_base"):
+    """
+    Returns the tiktoken encoding, loading it only once per process.
+    """
+    import tiktoken
+
+    return tiktoken.get_encoding(encoding_name)
+
+
+def count_tokens(text, encoding_name="o200k_base"):
+    """
+    Counts the tokens in a text with the given tiktoken encoding.
+    """
+    return len(get_encoding(encoding_name).encode(text, disallowed_special=()))
+
+
 # create a time decorator
 
 
 def timeit(func):
     """
-    Decorator to measure the execution time of a function.
+    Decorator to measure the execution time of a function, sync or async. The time is
+    printed and, when src.instrumentation is enabled, recorded under the function's name.
     """
+    from src.instrumentation import timed
+
+    timed_func = timed(func.__qualname__)(func)
+
+    if inspect.iscoroutinefunction(func):
+
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            start_time = time()
+            result = await timed_func(*args, **kwargs)
+            print(f"Execution time: {time() - start_time:.2f} seconds")
+            return result
+
+        return async_wrapper
 
+    @wraps(func)
     def wrapper(*args, **kwargs):
         start_time = time()
-        result = func(*args, **kwargs)
+        result = timed_func(*args, **kwargs)
         end_time = time()
         print(f"Execution time: {end_time - start_time:.2f} seconds")
         return result
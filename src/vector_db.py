@@ -1,11 +1,117 @@
-from pymilvus import MilvusException, connections, db, utility, Collection
-from langchain_milvus import BM25BuiltInFunction, Milvus
 from loguru import logger
 from uuid import uuid4
+from dataclasses import dataclass
+import asyncio
+import hashlib
+import json
+import threading
+import time
 from langchain_core.documents import Document
 
+from src.filters import build_filter_expr, search_scope
+from src.instrumentation import record_retrieval, timed
+
+# Connections and Milvus stores shared by every VectorDBManager in the process.
+_shared_lock = threading.Lock()
+_shared_aliases = {}
+_shared_stores = {}
+
+
+def get_connection_alias(host, port, token, db_name=None):
+    """
+    Returns the alias of a pymilvus connection to the server (and database, if given),
+    opening it the first time it is requested and reusing it afterwards.
+    """
+    from pymilvus import connections
+
+    key = (host, port, token, db_name)
+    with _shared_lock:
+        if key not in _shared_aliases:
+            alias = f"vdb-{len(_shared_aliases)}"
+            kwargs = {"db_name": db_name} if db_name else {}
+            connections.connect(
+                alias=alias, host=host, port=port, token=token, **kwargs
+            )
+            _shared_aliases[key] = alias
+        return _shared_aliases[key]
+
+
+def make_chunk_id(source, position, text):
+    """
+    Builds a stable chunk ID from the source URL, the chunk position within the source
+    and the hash of the chunk text, so re-ingesting unchanged content yields the same IDs.
+    """
+    source_hash = hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+    return f"{source_hash}-{position}-{text_hash}"
+
+
+@dataclass
+class SyncSummary:
+    """
+    A class to represent the changes applied by VectorDBManager.sync_documents.
+    """
+
+    added: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+
+
+@dataclass
+class BulkInsertStats:
+    """
+    A class to represent the outcome of VectorDBManager.aadd_documents_streaming.
+    """
+
+    documents: int = 0
+    batches: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+    seconds: float = 0.0
+
+    @property
+    def docs_per_second(self):
+        return self.documents / self.seconds if self.seconds else 0.0
+
+
+async def _iter_batches(docs, batch_size):
+    """
+    Yields lists of up to batch_size documents from a sync or async iterable.
+    """
+    batch = []
+    if hasattr(docs, "__aiter__"):
+        async for doc in docs:
+            batch.append(doc)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    else:
+        for doc in docs:
+            batch.append(doc)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
 
 class VectorDBManager:
+    """
+    Manages one Milvus collection with hybrid (dense + BM25) search. Nothing is sent to the
+    server until the first operation that needs it; call warmup() to connect up front.
+
+    With partition_key_field set, the collection is created with that metadata field as its
+    partition key: chunks are hashed into num_partitions partitions by the field's (string)
+    value, and a search filtered on the field (filters={field: value}, or partitions=[...])
+    only touches the matching partitions. The partition key can only be chosen when the
+    collection is created, so it has no effect on an existing collection.
+
+    With a parent_store (see src.parent_store), chunks carry only a parent_id and the
+    fields in the store's chunk_fields (the partition key field is added to them), and the
+    document-level metadata is merged back in by searches called with resolve_parents=True.
+    """
+
     def __init__(
         self,
         embedder,
@@ -17,6 +123,10 @@ class VectorDBManager:
         drop_old=False,
         dense_index_param=None,
         sparse_index_param=None,
+        retrieval_cache=None,
+        partition_key_field=None,
+        num_partitions=None,
+        parent_store=None,
     ):
         self.db_name = db_name
         self.collection_name = collection_name
@@ -25,6 +135,13 @@ class VectorDBManager:
         self.port = port
         self.token = token
         self.drop_old = drop_old
+        self.retrieval_cache = retrieval_cache
+        self.partition_key_field = partition_key_field
+        self.num_partitions = num_partitions
+        self.parent_store = parent_store
+        if parent_store is not None:
+            # Chunks must keep the partition key, or they could not be partitioned or found.
+            parent_store.keep_on_chunks(partition_key_field)
 
         self.dense_index_param = dense_index_param or {
             "metric_type": "COSINE",
@@ -35,40 +152,123 @@ class VectorDBManager:
             "index_type": "AUTOINDEX",
         }
 
-        connections.connect(host=self.host, port=self.port)
-        try:
-            existing_databases = db.list_database()
-            if self.db_name not in existing_databases:
-                db.create_database(self.db_name)
-            db.using_database(self.db_name)
-        except MilvusException as e:
-            logger.error(f"Error creating or using database: {e}")
-            raise
+        self._alias = None
+        self._vector_db = None
+        self._connect_lock = threading.Lock()
+
+    def _connect(self):
+        """
+        Creates the database if needed and opens the Milvus store. Runs once, on the first
+        operation that needs the server.
+        """
+        from pymilvus import MilvusException, db, utility
 
-        # Warn if drop_old is True and collection exists
-        all_collections = utility.list_collections()
-        if self.drop_old and self.collection_name in all_collections:
-            logger.warning(
-                f"drop_old=True: Collection '{self.collection_name}' will be dropped and recreated. All previous data will be lost."
+        with self._connect_lock:
+            if self._vector_db is not None:
+                return
+            server_alias = get_connection_alias(self.host, self.port, self.token)
+            try:
+                existing_databases = db.list_database(using=server_alias)
+                if self.db_name not in existing_databases:
+                    db.create_database(self.db_name, using=server_alias)
+            except MilvusException as e:
+                logger.error(f"Error creating or using database: {e}")
+                raise
+            self._alias = get_connection_alias(
+                self.host, self.port, self.token, self.db_name
             )
 
+            # Warn if drop_old is True and collection exists
+            all_collections = utility.list_collections(using=self._alias)
+            if self.drop_old and self.collection_name in all_collections:
+                logger.warning(
+                    f"drop_old=True: Collection '{self.collection_name}' will be dropped and recreated. All previous data will be lost."
+                )
+                self._invalidate_cache()
+
+            self._vector_db = self._get_store()
+
+    async def _aconnect(self):
+        if self._vector_db is None:
+            await asyncio.to_thread(self._connect)
+
+    @property
+    def alias(self):
+        self._connect()
+        return self._alias
+
+    @property
+    def vector_db(self):
+        """
+        The Milvus store of the collection; the server is connected on first access.
+        """
+        if self._vector_db is None:
+            self._connect()
+        return self._vector_db
+
+    def warmup(self, embed=True):
+        """
+        Pays the startup cost up front: connects, creates the database if needed and loads
+        the collection. With embed=True, one query is also embedded so the embedder's
+        client and connection are ready. Returns the seconds spent.
+        """
+        start = time.perf_counter()
+        self._connect()
+        if embed:
+            self.embedder.embed_query("warmup")
+        seconds = time.perf_counter() - start
+        logger.info(f"Warmed up '{self.collection_name}' in {seconds:.2f}s.")
+        return seconds
+
+    def _get_store(self):
+        """
+        Returns the Milvus store for this collection. Managers pointing at the same server,
+        database, collection and embedder share one store and its client connection.
+        A store created with drop_old=True is never reused.
+        """
+        from langchain_milvus import BM25BuiltInFunction, Milvus
+        from pymilvus import DataType
+
         vectordb_config = {
             "uri": f"http://{self.host}:{self.port}",
             "token": self.token,
             "db_name": self.db_name,
         }
-
-        self.vector_db = Milvus(
-            embedding_function=self.embedder,
-            connection_args=vectordb_config,
-            consistency_level="Strong",
-            drop_old=self.drop_old,
-            builtin_function=BM25BuiltInFunction(),
-            vector_field=["dense", "sparse"],
-            index_params=[self.dense_index_param, self.sparse_index_param],
-            collection_name=self.collection_name,
+        key = (
+            vectordb_config["uri"],
+            self.token,
+            self.db_name,
+            self.collection_name,
+            id(self.embedder),
         )
+        partition_kwargs = {}
+        if self.partition_key_field:
+            partition_kwargs["metadata_schema"] = {
+                self.partition_key_field: {
+                    "dtype": DataType.VARCHAR,
+                    "kwargs": {"max_length": 65_535, "is_partition_key": True},
+                }
+            }
+            if self.num_partitions:
+                partition_kwargs["num_partitions"] = self.num_partitions
+        with _shared_lock:
+            if not self.drop_old and key in _shared_stores:
+                return _shared_stores[key]
+            store = Milvus(
+                embedding_function=self.embedder,
+                connection_args=vectordb_config,
+                consistency_level="Strong",
+                drop_old=self.drop_old,
+                builtin_function=BM25BuiltInFunction(),
+                vector_field=["dense", "sparse"],
+                index_params=[self.dense_index_param, self.sparse_index_param],
+                collection_name=self.collection_name,
+                **partition_kwargs,
+            )
+            _shared_stores[key] = store
+            return store
 
+    @timed("ingestion.insert", backend="milvus")
     def add_documents(self, docs: list[Document], uuids: list[str] = None):
         """
         Adds documents to the vector database.
@@ -80,43 +280,484 @@ class VectorDBManager:
             documents=docs,
             ids=uuids,
         )
+        self._invalidate_cache()
         logger.info(
             f"Added {len(docs)} documents to the collection '{self.collection_name}'."
         )
 
-    def retrieve_similar(self, query, k=2, method="weighted", ranker_params=None):
+    def _invalidate_cache(self):
+        if self.retrieval_cache is not None:
+            self.retrieval_cache.invalidate()
+
+    async def aadd_documents_streaming(
+        self,
+        docs,
+        batch_size=256,
+        max_pending_batches=2,
+        deterministic_ids=False,
+        timeout=None,
+    ):
+        """
+        Bulk-loads documents from an iterable or async iterator without holding the corpus in memory.
+        Documents are embedded in batches of batch_size while earlier batches are being inserted.
+        At most max_pending_batches embedded batches wait for insertion; when Milvus falls behind,
+        embedding pauses until it catches up. The collection is flushed once at the end.
+        With deterministic_ids=True, IDs are built with make_chunk_id instead of uuid4 and the
+        stream is synced like sync_documents: the stored IDs of every source are looked up
+        when the source first appears, chunks that are already stored are neither embedded
+        nor inserted, and once the stream is exhausted the stored chunks its sources no
+        longer produce are deleted. Sources that do not appear in the stream are untouched.
+        Returns a BulkInsertStats.
+        """
+        await self._aconnect()
+        queue = asyncio.Queue(maxsize=max_pending_batches)
+        stats = BulkInsertStats()
+        positions = {}
+        seen_sources = set()
+        stored_ids = set()
+        streamed_ids = set()
+        start = time.perf_counter()
+
+        def make_ids(batch):
+            if not deterministic_ids:
+                return [str(uuid4()) for _ in batch]
+            ids = []
+            for doc in batch:
+                source = doc.metadata["source"]
+                position = positions.get(source, 0)
+                positions[source] = position + 1
+                ids.append(make_chunk_id(source, position, doc.page_content))
+            return ids
+
+        async def new_documents(batch):
+            """
+            Returns the documents of the batch that are not stored yet, and their IDs.
+            """
+            ids = make_ids(batch)
+            if not deterministic_ids:
+                return batch, ids
+            sources = list(
+                dict.fromkeys(
+                    doc.metadata["source"]
+                    for doc in batch
+                    if doc.metadata["source"] not in seen_sources
+                )
+            )
+            if sources:
+                seen_sources.update(sources)
+                stored_ids.update(
+                    await asyncio.to_thread(self._get_existing_ids, sources)
+                )
+            streamed_ids.update(ids)
+            new = [(doc, id_) for doc, id_ in zip(batch, ids) if id_ not in stored_ids]
+            stats.unchanged += len(batch) - len(new)
+            return [doc for doc, _ in new], [id_ for _, id_ in new]
+
+        async def embed():
+            async for batch in _iter_batches(docs, batch_size):
+                batch, ids = await new_documents(batch)
+                if not batch:
+                    continue
+                texts = [doc.page_content for doc in batch]
+                async with timed("ingestion.embed", backend="milvus"):
+                    vectors = await asyncio.to_thread(
+                        self.embedder.embed_documents, texts
+                    )
+                await queue.put((batch, vectors, ids))
+            await queue.put(None)
+
+        async def insert():
+            while (item := await queue.get()) is not None:
+                batch, vectors, ids = item
+                async with timed("ingestion.insert", backend="milvus"):
+                    await asyncio.to_thread(
+                        self.vector_db.add_embeddings,
+                        texts=[doc.page_content for doc in batch],
+                        embeddings=vectors,
+                        metadatas=[doc.metadata for doc in batch],
+                        ids=ids,
+                        timeout=timeout,
+                        batch_size=len(batch),
+                    )
+                stats.documents += len(batch)
+                stats.batches += 1
+                self._invalidate_cache()
+
+        embed_task = asyncio.create_task(embed())
+        insert_task = asyncio.create_task(insert())
+        try:
+            await asyncio.gather(embed_task, insert_task)
+        except BaseException:
+            embed_task.cancel()
+            insert_task.cancel()
+            raise
+        stale_ids = list(stored_ids - streamed_ids)
+        if stale_ids:
+            await asyncio.to_thread(self.vector_db.delete, ids=stale_ids)
+            stats.deleted = len(stale_ids)
+            self._invalidate_cache()
+        if stats.documents or stats.deleted:
+            await asyncio.to_thread(self.vector_db.client.flush, self.collection_name)
+
+        stats.seconds = time.perf_counter() - start
+        logger.info(
+            f"Bulk-inserted {stats.documents} documents in {stats.batches} batches into "
+            f"'{self.collection_name}' ({stats.docs_per_second:.1f} docs/s, "
+            f"{stats.unchanged} unchanged, {stats.deleted} stale deleted)."
+        )
+        return stats
+
+    def _get_existing_ids(self, sources, batch_size=100):
+        """
+        Returns the IDs of all chunks stored for the given sources.
+        """
+        existing = set()
+        for i in range(0, len(sources), batch_size):
+            expr = f"source in {json.dumps(sources[i : i + batch_size])}"
+            existing.update(self.vector_db.get_pks(expr) or [])
+        return existing
+
+    def sync_documents(self, docs: list[Document]):
+        """
+        Incrementally syncs the chunks of one or more sources into the collection.
+        Chunk IDs are derived with make_chunk_id, so chunks that are already stored are skipped,
+        changed chunks replace the old chunk at the same position, and chunks that the sources no
+        longer produce are deleted. Sources not present in `docs` are left untouched.
+        Returns a SyncSummary.
+        """
+        positions = {}
+        ids = []
+        for doc in docs:
+            source = doc.metadata["source"]
+            position = positions.get(source, 0)
+            positions[source] = position + 1
+            ids.append(make_chunk_id(source, position, doc.page_content))
+
+        existing = self._get_existing_ids(list(positions))
+        new_ids = set(ids)
+        to_insert = [(doc, id_) for doc, id_ in zip(docs, ids) if id_ not in existing]
+        to_delete = [id_ for id_ in existing if id_ not in new_ids]
+
+        def slot(id_):
+            return id_.rsplit("-", 1)[0]
+
+        replaced_slots = {slot(id_) for id_ in to_delete}
+        summary = SyncSummary(
+            updated=sum(1 for _, id_ in to_insert if slot(id_) in replaced_slots),
+            unchanged=len(ids) - len(to_insert),
+        )
+        summary.added = len(to_insert) - summary.updated
+        summary.deleted = len(to_delete) - summary.updated
+
+        if to_insert:
+            self.add_documents(
+                [doc for doc, _ in to_insert], uuids=[id_ for _, id_ in to_insert]
+            )
+        if to_delete:
+            self.vector_db.delete(ids=to_delete)
+            self._invalidate_cache()
+        logger.info(
+            f"Synced {len(positions)} sources into '{self.collection_name}': "
+            f"{summary.added} added, {summary.updated} updated, "
+            f"{summary.unchanged} unchanged, {summary.deleted} deleted."
+        )
+        return summary
+
+    @timed("retrieval.similar", backend="milvus")
+    def retrieve_similar(
+        self,
+        query,
+        k=2,
+        method="weighted",
+        ranker_params=None,
+        expr=None,
+        filters=None,
+        partitions=None,
+        search_params=None,
+        fetch_k=None,
+        resolve_parents=False,
+    ):
         """
         Retrieves similar documents from the vector database using different methods.
         Supported methods:
             - "weighted": Uses a weighted ranker.
             - "rrf": Uses reciprocal rank fusion.
+        The search can be scoped with:
+            - expr: A raw Milvus boolean expression over the metadata fields.
+            - filters: Metadata filters (see src.filters), combined with expr by "and".
+            - partitions: Values of the partition key field to search; without a partition
+              key field, names of the collection's partitions.
+            - search_params: Dense index search params, e.g. {"ef": 64} for HNSW.
+            - fetch_k: Candidates taken from each of the dense and BM25 searches before
+              ranking.
+        With resolve_parents=True, the document-level metadata of every chunk is looked up
+        in the parent store (one batched, cached lookup) and merged into its metadata.
+        Results are served from the retrieval cache when one is configured.
         """
-        if method == "weighted":
-            params = ranker_params or {"weights": [0.5, 0.5]}
-            return self.vector_db.similarity_search(
-                query,
-                k=k,
-                ranker_type="weighted",
-                ranker_params=params,
+        scope = search_scope(expr, filters, partitions, search_params, fetch_k)
+        if self.retrieval_cache is None:
+            docs = self._search(query, k, method, ranker_params, scope)
+            return record_retrieval(
+                self._resolve_parents(docs, resolve_parents), backend="milvus"
             )
-        elif method == "rrf":
-            params = ranker_params or {"k": 100}
-            return self.vector_db.similarity_search(
-                query,
-                k=k,
-                ranker_type="rrf",
-                ranker_params=params,
+        cached = self.retrieval_cache.get(query, k, method, ranker_params, scope)
+        if cached is not None:
+            return record_retrieval(
+                self._resolve_parents(cached, resolve_parents), backend="milvus"
             )
+        generation = self.retrieval_cache.generation
+        docs = self._search(query, k, method, ranker_params, scope)
+        self.retrieval_cache.put(
+            query, k, method, ranker_params, docs, generation=generation, scope=scope
+        )
+        return record_retrieval(
+            self._resolve_parents(docs, resolve_parents), backend="milvus"
+        )
+
+    def _resolve_parents(self, documents, resolve_parents):
+        if not resolve_parents or self.parent_store is None:
+            return documents
+        return self.parent_store.resolve(documents)
+
+    def _search_kwargs(self, method, ranker_params):
+        if method == "weighted":
+            return {
+                "ranker_type": "weighted",
+                "ranker_params": ranker_params or {"weights": [0.5, 0.5]},
+            }
+        elif method == "rrf":
+            return {"ranker_type": "rrf", "ranker_params": ranker_params or {"k": 100}}
         else:
             raise ValueError(f"Unsupported retrieval method: {method}")
 
+    def _dense_search_param(self, fetch_k, search_params):
+        return {
+            "metric_type": self.dense_index_param["metric_type"],
+            "params": {"ef": max(10, fetch_k), **(search_params or {})},
+        }
+
+    def _filter_expr(self, scope):
+        expr = build_filter_expr(scope.get("filters"), scope.get("expr"))
+        if scope.get("partitions") and self.partition_key_field:
+            return build_filter_expr(
+                {self.partition_key_field: scope["partitions"]}, expr
+            )
+        return expr
+
+    def _scope_kwargs(self, scope):
+        """
+        Translates a search_scope() dict into similarity_search keyword arguments. Partition
+        hints become a condition on the partition key field, which Milvus uses to prune
+        partitions, or partition_names when the collection has no partition key.
+        """
+        if not scope:
+            return {}
+        kwargs = {}
+        expr = self._filter_expr(scope)
+        if expr:
+            kwargs["expr"] = expr
+        if scope.get("partitions") and not self.partition_key_field:
+            kwargs["partition_names"] = scope["partitions"]
+        if "fetch_k" in scope or "search_params" in scope:
+            fetch_k = scope.get("fetch_k", 4)
+            kwargs["fetch_k"] = fetch_k
+            kwargs["param"] = [
+                self._dense_search_param(fetch_k, scope.get("search_params")),
+                {"metric_type": "BM25", "params": {}},
+            ]
+        return kwargs
+
+    def _search(self, query, k, method, ranker_params, scope=None):
+        return self.vector_db.similarity_search(
+            query,
+            k=k,
+            **self._search_kwargs(method, ranker_params),
+            **self._scope_kwargs(scope),
+        )
+
+    @timed("retrieval.similar", backend="milvus")
+    async def aretrieve_similar(
+        self,
+        query,
+        k=2,
+        method="weighted",
+        ranker_params=None,
+        expr=None,
+        filters=None,
+        partitions=None,
+        search_params=None,
+        fetch_k=None,
+        resolve_parents=False,
+    ):
+        """
+        Async version of retrieve_similar. The search runs on the Milvus async client,
+        so concurrent calls do not block the event loop.
+        """
+        scope = search_scope(expr, filters, partitions, search_params, fetch_k)
+        search_kwargs = {
+            **self._search_kwargs(method, ranker_params),
+            **self._scope_kwargs(scope),
+        }
+        await self._aconnect()
+        if self.retrieval_cache is None:
+            docs = await self.vector_db.asimilarity_search(query, k=k, **search_kwargs)
+            return record_retrieval(
+                await asyncio.to_thread(self._resolve_parents, docs, resolve_parents),
+                backend="milvus",
+            )
+        cached = await asyncio.to_thread(
+            self.retrieval_cache.get, query, k, method, ranker_params, scope
+        )
+        if cached is not None:
+            return record_retrieval(
+                await asyncio.to_thread(self._resolve_parents, cached, resolve_parents),
+                backend="milvus",
+            )
+        generation = self.retrieval_cache.generation
+        docs = await self.vector_db.asimilarity_search(query, k=k, **search_kwargs)
+        await asyncio.to_thread(
+            self.retrieval_cache.put,
+            query,
+            k,
+            method,
+            ranker_params,
+            docs,
+            generation=generation,
+            scope=scope,
+        )
+        return record_retrieval(
+            await asyncio.to_thread(self._resolve_parents, docs, resolve_parents),
+            backend="milvus",
+        )
+
+    def _ranker(self, method, ranker_params):
+        from pymilvus import RRFRanker, WeightedRanker
+
+        search_kwargs = self._search_kwargs(method, ranker_params)
+        if method == "weighted":
+            return WeightedRanker(*search_kwargs["ranker_params"]["weights"])
+        return RRFRanker(search_kwargs["ranker_params"]["k"])
+
+    @staticmethod
+    def _to_document(entity):
+        entity = dict(entity)
+        entity.pop("dense", None)
+        entity.pop("sparse", None)
+        return Document(page_content=entity.pop("text", ""), metadata=entity)
+
+    @timed("retrieval.many", backend="milvus")
+    def retrieve_many(
+        self,
+        queries,
+        k=2,
+        method="weighted",
+        ranker_params=None,
+        fetch_k=None,
+        expr=None,
+        filters=None,
+        partitions=None,
+        search_params=None,
+        resolve_parents=False,
+    ):
+        """
+        Retrieves similar documents for several queries at once.
+        All queries are embedded in a single batch call and sent as one multi-vector
+        hybrid (dense + BM25) search. Returns one list of documents per query, in order.
+        fetch_k is the number of candidates taken from each of the dense and BM25 searches
+        before ranking (defaults to max(k, 4)); expr, filters, partitions and search_params
+        scope every query and resolve_parents works as in retrieve_similar.
+        """
+        from pymilvus import AnnSearchRequest
+
+        if not queries:
+            return []
+        if self.vector_db.col is None:
+            logger.debug("No existing collection to search.")
+            return [[] for _ in queries]
+        fetch_k = fetch_k or max(k, 4)
+        scope = search_scope(expr, filters, partitions) or {}
+        expr = self._filter_expr(scope)
+        partition_kwargs = {}
+        if scope.get("partitions") and not self.partition_key_field:
+            partition_kwargs["partition_names"] = scope["partitions"]
+        vectors = self.embedder.embed_documents(list(queries))
+        requests = [
+            AnnSearchRequest(
+                data=vectors,
+                anns_field="dense",
+                param=self._dense_search_param(fetch_k, search_params),
+                limit=fetch_k,
+                expr=expr,
+            ),
+            AnnSearchRequest(
+                data=list(queries),
+                anns_field="sparse",
+                param={"metric_type": "BM25", "params": {}},
+                limit=fetch_k,
+                expr=expr,
+            ),
+        ]
+        results = self.vector_db.client.hybrid_search(
+            self.collection_name,
+            reqs=requests,
+            ranker=self._ranker(method, ranker_params),
+            limit=k,
+            output_fields=["*"],
+            **partition_kwargs,
+        )
+        documents = [
+            [self._to_document(hit["entity"]) for hit in hits] for hits in results
+        ]
+        if resolve_parents and self.parent_store is not None:
+            documents = self.parent_store.resolve_many(documents)
+        for docs in documents:
+            record_retrieval(docs, backend="milvus")
+        return documents
+
+    async def aretrieve_many(
+        self,
+        queries,
+        k=2,
+        method="weighted",
+        ranker_params=None,
+        fetch_k=None,
+        **kwargs,
+    ):
+        """
+        Async version of retrieve_many; the batched search runs in a worker thread.
+        """
+        return await asyncio.to_thread(
+            self.retrieve_many, queries, k, method, ranker_params, fetch_k, **kwargs
+        )
+
+    def iter_metadata(self, fields, batch_size=1000, limit=-1):
+        """
+        Yields the requested metadata fields of every stored chunk as dicts, reading the
+        collection in batches with a query iterator.
+        """
+        if self.vector_db.col is None:
+            return
+        iterator = self.vector_db.client.query_iterator(
+            self.collection_name,
+            batch_size=batch_size,
+            limit=limit,
+            output_fields=list(fields),
+        )
+        try:
+            while batch := iterator.next():
+                for row in batch:
+                    yield {field: row.get(field) for field in fields}
+        finally:
+            iterator.close()
+
     def check_collections(self):
         """
         Checks if the specified collection exists in the current database.
         Returns True if it exists, False otherwise.
         """
-        db.using_database(self.db_name)
-        all_collections = utility.list_collections()
+        from pymilvus import utility
+
+        all_collections = utility.list_collections(using=self.alias)
         logger.info(f"All collections in '{self.db_name}': {all_collections}")
         if self.collection_name in all_collections:
             logger.info(f"Collection '{self.collection_name}' exists.")
@@ -130,20 +771,23 @@ class VectorDBManager:
         Drops one or more collections from the current database after checking their existence.
         Logs the collections that were dropped and lists remaining collections.
         """
-        db.using_database(self.db_name)
-        all_collections = utility.list_collections()
+        from pymilvus import Collection, utility
+
+        all_collections = utility.list_collections(using=self.alias)
         if isinstance(collections_to_drop, str):
             collections_to_drop = [collections_to_drop]
 
         for collection_name in collections_to_drop:
             if collection_name in all_collections:
-                collection = Collection(name=collection_name)
+                collection = Collection(name=collection_name, using=self.alias)
                 collection.drop()
+                if collection_name == self.collection_name:
+                    self._invalidate_cache()
                 logger.info(f"Collection '{collection_name}' has been dropped.")
             else:
                 logger.warning(
                     f"Collection '{collection_name}' does not exist and cannot be dropped."
                 )
 
-        remaining_collections = utility.list_collections()
+        remaining_collections = utility.list_collections(using=self.alias)
         logger.info(f"Remaining collections: {remaining_collections}")
@@ -0,0 +1,128 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.doc_loader import DocumentProcessor
+from src.fetch_cache import FetchCache
+from src.theme_generation import ThemeKeywords
+
+LAST_MODIFIED = "Wed, 01 Jan 2025 00:00:00 GMT"
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    """
+    Serves the pages in server.pages; /etag validates with an ETag and /modified with
+    Last-Modified, answering 304 when the conditional header matches.
+    """
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        body = self.server.pages[self.path]
+        etag = f'"{len(body)}-{hash(body)}"'
+        if self.path == "/etag" and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        if (
+            self.path == "/modified"
+            and self.headers.get("If-Modified-Since") == LAST_MODIFIED
+        ):
+            self.send_response(304)
+            self.end_headers()
+            return
+        payload = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        if self.path == "/etag":
+            self.send_header("ETag", etag)
+        else:
+            self.send_header("Last-Modified", LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    httpd.pages = {
+        "/etag": "<html><title>ETag page</title><body>Bonds and rates.</body></html>",
+        "/modified": "<html><title>Dated page</title><body>Equities.</body></html>",
+    }
+    httpd.requests = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def load(processor, urls):
+    return asyncio.run(processor.aload_documents(urls, requests_per_host=None))
+
+
+def commit(processor):
+    processor.theme_keywords_results = [
+        ThemeKeywords(summary="summary", keywords=["keyword"])
+        for _ in processor.docs_list
+    ]
+    processor.commit_fetch_cache()
+
+
+@pytest.mark.parametrize("path", ["/etag", "/modified"])
+def test_unchanged_page_is_skipped_after_304(server, tmp_path, path):
+    url = f"http://127.0.0.1:{server.server_port}{path}"
+    cache = FetchCache(str(tmp_path))
+    processor = DocumentProcessor(
+        None, theme_keywords_extractor=object(), fetch_cache=cache
+    )
+
+    docs = load(processor, [url])
+    assert [doc.metadata["source"] for doc in docs] == [url]
+    commit(processor)
+    assert cache.get(url).summary == "summary"
+    assert [p.suffix for p in tmp_path.iterdir()] == [".json"]
+
+    assert load(processor, [url]) == []
+    assert processor.unchanged_urls == [url]
+    headers = server.requests[-1][1]
+    if path == "/etag":
+        assert headers["If-None-Match"] == cache.get(url).etag
+    else:
+        assert headers["If-Modified-Since"] == LAST_MODIFIED
+
+
+def test_changed_page_is_reloaded(server, tmp_path):
+    url = f"http://127.0.0.1:{server.server_port}/etag"
+    processor = DocumentProcessor(
+        None, theme_keywords_extractor=object(), fetch_cache=FetchCache(str(tmp_path))
+    )
+    load(processor, [url])
+    commit(processor)
+
+    server.pages["/etag"] = (
+        "<html><title>ETag page</title><body>New text.</body></html>"
+    )
+    docs = load(processor, [url])
+    assert len(docs) == 1 and "New text." in docs[0].page_content
+    assert processor.unchanged_urls == []
+
+
+def test_refresh_ignores_the_cache(server, tmp_path):
+    url = f"http://127.0.0.1:{server.server_port}/modified"
+    processor = DocumentProcessor(
+        None, theme_keywords_extractor=object(), fetch_cache=FetchCache(str(tmp_path))
+    )
+    load(processor, [url])
+    commit(processor)
+
+    docs = asyncio.run(
+        processor.aload_documents([url], requests_per_host=None, refresh=True)
+    )
+    assert len(docs) == 1
+    assert "If-Modified-Since" not in server.requests[-1][1]
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+import tiktoken
+import tiktoken.registry
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from benchmarks.fakes import make_corpus
+from src.text_splitter import ParallelTextSplitter, _DocumentSplitter
+
+SETTINGS = [(50, 0), (120, 20), (300, 60)]
+
+
+@pytest.fixture(scope="module")
+def encoding_name():
+    """
+    gpt2 (from_tiktoken_encoder's default) when it can be loaded; offline, a byte-level
+    encoding registered with tiktoken, which the forked pool workers inherit.
+    """
+    try:
+        tiktoken.get_encoding("gpt2")
+        return "gpt2"
+    except Exception:
+        name = "test_bytes"
+        tiktoken.registry.ENCODINGS[name] = tiktoken.Encoding(
+            name,
+            pat_str=r"""'(?:[sdmt]|ll|ve|re)| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+""",
+            mergeable_ranks={bytes([i]): i for i in range(256)},
+            special_tokens={"<|endoftext|>": 256},
+        )
+        return name
+
+
+@pytest.fixture(scope="module")
+def docs():
+    docs = make_corpus(24, 300, seed=3)
+    for doc in docs:
+        doc.page_content = (
+            doc.page_content.replace(". ", ".\n", 3).replace(".", ".\n\n", 2)
+            + " ünïcødé €"
+        )
+    return docs
+
+
+def reference(encoding_name, chunk_size, chunk_overlap):
+    return RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        encoding_name=encoding_name, chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    )
+
+
+@pytest.mark.parametrize("chunk_size,chunk_overlap", SETTINGS)
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_chunks_match_from_tiktoken_encoder(
+    encoding_name, docs, chunk_size, chunk_overlap, max_workers
+):
+    expected = reference(encoding_name, chunk_size, chunk_overlap).split_documents(docs)
+    with ParallelTextSplitter(
+        chunk_size,
+        chunk_overlap,
+        encoding_name=encoding_name,
+        max_workers=max_workers,
+        min_parallel_chars=0,
+    ) as splitter:
+        assert splitter.split_documents(docs) == expected
+        assert asyncio.run(splitter.asplit_documents(docs)) == expected
+
+
+@pytest.mark.parametrize("chunk_size,chunk_overlap", SETTINGS)
+def test_offsets_locate_every_chunk(encoding_name, docs, chunk_size, chunk_overlap):
+    splitter = ParallelTextSplitter(
+        chunk_size,
+        chunk_overlap,
+        encoding_name=encoding_name,
+        max_workers=1,
+        add_offsets=True,
+    )
+    encoding = tiktoken.get_encoding(encoding_name)
+    texts = {doc.metadata["source"]: doc.page_content for doc in docs}
+    for chunk in splitter.split_documents(docs[:4]):
+        text = texts[chunk.metadata["source"]]
+        metadata = chunk.metadata
+        assert (
+            text[metadata["start_index"] : metadata["end_index"]] == chunk.page_content
+        )
+        tokens = encoding.encode_ordinary(text)
+        decoded = encoding.decode(
+            tokens[metadata["start_token"] : metadata["end_token"]]
+        )
+        assert chunk.page_content in decoded
+
+
+def test_chunk_not_in_text_gets_no_offsets(encoding_name):
+    splitter = _DocumentSplitter(50, 0, encoding_name, add_offsets=True)
+    splitter.counter.start_document("first chunk. second chunk.")
+    offsets = splitter._offsets(
+        "first chunk. second chunk.", ["first chunk.", "missing", "second chunk."]
+    )
+    assert offsets[0]["start_index"] == 0
+    assert offsets[1] == dict.fromkeys(offsets[1])
+    assert all(value is None for value in offsets[1].values())
+    assert offsets[2]["start_index"] == 13